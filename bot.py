@@ -3,29 +3,45 @@ import os
 import json
 import logging
 import sqlite3
-from datetime import datetime, time as dt_time
+from datetime import datetime, timedelta, time as dt_time
 from pathlib import Path
 import asyncio
 import re
-
-import google.generativeai as genai
-from google.generativeai.types import generation_types
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
+    BasePersistence,
     CommandHandler,
     ContextTypes,
     MessageHandler,
+    TypeHandler,
     filters,
     ConversationHandler,
     CallbackQueryHandler,
 )
 
-from kerykeion import AstrologicalSubject, NatalAspects
-from kerykeion.kr_types import KerykeionException
+from chart_images import ChartRenderer, chart_fingerprint
+from image_pipeline import ImagePipeline
+from model_router import ModelRouter, ModelTier
+from persistence import SQLitePersistence
+from prompt_compiler import PROMPT_VERSION, PromptCompiler, house_number, translation_prompt
+from user_state import IdleTracker
+
+# მძიმე მოდულები (google.generativeai, kerykeion, numpy-ზე დამოკიდებული transits და dream_cache)
+# პირველი საჭიროებისას ან გაშვების შემდეგ ფონურ გახურებაში იტვირთება (იხ. warm_up)
+if TYPE_CHECKING:
+    from kerykeion import AstrologicalSubject
+    from dream_cache import DreamCache
+    from transits import TransitEngine
 
 # .env ფაილიდან გარემოს ცვლადების ჩატვირთვა
 load_dotenv()
@@ -43,34 +59,97 @@ MAJOR_ASPECTS_TYPES = ['conjunction', 'opposition', 'square', 'trine', 'sextile'
 ASPECT_ORBS = {'Sun': 8, 'Moon': 8, 'Ascendant': 5, 'Midheaven': 5, 'default': 6}
 
 # --- Gemini კონფიგურაცია ---
-gemini_model = None
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    safety_settings = [
-        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+GEMINI_MODEL_NAME = 'gemini-1.5-flash-latest'
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "3600"))
+GEMINI_REQUEST_TIMEOUT_SECONDS = 180
+# ჩანაცვლებული ქეში ამდენ ხანს რჩება: მანამდე დაწყებული მოთხოვნები მას ჯერ კიდევ იყენებს
+GEMINI_CACHE_GRACE_SECONDS = GEMINI_REQUEST_TIMEOUT_SECONDS + 60
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "0")) or None
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_DEGRADED_MODEL_NAME = os.getenv("GEMINI_DEGRADED_MODEL", "gemini-1.5-flash-8b-latest")
+DEGRADED_UPGRADE_INTERVAL_SECONDS = int(os.getenv("DEGRADED_UPGRADE_INTERVAL_SECONDS", "300"))
+DEGRADED_UPGRADE_BATCH = 5
+PREGENERATE_TRANSLATIONS = os.getenv("PREGENERATE_TRANSLATIONS", "0") == "1"
+HOROSCOPE_TIMEZONE = ZoneInfo(os.getenv("HOROSCOPE_TIMEZONE", "Asia/Tbilisi"))
+HOROSCOPE_RETENTION_DAYS = 7
+HOROSCOPE_RETRY_SECONDS = int(os.getenv("HOROSCOPE_RETRY_SECONDS", "600"))
+HOROSCOPE_RETRY_JOB = "daily_horoscope_retry"
+PERSONAL_HOROSCOPE_BATCH = int(os.getenv("PERSONAL_HOROSCOPE_BATCH", "20"))
+PERSONAL_HOROSCOPE_MAX_TRANSITS = 5
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "2"))
+CHART_IMAGE_DIR = os.getenv("CHART_IMAGE_DIR", "chart_images")
+CHART_IMAGE_THEME = os.getenv("CHART_IMAGE_THEME", "classic")
+IMAGE_READING_WORKERS = int(os.getenv("IMAGE_READING_WORKERS", "2"))
+PERSISTENCE_ENABLED = os.getenv("PERSISTENCE_ENABLED", "1") == "1"
+PERSISTENCE_FLUSH_SECONDS = float(os.getenv("PERSISTENCE_FLUSH_SECONDS", "5"))
+USER_RECORD_CACHE_SIZE = int(os.getenv("USER_RECORD_CACHE_SIZE", "10000"))
+USER_RECORD_CACHE_TTL_SECONDS = 300
+USER_STATE_TTL_SECONDS = int(os.getenv("USER_STATE_TTL_SECONDS", str(24 * 3600)))
+USER_STATE_MAX_USERS = int(os.getenv("USER_STATE_MAX_USERS", "100000"))
+USER_STATE_SWEEP_SECONDS = 300
+CONVERSATION_TIMEOUT_SECONDS = int(os.getenv("CONVERSATION_TIMEOUT_SECONDS", "3600"))
+DREAM_CACHE_CAPACITY = int(os.getenv("DREAM_CACHE_CAPACITY", "5000"))
+DREAM_HIT_THRESHOLD = float(os.getenv("DREAM_HIT_THRESHOLD", "0.8"))
+DREAM_SEED_THRESHOLD = float(os.getenv("DREAM_SEED_THRESHOLD", "0.75"))
+ZODIAC_SIGNS = ['Aries', 'Taurus', 'Gemini', 'Cancer', 'Leo', 'Virgo', 'Libra', 'Scorpio', 'Sagittarius', 'Capricorn', 'Aquarius', 'Pisces']
+
+def model_tiers(max_concurrency: int) -> list[ModelTier]:
+    # რიგის ზღვრები პარალელიზმს მიჰყვება (ვორკერის პროცესს ლიმიტის მხოლოდ თავისი წილი აქვს)
+    return [
+        ModelTier("full", GEMINI_MODEL_NAME, brief=False, max_queue_depth=max_concurrency, max_latency=60),
+        ModelTier("brief", GEMINI_MODEL_NAME, brief=True, max_queue_depth=max_concurrency * 3, max_latency=120),
+        ModelTier("lite", GEMINI_DEGRADED_MODEL_NAME, brief=True),
     ]
-    try:
-        gemini_model = genai.GenerativeModel(
-            'gemini-1.5-flash-latest',
-            safety_settings=safety_settings
-        )
-        logging.info("Gemini model loaded successfully.")
-    except Exception as e:
-        logging.error(f"Failed to load Gemini model: {e}", exc_info=True)
-else:
-    logging.warning("GEMINI_API_KEY not found. AI features disabled.")
+
+MODEL_TIERS = model_tiers(GEMINI_MAX_CONCURRENCY)
+model_router = ModelRouter(MODEL_TIERS, max_concurrency=GEMINI_MAX_CONCURRENCY)
+chart_renderer = ChartRenderer(CHART_RENDER_WORKERS, CHART_IMAGE_DIR, CHART_IMAGE_THEME)
+image_pipeline = ImagePipeline(IMAGE_READING_WORKERS)
+safety_settings = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+genai = None
+gemini_model = None
+gemini_load_lock = threading.Lock()
+
+def load_gemini():
+    # google.generativeai-ის იმპორტი წამამდე გრძელდება: კლიენტი პირველ მოთხოვნაზე ან გახურებისას იქმნება
+    global genai, gemini_model
+    if not GEMINI_API_KEY:
+        return None
+    with gemini_load_lock:
+        if genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=GEMINI_API_KEY)
+            try:
+                gemini_model = genai.GenerativeModel(
+                    GEMINI_MODEL_NAME,
+                    safety_settings=safety_settings
+                )
+                logger.info("Gemini model loaded successfully.")
+            except Exception as e:
+                logger.error(f"Failed to load Gemini model: {e}", exc_info=True)
+    return gemini_model
+
+async def ensure_gemini():
+    if genai is None and GEMINI_API_KEY:
+        return await asyncio.to_thread(load_gemini)
+    return gemini_model
 
 # ლოგირება
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
 )
 logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("apscheduler").setLevel(logging.WARNING)
 logging.getLogger("kerykeion").setLevel(logging.INFO)
 logging.getLogger("google.generativeai").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
+if not GEMINI_API_KEY:
+    logger.warning("GEMINI_API_KEY not found. AI features disabled.")
 
 # --- თარგმანები ---
 translations = {
@@ -125,6 +204,7 @@ translations = {
         "kerykeion_general_error": "ასტროლოგიური მონაცემების გამოთვლის შეცდომა.",
         "aspect_calculation_error_user": "⚠️ ასპექტების გამოთვლის შეცდომა.",
         "gemini_prompt_start": "ვქმნი ინტერპრეტაციებს...\n⏳ 1-3 წუთი.",
+        "translating_chart": "ვთარგმნი თქვენს რუკას...",
         "gemini_interpretation_failed": "ინტერპრეტაციების გენერაცია ჩაიშალა.",
         "chart_error_generic": "რუკის გენერაციის შეცდომა.",
         "main_menu_button_view_chart": "📜 რუკის ნახვა",
@@ -135,8 +215,21 @@ translations = {
         "main_menu_button_delete_data": "🗑️ მონაცემების წაშლა",
         "main_menu_button_help": "❓ დახმარება",
         "feature_coming_soon": "ფუნქცია '{feature_name}' მალე დაემატება.",
+        "dream_send_text": "🌙 მოგვიყევით თქვენი სიზმარი ერთ შეტყობინებაში.",
+        "dream_processing": "🌙 სიზმარს ვხსნი...",
+        "dream_failed": "სიზმრის ახსნა ვერ მოხერხდა. სცადეთ მოგვიანებით.",
+        "gemini_dream_prompt": "შენ ხარ სიზმრების ახსნის სპეციალისტი. ახსენი ეს სიზმარი ქართულ ენაზე, 5-8 წინადადებით, სიმბოლოების ტრადიციული მნიშვნელობის გათვალისწინებით. დაწერე მხოლოდ ახსნა.\n\nსიზმარი: {dream}",
+        "gemini_dream_seeded_prompt": "შენ ხარ სიზმრების ახსნის სპეციალისტი. ახსენი ეს სიზმარი ქართულ ენაზე, 5-8 წინადადებით. ნიმუშად მოცემულია მსგავსი სიზმრის ახსნა: გამოიყენე მისი შესაბამისი ნაწილები და მოარგე ამ სიზმრის განსხვავებულ დეტალებს. დაწერე მხოლოდ ახსნა.\n\nსიზმარი: {dream}\n\nმსგავსი სიზმარი: {reference_dream}\nმისი ახსნა: {reference}",
+        "palmistry_send_photo": "🖐️ გამოგზავნეთ თქვენი ხელისგულის მკაფიო ფოტო (კარგ განათებაში, მთელი ხელისგული კადრში).",
+        "coffee_send_photo": "☕ გამოგზავნეთ ყავის ფინჯნის ფოტო ზემოდან, ისე რომ ნალექი კარგად ჩანდეს.",
+        "image_reading_choose_feature": "ფოტოს წასაკითხად ჯერ მენიუდან აირჩიეთ 🖐️ ქირომანტია ან ☕ ყავაში ჩახედვა.",
+        "image_reading_processing": "🔮 ფოტოს ვათვალიერებ...",
+        "image_reading_failed": "ფოტოს წაკითხვა ვერ მოხერხდა. სცადეთ სხვა ფოტო ან მოგვიანებით.",
+        "gemini_palmistry_prompt": "შენ ხარ გამოცდილი ქირომანტი. ფოტოზე ადამიანის ხელისგულია. აღწერე მთავარი ხაზები (სიცოცხლის, გონების, გულის, ბედის) და ბორცვები და მოკლედ განმარტე მათი მნიშვნელობა ქართულ ენაზე, 8-12 წინადადებით. თუ ფოტოზე ხელისგული არ ჩანს, თავაზიანად სთხოვე სხვა ფოტო.",
+        "gemini_coffee_prompt": "შენ ხარ ყავაში ჩახედვის ოსტატი. ფოტოზე ყავის ფინჯანია ნალექით. აღწერე ნალექში დანახული ფიგურები და მათი ტრადიციული მნიშვნელობა ქართულ ენაზე, 8-12 წინადადებით. თუ ფოტოზე ფინჯანი არ ჩანს, თავაზიანად სთხოვე სხვა ფოტო.",
         "gemini_main_prompt_intro": "შენ ხარ გამოცდილი ასტროლოგი, რომელიც ქმნის დეტალურ ნატალურ რუკას {language} ენაზე.",
         "gemini_main_prompt_instruction_1": "მიჰყევი სტრუქტურას და თითოეულ პუნქტზე დაწერე 3-5 წინადადება ({name}).",
+        "gemini_main_prompt_instruction_1_brief": "მიჰყევი სტრუქტურას და თითოეულ პუნქტზე დაწერე 1-2 წინადადება ({name}).",
         "gemini_main_prompt_instruction_2": "გამოიყენე თბილი, გასაგები ენა.",
         "gemini_main_prompt_instruction_3": "იყავი ზუსტი, PDF ნიმუშის მსგავსად.",
         "gemini_data_header": "**მონაცემები:**",
@@ -161,7 +254,16 @@ translations = {
         "section_title_pis": "პლანეტები ნიშნებში",
         "section_title_pih": "პლანეტები სახლებში",
         "section_title_aspects": "ასპექტები",
-        "time_note_12_00": "შენიშვნა: გამოყენებულია ნაგულისხმევი დრო 12:00, რადგან ზუსტი დრო უცნობია."
+        "time_note_12_00": "შენიშვნა: გამოყენებულია ნაგულისხმევი დრო 12:00, რადგან ზუსტი დრო უცნობია.",
+        "horoscope_header": "🔮 <b>{sign}</b> — {date}",
+        "horoscope_not_ready": "დღევანდელი ჰოროსკოპი ჯერ მზადდება. სცადეთ ცოტა ხანში.",
+        "horoscope_choose_sign": "აირჩიეთ ზოდიაქოს ნიშანი:",
+        "gemini_horoscope_prompt": "დაწერე ზოგადი დღიური ჰოროსკოპი {date} თარიღისთვის ზოდიაქოს 12-ვე ნიშნისთვის, ქართულ ენაზე, 3-4 წინადადება თითოეულზე. თითოეული ნიშანი დაიწყე მარკერით [SIGN: <ინგლისური სახელი>] (მაგ., [SIGN: Aries]). დაწერე მხოლოდ ჰოროსკოპების ტექსტი.",
+        "personal_horoscope_header": "🔮 <b>თქვენი პირადი ჰოროსკოპი</b> — {date}",
+        "gemini_personal_horoscope_prompt": "ქვემოთ მოცემულია რამდენიმე ადამიანის დღევანდელი ({date}) მნიშვნელოვანი ტრანზიტები მათ ნატალურ რუკასთან. თითოეულისთვის დაწერე პირადი დღიური ჰოროსკოპი ქართულ ენაზე, 3-4 წინადადება, ტრანზიტების გათვალისწინებით. თითოეული ჰოროსკოპი დაიწყე იმავე მარკერით [USER: <id>], რომელიც მოცემულია ქვემოთ. დაწერე მხოლოდ ჰოროსკოპების ტექსტი.\n\n{users}",
+        "sign_Aries": "ვერძი", "sign_Taurus": "კურო", "sign_Gemini": "ტყუპები", "sign_Cancer": "კირჩხიბი",
+        "sign_Leo": "ლომი", "sign_Virgo": "ქალწული", "sign_Libra": "სასწორი", "sign_Scorpio": "მორიელი",
+        "sign_Sagittarius": "მშვილდოსანი", "sign_Capricorn": "თხის რქა", "sign_Aquarius": "მერწყული", "sign_Pisces": "თევზები"
     },
     "en": {
         "language_chosen": "You have selected English.",
@@ -190,6 +292,18 @@ translations = {
         "delete_data_button": "🗑️ Delete Data",
         "help_button": "❓ Help",
         "feature_coming_soon": "Feature '{feature_name}' coming soon!",
+        "dream_send_text": "🌙 Tell me your dream in one message.",
+        "dream_processing": "🌙 Interpreting your dream...",
+        "dream_failed": "Couldn't interpret the dream. Please try again later.",
+        "gemini_dream_prompt": "You are a dream interpretation specialist. Interpret this dream in English in 5-8 sentences, drawing on the traditional meaning of its symbols. Return only the interpretation.\n\nDream: {dream}",
+        "gemini_dream_seeded_prompt": "You are a dream interpretation specialist. Interpret this dream in English in 5-8 sentences. An interpretation of a similar dream is given as a reference: reuse the parts that apply and adapt it to the details that differ. Return only the interpretation.\n\nDream: {dream}\n\nSimilar dream: {reference_dream}\nIts interpretation: {reference}",
+        "palmistry_send_photo": "🖐️ Send a clear photo of your palm (good lighting, the whole palm in frame).",
+        "coffee_send_photo": "☕ Send a photo of your coffee cup from above so the grounds are clearly visible.",
+        "image_reading_choose_feature": "To get a photo reading, first choose 🖐️ Palmistry or ☕ Coffee Reading from the menu.",
+        "image_reading_processing": "🔮 Looking at your photo...",
+        "image_reading_failed": "Couldn't read the photo. Please try another photo or try again later.",
+        "gemini_palmistry_prompt": "You are an experienced palm reader. The photo shows a person's palm. Describe the main lines (life, head, heart, fate) and mounts and briefly explain their meaning in English, in 8-12 sentences. If no palm is visible, politely ask for another photo.",
+        "gemini_coffee_prompt": "You are a master of coffee cup reading. The photo shows a coffee cup with grounds. Describe the shapes you see in the grounds and their traditional meaning in English, in 8-12 sentences. If no cup is visible, politely ask for another photo.",
         "data_saved": "Data saved.",
         "data_save_error": "Error saving data.",
         "chart_ready_menu_prompt": "Chart ready. Main menu:",
@@ -223,10 +337,12 @@ translations = {
         "kerykeion_general_error": "Error calculating astro data.",
         "aspect_calculation_error_user": "Warning: Aspect calculation error.",
         "gemini_prompt_start": "Generating interpretations...\n⏳ 1-3 minutes.",
+        "translating_chart": "Translating your chart...",
         "gemini_interpretation_failed": "Failed to generate interpretations.",
         "chart_error_generic": "Unexpected error generating chart.",
         "gemini_main_prompt_intro": "You are an experienced astrologer writing a detailed natal chart in {language}.",
         "gemini_main_prompt_instruction_1": "Follow structure, write 3-5 sentences per point for {name}.",
+        "gemini_main_prompt_instruction_1_brief": "Follow structure, write 1-2 sentences per point for {name}.",
         "gemini_main_prompt_instruction_2": "Use warm, clear language.",
         "gemini_main_prompt_instruction_3": "Be precise, like the PDF sample.",
         "gemini_data_header": "**Birth Data:**",
@@ -251,7 +367,16 @@ translations = {
         "section_title_pis": "Planets in Signs",
         "section_title_pih": "Planets in Houses",
         "section_title_aspects": "Aspects",
-        "time_note_12_00": "Note: Default time 12:00 used as exact time is unknown."
+        "time_note_12_00": "Note: Default time 12:00 used as exact time is unknown.",
+        "horoscope_header": "🔮 <b>{sign}</b> — {date}",
+        "horoscope_not_ready": "Today's horoscope is still being prepared. Please try again shortly.",
+        "horoscope_choose_sign": "Choose your zodiac sign:",
+        "gemini_horoscope_prompt": "Write a general daily horoscope for {date} for all 12 zodiac signs in English, 3-4 sentences each. Start each sign with the marker [SIGN: <English name>] (e.g. [SIGN: Aries]). Return only the horoscope texts.",
+        "personal_horoscope_header": "🔮 <b>Your personal horoscope</b> — {date}",
+        "gemini_personal_horoscope_prompt": "Below are today's ({date}) significant transits to the natal charts of several people. For each person write a personal daily horoscope in English, 3-4 sentences, based on their transits. Start each horoscope with the same [USER: <id>] marker given below. Return only the horoscope texts.\n\n{users}",
+        "sign_Aries": "Aries", "sign_Taurus": "Taurus", "sign_Gemini": "Gemini", "sign_Cancer": "Cancer",
+        "sign_Leo": "Leo", "sign_Virgo": "Virgo", "sign_Libra": "Libra", "sign_Scorpio": "Scorpio",
+        "sign_Sagittarius": "Sagittarius", "sign_Capricorn": "Capricorn", "sign_Aquarius": "Aquarius", "sign_Pisces": "Pisces"
     },
     "ru": {
         "language_chosen": "Вы выбрали русский язык.",
@@ -280,6 +405,18 @@ translations = {
         "delete_data_button": "🗑️ Удалить данные",
         "help_button": "❓ Помощь",
         "feature_coming_soon": "Функция '{feature_name}' скоро появится!",
+        "dream_send_text": "🌙 Расскажите свой сон одним сообщением.",
+        "dream_processing": "🌙 Толкую ваш сон...",
+        "dream_failed": "Не удалось истолковать сон. Попробуйте позже.",
+        "gemini_dream_prompt": "Ты специалист по толкованию снов. Истолкуй этот сон на русском языке в 5-8 предложениях, опираясь на традиционное значение его символов. Верни только толкование.\n\nСон: {dream}",
+        "gemini_dream_seeded_prompt": "Ты специалист по толкованию снов. Истолкуй этот сон на русском языке в 5-8 предложениях. В качестве образца дано толкование похожего сна: используй подходящие части и адаптируй его к отличающимся деталям. Верни только толкование.\n\nСон: {dream}\n\nПохожий сон: {reference_dream}\nЕго толкование: {reference}",
+        "palmistry_send_photo": "🖐️ Пришлите чёткое фото вашей ладони (при хорошем освещении, вся ладонь в кадре).",
+        "coffee_send_photo": "☕ Пришлите фото кофейной чашки сверху, чтобы гуща была хорошо видна.",
+        "image_reading_choose_feature": "Чтобы получить толкование фото, сначала выберите в меню 🖐️ Хиромантия или ☕ Гадание на кофе.",
+        "image_reading_processing": "🔮 Рассматриваю фото...",
+        "image_reading_failed": "Не удалось прочитать фото. Попробуйте другое фото или повторите позже.",
+        "gemini_palmistry_prompt": "Ты опытный хиромант. На фото ладонь человека. Опиши основные линии (жизни, ума, сердца, судьбы) и холмы и кратко объясни их значение на русском языке, в 8-12 предложениях. Если ладонь не видна, вежливо попроси другое фото.",
+        "gemini_coffee_prompt": "Ты мастер гадания на кофейной гуще. На фото кофейная чашка с гущей. Опиши фигуры, которые видны в гуще, и их традиционное значение на русском языке, в 8-12 предложениях. Если чашка не видна, вежливо попроси другое фото.",
         "data_saved": "Данные сохранены.",
         "data_save_error": "Ошибка сохранения.",
         "chart_ready_menu_prompt": "Карта готова. Главное меню:",
@@ -313,10 +450,12 @@ translations = {
         "kerykeion_general_error": "Ошибка расчета.",
         "aspect_calculation_error_user": "Ошибка расчета аспектов.",
         "gemini_prompt_start": "Генерация...\n⏳ 1-3 минуты.",
+        "translating_chart": "Перевожу вашу карту...",
         "gemini_interpretation_failed": "Ошибка генерации.",
         "chart_error_generic": "Ошибка генерации карты.",
         "gemini_main_prompt_intro": "Вы астролог, создающий анализ карты на {language}.",
         "gemini_main_prompt_instruction_1": "Следуйте структуре, 3-5 предложений для {name}.",
+        "gemini_main_prompt_instruction_1_brief": "Следуйте структуре, 1-2 предложения для {name}.",
         "gemini_main_prompt_instruction_2": "Используйте понятный язык.",
         "gemini_main_prompt_instruction_3": "Будьте точны, как в PDF.",
         "gemini_data_header": "**Данные:**",
@@ -341,7 +480,16 @@ translations = {
         "section_title_pis": "Планеты в Знаках",
         "section_title_pih": "Планеты в Домах",
         "section_title_aspects": "Аспекты",
-        "time_note_12_00": "Примечание: Использовано время 12:00, так как точное время неизвестно."
+        "time_note_12_00": "Примечание: Использовано время 12:00, так как точное время неизвестно.",
+        "horoscope_header": "🔮 <b>{sign}</b> — {date}",
+        "horoscope_not_ready": "Гороскоп на сегодня ещё готовится. Попробуйте чуть позже.",
+        "horoscope_choose_sign": "Выберите знак зодиака:",
+        "gemini_horoscope_prompt": "Напишите общий гороскоп на {date} для всех 12 знаков зодиака на русском языке, 3-4 предложения для каждого. Начинайте каждый знак с маркера [SIGN: <английское название>] (например, [SIGN: Aries]). Верните только тексты гороскопов.",
+        "personal_horoscope_header": "🔮 <b>Ваш личный гороскоп</b> — {date}",
+        "gemini_personal_horoscope_prompt": "Ниже приведены значимые транзиты на сегодня ({date}) к натальным картам нескольких людей. Для каждого напишите личный гороскоп на день на русском языке, 3-4 предложения, с учётом транзитов. Начинайте каждый гороскоп с того же маркера [USER: <id>], что указан ниже. Верните только тексты гороскопов.\n\n{users}",
+        "sign_Aries": "Овен", "sign_Taurus": "Телец", "sign_Gemini": "Близнецы", "sign_Cancer": "Рак",
+        "sign_Leo": "Лев", "sign_Virgo": "Дева", "sign_Libra": "Весы", "sign_Scorpio": "Скорпион",
+        "sign_Sagittarius": "Стрелец", "sign_Capricorn": "Козерог", "sign_Aquarius": "Водолей", "sign_Pisces": "Рыбы"
     }
 }
 DEFAULT_LANGUAGE = "ka"
@@ -357,6 +505,33 @@ def get_text(key: str, lang_code: str | None = None, context: ContextTypes.DEFAU
         text = translations.get("ka", {}).get(key)
     return text or f"TR_ERROR['{key}':'{final_lang_code}']"
 
+prompt_compiler = PromptCompiler(get_text, translations.keys(), token_budget=PROMPT_TOKEN_BUDGET)
+transit_engine: "TransitEngine | None" = None
+dream_cache: "DreamCache | None" = None
+# გახურების ნაკადი და მოვლენების ციკლი ერთდროულად შეიძლება მიმართონ: ობიექტი მხოლოდ ერთხელ იქმნება
+engine_load_lock = threading.Lock()
+
+def get_transit_engine() -> "TransitEngine":
+    global transit_engine
+    if transit_engine is None:
+        with engine_load_lock:
+            if transit_engine is None:
+                from transits import TransitEngine
+                transit_engine = TransitEngine(ASPECT_PLANETS, MAJOR_ASPECTS_TYPES, ASPECT_ORBS)
+    return transit_engine
+
+def get_dream_cache() -> "DreamCache":
+    global dream_cache
+    if dream_cache is None:
+        with engine_load_lock:
+            if dream_cache is None:
+                from dream_cache import DreamCache
+                dream_cache = DreamCache(DREAM_CACHE_CAPACITY, hit_threshold=DREAM_HIT_THRESHOLD,
+                                         seed_threshold=DREAM_SEED_THRESHOLD)
+    return dream_cache
+
+NATAL_POSITION_COLUMNS = [name.lower() for name in ASPECT_PLANETS]
+
 def init_db():
     try:
         conn = sqlite3.connect(DB_FILE)
@@ -373,31 +548,150 @@ def init_db():
                 city TEXT,
                 nation TEXT,
                 language_code TEXT,
-                full_chart_text TEXT
+                full_chart_text TEXT,
+                model_tier TEXT,
+                chart_version TEXT
+            )
+        """)
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(user_birth_data)")}
+        for column in ("model_tier", "chart_version"):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE user_birth_data ADD COLUMN {column} TEXT")
+        # არსებული ტექსტები chart_interpretations-ში მხოლოდ ცხრილის შექმნისას გადაიტანება (ყოველ გაშვებაზე
+        # და ვორკერზე სრული სკანი აღარ ხდება); შექმნა და გადატანა ერთ ტრანზაქციაშია, რომ ავარიამ ნახევრად არ დატოვოს
+        migrate_interpretations = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chart_interpretations'"
+        ).fetchone() is None
+        if migrate_interpretations and not conn.in_transaction:
+            cursor.execute("BEGIN")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chart_interpretations (
+                user_id INTEGER NOT NULL,
+                language_code TEXT NOT NULL,
+                full_chart_text TEXT NOT NULL,
+                model_tier TEXT,
+                PRIMARY KEY (user_id, language_code)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_horoscopes (
+                day TEXT NOT NULL,
+                sign TEXT NOT NULL,
+                language_code TEXT NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (day, sign, language_code)
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS natal_positions (
+                user_id INTEGER PRIMARY KEY,
+                {", ".join(f"{column} REAL" for column in NATAL_POSITION_COLUMNS)}
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS personal_horoscopes (
+                day TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                language_code TEXT NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (day, user_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chart_images (
+                fingerprint TEXT NOT NULL,
+                theme TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                PRIMARY KEY (fingerprint, theme)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_chart_images (
+                user_id INTEGER PRIMARY KEY,
+                fingerprint TEXT NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS image_readings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                language_code TEXT NOT NULL,
+                file_unique_id TEXT NOT NULL,
+                image_hash TEXT NOT NULL,
+                text TEXT NOT NULL,
+                user_id INTEGER,
+                created_at REAL,
+                UNIQUE (kind, language_code, file_unique_id)
+            )
+        """)
+        # წაკითხვა მხოლოდ ზუსტი file_unique_id-ით გამოიყენება ხელახლა: აღქმითი ჰეში ერთნაირად გადაღებულ
+        # სხვადასხვა ხელს ან ფინჯანს ვერ ასხვავებს (იხ. `python image_pipeline.py --validate`)
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(image_readings)")}
+        for column, column_type in (("user_id", "INTEGER"), ("created_at", "REAL")):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE image_readings ADD COLUMN {column} {column_type}")
+        cursor.execute("DROP INDEX IF EXISTS image_readings_user")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_languages (
+                user_id INTEGER PRIMARY KEY,
+                language_code TEXT NOT NULL
+            )
+        """)
+        if migrate_interpretations:
+            cursor.execute("""
+                INSERT OR IGNORE INTO chart_interpretations (user_id, language_code, full_chart_text, model_tier)
+                SELECT user_id, COALESCE(language_code, ?), full_chart_text, model_tier
+                FROM user_birth_data WHERE full_chart_text IS NOT NULL
+            """, (DEFAULT_LANGUAGE,))
         conn.commit()
         conn.close()
         logger.info(f"Database {DB_FILE} initialized.")
     except sqlite3.Error as e:
         logger.error(f"Database init error: {e}")
 
-def save_user_data(user_id: int, data: dict, chart_text: str | None = None):
+# --- ქეშები და მათი ინვალიდაცია ---
+# user_id -> (ჩატვირთვის დრო, user_birth_data-ის ჩანაწერი ან None); LRU რიგით
+user_record_cache: OrderedDict[int, tuple[float, dict | None]] = OrderedDict()
+# სხვა პროცესების გასაფრთხილებელი ფუნქციები (name, key); workers.py ბროკერს არეგისტრირებს.
+# ბროკერის გარეთ ჩაწერილ ცვლილებებს (მაგ. ცალკე CLI) ქეშის TTL ზღუდავს
+cache_invalidation_hooks: list = []
+
+def drop_cached(name: str, key=None) -> None:
+    if name == "user_record":
+        user_record_cache.pop(key, None)
+    elif name == "daily_horoscopes":
+        horoscope_cache["day"] = None
+
+def invalidate_cache(name: str, key=None) -> None:
+    drop_cached(name, key)
+    for hook in cache_invalidation_hooks:
+        hook(name, key)
+
+def save_user_data(user_id: int, data: dict, chart_text: str | None = None, model_tier: str | None = None,
+                   chart_version: str | None = None):
     try:
         lang_code_to_save = data.get('lang_code', DEFAULT_LANGUAGE)
         conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO user_birth_data
-            (user_id, name, year, month, day, hour, minute, city, nation, language_code, full_chart_text)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            (user_id, name, year, month, day, hour, minute, city, nation, language_code, full_chart_text, model_tier, chart_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             user_id, data.get('name'), data.get('year'), data.get('month'), data.get('day'),
             data.get('hour'), data.get('minute'), data.get('city'), data.get('nation'),
-            lang_code_to_save, chart_text
+            lang_code_to_save, chart_text, model_tier, chart_version
         ))
+        if chart_text is not None:
+            # ახალი ინტერპრეტაცია ძველი ენობრივი ვარიანტების თარგმანებს აძველებს
+            cursor.execute("DELETE FROM chart_interpretations WHERE user_id = ?", (user_id,))
+            cursor.execute(
+                "INSERT INTO chart_interpretations (user_id, language_code, full_chart_text, model_tier) VALUES (?, ?, ?, ?)",
+                (user_id, lang_code_to_save, chart_text, model_tier)
+            )
         conn.commit()
         conn.close()
+        invalidate_cache("user_record", user_id)
         logger.info(f"Data saved for user {user_id}")
         return True
     except sqlite3.Error as e:
@@ -405,6 +699,10 @@ def save_user_data(user_id: int, data: dict, chart_text: str | None = None):
         return False
 
 def get_user_data(user_id: int) -> dict | None:
+    cached = user_record_cache.get(user_id)
+    if cached and time.monotonic() - cached[0] < USER_RECORD_CACHE_TTL_SECONDS:
+        user_record_cache.move_to_end(user_id)
+        return dict(cached[1]) if cached[1] else None
     try:
         conn = sqlite3.connect(DB_FILE)
         conn.row_factory = sqlite3.Row
@@ -412,18 +710,350 @@ def get_user_data(user_id: int) -> dict | None:
         cursor.execute("SELECT * FROM user_birth_data WHERE user_id = ?", (user_id,))
         row = cursor.fetchone()
         conn.close()
-        return dict(row) if row else None
     except sqlite3.Error as e:
         logger.error(f"Error retrieving data for user {user_id}: {e}")
         return None
+    record = dict(row) if row else None
+    user_record_cache[user_id] = (time.monotonic(), record)
+    user_record_cache.move_to_end(user_id)
+    while len(user_record_cache) > USER_RECORD_CACHE_SIZE:
+        user_record_cache.popitem(last=False)
+    # გამომძახებლები ჩანაწერს ცვლიან, ამიტომ ყოველთვის ასლი ბრუნდება
+    return dict(record) if record else None
+
+def save_user_languages(rows: list[tuple[int, str]]) -> bool:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.executemany("INSERT OR REPLACE INTO user_languages (user_id, language_code) VALUES (?, ?)", rows)
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error saving languages for {len(rows)} users: {e}")
+        return False
+
+def get_user_language(user_id: int) -> str | None:
+    # გამოდევნისას შენახული ენა, თუ არა და რუკის შენახვისას არჩეული
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT language_code FROM user_languages WHERE user_id = ?
+            UNION ALL
+            SELECT language_code FROM user_birth_data WHERE user_id = ? AND language_code IS NOT NULL
+            LIMIT 1
+        """, (user_id, user_id))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving language for user {user_id}: {e}")
+        return None
+
+def save_chart_variant(user_id: int, lang_code: str, chart_text: str, source_text: str, model_tier: str | None = None):
+    # თარგმანი მხოლოდ მაშინ ინახება, თუ თარგმნისას მომხმარებელს ახალი რუკა არ შეუქმნია:
+    # წინააღმდეგ შემთხვევაში save_user_data-ს მიერ გასუფთავებულ ცხრილში ძველი რუკის თარგმანი ჩაიწერებოდა
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO chart_interpretations (user_id, language_code, full_chart_text, model_tier)
+            SELECT ?, ?, ?, ?
+            WHERE EXISTS (SELECT 1 FROM user_birth_data WHERE user_id = ? AND full_chart_text = ?)
+        """, (user_id, lang_code, chart_text, model_tier, user_id, source_text))
+        saved = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        if saved:
+            logger.info(f"Chart variant '{lang_code}' saved for user {user_id}")
+        else:
+            logger.info(f"Chart variant '{lang_code}' for user {user_id} discarded: the chart changed during translation.")
+        return saved
+    except sqlite3.Error as e:
+        logger.error(f"Error saving chart variant '{lang_code}' for user {user_id}: {e}")
+        return False
+
+def get_chart_variants(user_id: int) -> dict[str, dict]:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM chart_interpretations WHERE user_id = ?", (user_id,))
+        rows = {row['language_code']: dict(row) for row in cursor.fetchall()}
+        conn.close()
+        return rows
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving chart variants for user {user_id}: {e}")
+        return {}
+
+def save_daily_horoscopes(day: str, lang_code: str, texts: dict[str, str]):
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO daily_horoscopes (day, sign, language_code, text) VALUES (?, ?, ?, ?)",
+            [(day, sign, lang_code, text) for sign, text in texts.items()]
+        )
+        cutoff = (datetime.fromisoformat(day) - timedelta(days=HOROSCOPE_RETENTION_DAYS)).date().isoformat()
+        cursor.execute("DELETE FROM daily_horoscopes WHERE day < ?", (cutoff,))
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error saving horoscopes for {day}/{lang_code}: {e}")
+        return False
+
+def get_daily_horoscopes(day: str) -> dict[tuple[str, str], str]:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("SELECT sign, language_code, text FROM daily_horoscopes WHERE day = ?", (day,))
+        rows = {(sign, lang_code): text for sign, lang_code, text in cursor.fetchall()}
+        conn.close()
+        return rows
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving horoscopes for {day}: {e}")
+        return {}
+
+def save_natal_positions(user_id: int, longitudes: dict[str, float | None]):
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute(
+            f"INSERT OR REPLACE INTO natal_positions (user_id, {', '.join(NATAL_POSITION_COLUMNS)}) "
+            f"VALUES (?{', ?' * len(NATAL_POSITION_COLUMNS)})",
+            (user_id, *(longitudes.get(name) for name in ASPECT_PLANETS))
+        )
+        conn.commit()
+        conn.close()
+        invalidate_cache("natal_positions", user_id)
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error saving natal positions for user {user_id}: {e}")
+        return False
+
+def get_natal_positions(user_ids: list[int] | None = None) -> tuple[list[int], list[tuple], list[str]] | None:
+    # ტრანზიტების ძრავისა და სინასტრიის ინდექსისთვის: მომხმარებლები, ASPECT_PLANETS რიგით დალაგებული
+    # გრძედები და ენები; user_ids-ით მხოლოდ მითითებული მომხმარებლები. შეცდომისას None, რომ
+    # გამომძახებელმა ის წაშლილ მომხმარებლებში არ აურიოს
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        user_filter = f"WHERE n.user_id IN ({', '.join('?' * len(user_ids))})" if user_ids is not None else ""
+        # ენა იგივე წყაროდანაა, რასაც get_user_language კითხულობს: ჯერ არჩეული, შემდეგ რუკის შენახვისას
+        cursor.execute(f"""
+            SELECT n.user_id, COALESCE(l.language_code, u.language_code, ?), {', '.join(f'n.{column}' for column in NATAL_POSITION_COLUMNS)}
+            FROM natal_positions n JOIN user_birth_data u ON u.user_id = n.user_id
+            LEFT JOIN user_languages l ON l.user_id = n.user_id
+            {user_filter}
+            ORDER BY n.user_id
+        """, (DEFAULT_LANGUAGE, *(user_ids or ())))
+        user_ids, positions, languages = [], [], []
+        for row in cursor:
+            user_ids.append(row[0])
+            languages.append(row[1])
+            positions.append(row[2:])
+        conn.close()
+        return user_ids, positions, languages
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving natal positions: {e}")
+        return None
+
+def get_users_without_natal_positions() -> list[dict]:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT u.* FROM user_birth_data u LEFT JOIN natal_positions n ON n.user_id = u.user_id
+            WHERE n.user_id IS NULL ORDER BY u.user_id
+        """)
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving users without natal positions: {e}")
+        return []
+
+def save_personal_horoscopes(day: str, rows: list[tuple[int, str, str]]):
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO personal_horoscopes (day, user_id, language_code, text) VALUES (?, ?, ?, ?)",
+            [(day, user_id, lang_code, text) for user_id, lang_code, text in rows]
+        )
+        cutoff = (datetime.fromisoformat(day) - timedelta(days=HOROSCOPE_RETENTION_DAYS)).date().isoformat()
+        cursor.execute("DELETE FROM personal_horoscopes WHERE day < ?", (cutoff,))
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error saving personal horoscopes for {day}: {e}")
+        return False
+
+def get_personal_horoscope(day: str, user_id: int, lang_code: str) -> str | None:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT text FROM personal_horoscopes WHERE day = ? AND user_id = ? AND language_code = ?",
+            (day, user_id, lang_code)
+        )
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving personal horoscope for user {user_id}: {e}")
+        return None
+
+def get_personal_horoscope_users(day: str) -> set[int]:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id FROM personal_horoscopes WHERE day = ?", (day,))
+        user_ids = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        return user_ids
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving personal horoscope users for {day}: {e}")
+        return set()
+
+def save_user_chart_fingerprint(user_id: int, fingerprint: str):
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR REPLACE INTO user_chart_images (user_id, fingerprint) VALUES (?, ?)", (user_id, fingerprint))
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error saving chart fingerprint for user {user_id}: {e}")
+        return False
+
+def get_user_chart_fingerprint(user_id: int) -> str | None:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("SELECT fingerprint FROM user_chart_images WHERE user_id = ?", (user_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving chart fingerprint for user {user_id}: {e}")
+        return None
+
+def save_chart_image_file_id(fingerprint: str, theme: str, file_id: str | None):
+    # file_id=None შლის ჩანაწერს (მაგ., Telegram-მა ძველი file_id აღარ მიიღო)
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        if file_id is None:
+            cursor.execute("DELETE FROM chart_images WHERE fingerprint = ? AND theme = ?", (fingerprint, theme))
+        else:
+            cursor.execute(
+                "INSERT OR REPLACE INTO chart_images (fingerprint, theme, file_id) VALUES (?, ?, ?)",
+                (fingerprint, theme, file_id)
+            )
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error saving chart image {fingerprint}/{theme}: {e}")
+        return False
+
+def get_chart_image_file_id(fingerprint: str, theme: str) -> str | None:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("SELECT file_id FROM chart_images WHERE fingerprint = ? AND theme = ?", (fingerprint, theme))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving chart image {fingerprint}/{theme}: {e}")
+        return None
+
+def save_image_reading(kind: str, lang_code: str, file_unique_id: str, image_hash: int, text: str, user_id: int) -> int | None:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO image_readings (kind, language_code, file_unique_id, image_hash, text, user_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (kind, lang_code, file_unique_id, f"{image_hash:016x}", text, user_id, time.time()))
+        reading_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        return reading_id
+    except sqlite3.Error as e:
+        logger.error(f"Error saving {kind} reading {file_unique_id}: {e}")
+        return None
+
+def get_image_reading(kind: str, lang_code: str, file_unique_id: str) -> str | None:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT text FROM image_readings WHERE kind = ? AND language_code = ? AND file_unique_id = ?",
+            (kind, lang_code, file_unique_id)
+        )
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving {kind} reading: {e}")
+        return None
+
+def get_stale_chart_users(after_user_id: int, chart_version: str, limit: int) -> list[dict]:
+    # გასაღების მიხედვით გვერდებად: user_id > after_user_id, მხოლოდ სხვა ვერსიით დაწერილი რუკები
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT * FROM user_birth_data
+            WHERE user_id > ? AND full_chart_text IS NOT NULL AND (chart_version IS NULL OR chart_version != ?)
+            ORDER BY user_id LIMIT ?
+        """, (after_user_id, chart_version, limit))
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving stale charts after user {after_user_id}: {e}")
+        return []
+
+def get_degraded_chart_users(after_user_id: int, limit: int) -> list[dict]:
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM user_birth_data WHERE user_id > ? AND model_tier IS NOT NULL AND model_tier != ? ORDER BY user_id LIMIT ?",
+            (after_user_id, model_router.primary.name, limit)
+        )
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving degraded charts: {e}")
+        return []
 
 def delete_user_data(user_id: int):
     try:
         conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM user_birth_data WHERE user_id = ?", (user_id,))
+        cursor.execute("DELETE FROM chart_interpretations WHERE user_id = ?", (user_id,))
+        cursor.execute("DELETE FROM natal_positions WHERE user_id = ?", (user_id,))
+        cursor.execute("DELETE FROM personal_horoscopes WHERE user_id = ?", (user_id,))
+        cursor.execute("DELETE FROM user_chart_images WHERE user_id = ?", (user_id,))
+        cursor.execute("DELETE FROM user_languages WHERE user_id = ?", (user_id,))
         conn.commit()
         conn.close()
+        invalidate_cache("user_record", user_id)
+        invalidate_cache("natal_positions", user_id)
         logger.info(f"Data deleted for user {user_id}")
         return True
     except sqlite3.Error as e:
@@ -435,37 +1065,168 @@ planet_emojis = {
     "Jupiter": "♃", "Saturn": "♄", "Uranus": "♅", "Neptune": "♆", "Pluto": "♇",
     "Ascendant": "⬆️", "Midheaven": " Mᶜ",
 }
-aspect_translations = {
-    "conjunction": "შეერთება", "opposition": "ოპოზიცია", "square": "კვადრატი",
-    "trine": "ტრიგონი", "sextile": "სექსტილი"
-}
-aspect_symbols = {
-    "conjunction": "☌", "opposition": "☍", "square": "□",
-    "trine": "△", "sextile": "∗"
-}
 
-async def get_gemini_interpretation(prompt: str) -> str:
+# --- პრომპტის სტატიკური ნაწილის ქეში ---
+# (მოდელი, ენა) -> (მოდელი, ვადის ამოწურვის დრო, რეჟიმი "cached" ან "system", სერვერული CachedContent ან None)
+language_models: dict[tuple[str, str], tuple[object, float, str, object]] = {}
+language_models_lock = asyncio.Lock()
+# მოდელები, რომლებმაც ქეშის შექმნა კლიენტის შეცდომით უარყვეს (მაგ. პრეფიქსი მინიმალურ ზომაზე მოკლეა ან
+# მოდელს ქეში არ აქვს): ხელახლა აღარ ვცდით და ყოველ TTL-ზე ზედმეტი ქსელური მოთხოვნა აღარ იგზავნება
+context_cache_unsupported: set[str] = set()
+base_models: dict[str, object] = {}
+prompt_usage_stats: dict[str, dict[str, float]] = {}
+
+def get_base_model(model_name: str = GEMINI_MODEL_NAME):
     if not gemini_model:
-        return "(Gemini API მიუწვდომელია)"
+        return None
+    if model_name == GEMINI_MODEL_NAME:
+        return gemini_model
+    if model_name not in base_models:
+        base_models[model_name] = genai.GenerativeModel(model_name, safety_settings=safety_settings)
+    return base_models[model_name]
+
+def _create_language_model(model_name: str, lang_code: str) -> tuple[object, float, str, object]:
+    from google.api_core import exceptions as google_exceptions
+
+    static_prompt = prompt_compiler.static_prompt(lang_code)
+    expires_at = time.monotonic() + GEMINI_CACHE_TTL_SECONDS
+    if model_name in context_cache_unsupported:
+        model = genai.GenerativeModel(model_name, safety_settings=safety_settings, system_instruction=static_prompt)
+        return model, expires_at, "system", None
     try:
-        response = await gemini_model.generate_content_async(
-            prompt,
-            generation_config={"response_mime_type": "text/plain"},
-            request_options={"timeout": 180}
+        cached_content = genai.caching.CachedContent.create(
+            model=model_name,
+            display_name=f"natal-chart-static-{lang_code}",
+            system_instruction=static_prompt,
+            ttl=timedelta(seconds=GEMINI_CACHE_TTL_SECONDS),
         )
-        if not response.candidates:
-            feedback = getattr(response, 'prompt_feedback', None)
-            block_reason = getattr(feedback, 'block_reason', 'Unknown') if feedback else 'Unknown'
-            logger.warning(f"Gemini response blocked. Reason: {block_reason}")
-            return f"(Gemini-მ დაბლოკა: {block_reason})"
-        if hasattr(response.candidates[0].content, 'parts') and response.candidates[0].content.parts:
-            return "".join(part.text for part in response.candidates[0].content.parts).strip()
-        logger.warning(f"Gemini response invalid.")
-        return "(Gemini-მ არასწორი პასუხი დააბრუნა)"
+        model = genai.GenerativeModel.from_cached_content(cached_content, safety_settings=safety_settings)
+        # ქეში ვადამდე იმდენით ადრე ახლდება, რომ ძველზე დაწყებული მოთხოვნა სერვერზე ვადის ამოწურვამდე დასრულდეს
+        logger.info(f"Gemini cached content created for {model_name}/'{lang_code}'.")
+        return model, expires_at - min(GEMINI_CACHE_GRACE_SECONDS, GEMINI_CACHE_TTL_SECONDS / 2), "cached", cached_content
+    except google_exceptions.ClientError as e:
+        if isinstance(e, google_exceptions.TooManyRequests):
+            logger.warning(f"Gemini context caching rate-limited for {model_name}/'{lang_code}': {e}. Using system instruction.")
+        else:
+            # მაგ., სტატიკური ნაწილი მოდელის მინიმალურ ზომაზე მოკლეა ან მოდელს ქეში არ აქვს
+            context_cache_unsupported.add(model_name)
+            logger.info(f"Gemini context caching unsupported for {model_name} ({type(e).__name__}: {e}). Using system instruction from now on.")
+    except Exception as e:
+        logger.warning(f"Gemini context caching failed for {model_name}/'{lang_code}' ({type(e).__name__}: {e}). Using system instruction.")
+    model = genai.GenerativeModel(model_name, safety_settings=safety_settings, system_instruction=static_prompt)
+    return model, expires_at, "system", None
+
+def delete_cached_content(cached_content) -> None:
+    # ჩანაცვლებული ქეში სერვერზე TTL-მდე აღარ უნდა დარჩეს (მისი შენახვაც ღირს)
+    if cached_content is None:
+        return
+    try:
+        cached_content.delete()
+    except Exception as e:
+        logger.warning(f"Could not delete Gemini cached content {getattr(cached_content, 'name', '?')}: {e}")
+
+async def delete_cached_content_later(cached_content, delay: float = GEMINI_CACHE_GRACE_SECONDS) -> None:
+    await asyncio.sleep(delay)
+    await asyncio.to_thread(delete_cached_content, cached_content)
+
+def drop_language_model(key: tuple[str, str], entry: tuple) -> None:
+    # მხოლოდ ის ჩანაწერი იშლება, რომლითაც მოთხოვნა ჩავარდა: სხვა კორუტინის მიერ უკვე ჩანაცვლებული ახალი
+    # რჩება. სერვერულ ქეშს არ ვშლით, მას სხვა მიმდინარე მოთხოვნები შეიძლება იყენებდეს; TTL თავად წაშლის
+    if language_models.get(key) is entry:
+        del language_models[key]
+
+async def get_language_model(lang_code: str, model_name: str = GEMINI_MODEL_NAME) -> tuple | None:
+    # ბრუნდება ჩანაწერი (მოდელი, ვადა, რეჟიმი, CachedContent) ან None
+    if not await ensure_gemini():
+        return None
+    key = (model_name, lang_code)
+    entry = language_models.get(key)
+    if entry and entry[1] > time.monotonic():
+        return entry
+    async with language_models_lock:
+        entry = language_models.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry
+        try:
+            new_entry = await asyncio.to_thread(_create_language_model, model_name, lang_code)
+        except Exception as e:
+            logger.error(f"Failed to prepare Gemini model {model_name} for '{lang_code}': {e}", exc_info=True)
+            return None
+        if entry:
+            if entry[3] is not None:
+                asyncio.create_task(delete_cached_content_later(entry[3]))
+        else:
+            asyncio.create_task(log_prompt_token_savings(lang_code))
+        language_models[key] = new_entry
+        return new_entry
+
+async def log_prompt_token_savings(lang_code: str):
+    try:
+        static_tokens = (await gemini_model.count_tokens_async(prompt_compiler.static_prompt(lang_code))).total_tokens
+        logger.info(f"Static prompt prefix for '{lang_code}': {static_tokens} input tokens moved out of every request.")
+    except Exception as e:
+        logger.warning(f"Could not count static prompt tokens for '{lang_code}': {e}")
+
+def record_prompt_usage(mode: str, response, latency: float):
+    usage = getattr(response, 'usage_metadata', None)
+    stats = prompt_usage_stats.setdefault(mode, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "latency": 0.0})
+    stats["requests"] += 1
+    stats["prompt_tokens"] += getattr(usage, 'prompt_token_count', 0) or 0
+    stats["cached_tokens"] += getattr(usage, 'cached_content_token_count', 0) or 0
+    stats["latency"] += latency
+    n = stats["requests"]
+    logger.info(
+        f"Gemini [{mode}] prompt tokens: {getattr(usage, 'prompt_token_count', '?')}, latency {latency:.1f}s "
+        f"(avg over {n}: {stats['prompt_tokens'] / n:.0f} tokens, {stats['cached_tokens'] / n:.0f} cached, {stats['latency'] / n:.1f}s)"
+    )
+
+async def request_gemini(model, prompt: str | list, mode: str) -> str:
+    started = time.monotonic()
+    response = await model.generate_content_async(
+        prompt,
+        generation_config={"response_mime_type": "text/plain"},
+        request_options={"timeout": GEMINI_REQUEST_TIMEOUT_SECONDS}
+    )
+    record_prompt_usage(mode, response, time.monotonic() - started)
+    if not response.candidates:
+        feedback = getattr(response, 'prompt_feedback', None)
+        block_reason = getattr(feedback, 'block_reason', 'Unknown') if feedback else 'Unknown'
+        logger.warning(f"Gemini response blocked. Reason: {block_reason}")
+        return f"(Gemini-მ დაბლოკა: {block_reason})"
+    if hasattr(response.candidates[0].content, 'parts') and response.candidates[0].content.parts:
+        return "".join(part.text for part in response.candidates[0].content.parts).strip()
+    logger.warning(f"Gemini response invalid.")
+    return "(Gemini-მ არასწორი პასუხი დააბრუნა)"
+
+async def get_gemini_interpretation(prompt: str, model_name: str = GEMINI_MODEL_NAME, image_jpeg: bytes | None = None) -> str:
+    await ensure_gemini()
+    model = get_base_model(model_name)
+    if not model:
+        return "(Gemini API მიუწვდომელია)"
+    try:
+        if image_jpeg is not None:
+            return await request_gemini(model, [prompt, {"mime_type": "image/jpeg", "data": image_jpeg}], "vision")
+        return await request_gemini(model, prompt, "full")
     except Exception as e:
         logger.error(f"Gemini error: {e}", exc_info=True)
         return f"(შეცდომა: {type(e).__name__})"
 
+async def get_chart_interpretation(lang_code: str, user_prompt: str, model_name: str = GEMINI_MODEL_NAME) -> str:
+    from google.api_core import exceptions as google_exceptions
+
+    entry = await get_language_model(lang_code, model_name)
+    if entry is not None:
+        model, _, mode, _ = entry
+        try:
+            return await request_gemini(model, user_prompt, mode)
+        except Exception as e:
+            logger.warning(f"Gemini [{mode}] request failed for {model_name}/'{lang_code}', falling back to full prompt: {e}")
+            # კლიენტის შეცდომა (მაგ. სერვერზე ქეში აღარ არსებობს) ჩანაწერს აუქმებს; დროის ამოწურვა,
+            # სერვერის შეცდომა ან 429 ჩვეულებრივი ჩავარდნაა და ჩანაწერი რჩება
+            if isinstance(e, google_exceptions.ClientError) and not isinstance(e, google_exceptions.TooManyRequests):
+                drop_language_model((model_name, lang_code), entry)
+    return await get_gemini_interpretation(prompt_compiler.static_prompt(lang_code) + "\n\n" + user_prompt, model_name)
+
 def split_text(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT - 100) -> list[str]:
     parts = []
     current_part = ""
@@ -502,6 +1263,407 @@ def get_main_menu_keyboard(lang_code: str):
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+# --- რუკის გამოთვლა და ინტერპრეტაცია ---
+class ChartLocationError(Exception):
+    # KerykeionException-ის შეფუთვა: ჰენდლერებს kerykeion-ის იმპორტი რომ არ დასჭირდეთ
+    pass
+
+def create_subject(data: dict) -> "AstrologicalSubject":
+    from kerykeion import AstrologicalSubject
+    from kerykeion.kr_types import KerykeionException
+
+    try:
+        return AstrologicalSubject(
+            data.get('name', 'User'), data['year'], data['month'], data['day'], data['hour'], data['minute'],
+            data['city'], nation=data.get('nation'), geonames_username=GEONAMES_USERNAME
+        )
+    except KerykeionException as ke:
+        raise ChartLocationError(str(ke)) from ke
+
+def calculate_chart(data: dict) -> tuple["AstrologicalSubject", list[dict], list[dict], bool]:
+    from kerykeion import NatalAspects
+
+    subject_instance = create_subject(data)
+
+    aspects_for_prompt = []
+    aspect_error = False
+    try:
+        aspect_calculator = NatalAspects(
+            subject_instance,
+            aspects_list=MAJOR_ASPECTS_TYPES,
+            planets_to_consider=ASPECT_PLANETS,
+            orb_dictionary=ASPECT_ORBS
+        )
+        all_filtered_aspects = aspect_calculator.get_relevant_aspects()
+        for aspect in all_filtered_aspects or []:
+            p1 = aspect.get('p1_name')
+            p2 = aspect.get('p2_name')
+            aspect_type = aspect.get('aspect')
+            if p1 and p2 and aspect_type:
+                aspects_for_prompt.append({"p1": p1, "aspect": aspect_type, "p2": p2, "orb": abs(aspect.get('orbit', 0.0))})
+    except Exception as aspect_err:
+        logger.error(f"Aspect calculation error: {aspect_err}", exc_info=True)
+        aspect_error = True
+
+    planets_for_prompt = []
+    planet_list_for_prompt = ['Sun', 'Moon', 'Mercury', 'Venus', 'Mars', 'Jupiter', 'Saturn', 'Uranus', 'Neptune', 'Pluto', 'Ascendant', 'Midheaven']
+    for planet_name in planet_list_for_prompt:
+        try:
+            obj_name_in_kerykeion = planet_name.lower()
+            if planet_name == "Midheaven": obj_name_in_kerykeion = "mc"
+            elif planet_name == "Ascendant": obj_name_in_kerykeion = "ascendant"
+            planet_obj = getattr(subject_instance, obj_name_in_kerykeion)
+            planets_for_prompt.append({
+                "name": planet_name,
+                "sign": planet_obj.get('sign', '?'),
+                "position": planet_obj.get('position', 0.0),
+                "house": house_number(planet_obj.get('house')),
+                "retro": planet_obj.get('retrograde') is True or planet_obj.get('isRetro') == 'true',
+            })
+        except AttributeError:
+            if planet_name == "Ascendant": planet_obj = getattr(subject_instance, "first_house", None)
+            elif planet_name == "Midheaven": planet_obj = getattr(subject_instance, "tenth_house", None)
+            else: planet_obj = None
+            if planet_obj:
+                planets_for_prompt.append({"name": planet_name, "sign": planet_obj.get('sign', '?'), "position": planet_obj.get('position', 0.0)})
+            else:
+                logger.error(f"Error getting data for {planet_name}")
+        except Exception as e:
+            logger.error(f"Error getting data for {planet_name}: {e}")
+    return subject_instance, planets_for_prompt, aspects_for_prompt, aspect_error
+
+def chart_version_stamp(tier: ModelTier) -> str:
+    # რუკის ტექსტის ვერსია: პრომპტის ვერსია + მოდელი (+ მოკლე ინსტრუქციები)
+    return f"p{PROMPT_VERSION}:{tier.model_name}{':brief' if tier.brief else ''}"
+
+async def interpret_chart(data: dict, lang_code: str, planets: list[dict], aspects: list[dict],
+                          tier: ModelTier | None = None, interactive: bool = True) -> tuple[str, ModelTier]:
+    tier = tier or model_router.choose()
+    compiled_prompt = prompt_compiler.compile(
+        lang_code,
+        {key: data.get(key) for key in ("name", "year", "month", "day", "hour", "minute", "city", "nation")},
+        planets,
+        aspects,
+        brief=tier.brief,
+    )
+    logger.info(
+        f"Prompt v{PROMPT_VERSION} ({tier.name} tier, queue {model_router.queue_depth}): "
+        f"~{compiled_prompt.static_tokens}+{compiled_prompt.user_tokens} tokens"
+        + (f", dropped {len(compiled_prompt.dropped_aspects)} aspects for budget" if compiled_prompt.dropped_aspects else "")
+    )
+    async with model_router.slot(interactive=interactive):
+        text = await get_chart_interpretation(lang_code, compiled_prompt.user_prompt, tier.model_name)
+    return text, tier
+
+# keyset-კურსორი გაშვებებს შორის: ყოველი გაშვება წინა ბოლო user_id-დან აგრძელებს, ამიტომ მუდმივად
+# წარუმატებელი ჩანაწერები დანარჩენებს არ ბლოკავს; ცხრილის ბოლოს კურსორი თავიდან იწყება
+degraded_upgrade_cursor = 0
+
+async def upgrade_degraded_charts(context: ContextTypes.DEFAULT_TYPE) -> None:
+    # დატვირთვის კლებისას შემცირებულ რეჟიმში შექმნილი რუკები სრულად გადაიწერება
+    global degraded_upgrade_cursor
+    if not model_router.is_idle() or not await ensure_gemini():
+        return
+    rows = get_degraded_chart_users(degraded_upgrade_cursor, DEGRADED_UPGRADE_BATCH)
+    if not rows and degraded_upgrade_cursor:
+        degraded_upgrade_cursor = 0
+        rows = get_degraded_chart_users(0, DEGRADED_UPGRADE_BATCH)
+    for row in rows:
+        if not model_router.is_idle():
+            break
+        degraded_upgrade_cursor = row['user_id']
+        lang_code = row.get('language_code') or DEFAULT_LANGUAGE
+        try:
+            _, planets, aspects, _ = await asyncio.to_thread(calculate_chart, row)
+            text, tier = await interpret_chart(row, lang_code, planets, aspects, tier=model_router.primary, interactive=False)
+        except Exception as e:
+            logger.error(f"Background upgrade failed for user {row['user_id']}: {e}", exc_info=True)
+            continue
+        if text.startswith("("):
+            logger.warning(f"Background upgrade for user {row['user_id']} returned no interpretation: {text}")
+            continue
+        current = get_user_data(row['user_id'])
+        birth_fields = ('name', 'year', 'month', 'day', 'hour', 'minute', 'city', 'nation')
+        if not current or any(current.get(f) != row.get(f) for f in birth_fields):
+            continue
+        save_user_data(row['user_id'], {**row, 'lang_code': lang_code}, chart_text=text, model_tier=tier.name,
+                       chart_version=chart_version_stamp(tier))
+        logger.info(f"Upgraded degraded chart for user {row['user_id']} to {tier.name} tier.")
+
+# --- რუკის სურათი ---
+async def send_cached_chart_image(context: ContextTypes.DEFAULT_TYPE, chat_id: int, fingerprint: str) -> bool:
+    file_id = get_chart_image_file_id(fingerprint, chart_renderer.theme)
+    if not file_id:
+        return False
+    try:
+        await context.bot.send_photo(chat_id=chat_id, photo=file_id)
+    except BadRequest as e:
+        logger.warning(f"Stored chart image file_id rejected ({e}); it will be re-uploaded.")
+        save_chart_image_file_id(fingerprint, chart_renderer.theme, None)
+        return False
+    chart_renderer.stats.counts["file_id"] += 1
+    return True
+
+async def send_chart_image(context: ContextTypes.DEFAULT_TYPE, chat_id: int, user_id: int, subject_instance, lang_code: str) -> None:
+    try:
+        fingerprint = chart_fingerprint(subject_instance, lang_code)
+        save_user_chart_fingerprint(user_id, fingerprint)
+        if not await send_cached_chart_image(context, chat_id, fingerprint):
+            fingerprint, png = await chart_renderer.render(subject_instance, lang_code)
+            message = await context.bot.send_photo(chat_id=chat_id, photo=png)
+            save_chart_image_file_id(fingerprint, chart_renderer.theme, message.photo[-1].file_id)
+    except Exception as e:
+        chart_renderer.stats.counts["failed"] += 1
+        logger.error(f"Chart image for user {user_id} failed: {type(e).__name__}: {e}")
+    logger.info(f"Chart images: {chart_renderer.stats.summary()}")
+
+async def send_saved_chart_image(context: ContextTypes.DEFAULT_TYPE, chat_id: int, user_id: int, user_data: dict, lang_code: str) -> None:
+    fingerprint = get_user_chart_fingerprint(user_id)
+    if fingerprint and await send_cached_chart_image(context, chat_id, fingerprint):
+        return
+    # file_id არ არის (ჯერ არ ატვირთულა, Telegram-მა უარყო ან რუკა სურათების დამატებამდე შეიქმნა):
+    # სურათი თავიდან იხატება, დისკის ქეშის გავლით
+    try:
+        subject_instance = await asyncio.to_thread(create_subject, user_data)
+    except Exception as e:
+        chart_renderer.stats.counts["failed"] += 1
+        logger.error(f"Chart image for user {user_id} failed: {type(e).__name__}: {e}")
+        return
+    await send_chart_image(context, chat_id, user_id, subject_instance, lang_code)
+
+async def shutdown_worker_pools(application: Application) -> None:
+    chart_renderer.shutdown()
+    image_pipeline.shutdown()
+
+# --- მეხსიერებაში მყოფი მდგომარეობა ---
+def get_idle_tracker(context: ContextTypes.DEFAULT_TYPE) -> IdleTracker:
+    # თითო Application-ს თავისი ტრეკერი აქვს (ერთ პროცესში რამდენიმე ვორკერი შეიძლება იყოს)
+    tracker = context.bot_data.get('idle_tracker')
+    if tracker is None:
+        tracker = context.bot_data['idle_tracker'] = IdleTracker(
+            USER_STATE_TTL_SECONDS, USER_STATE_MAX_USERS, min_idle=CONVERSATION_TIMEOUT_SECONDS
+        )
+    return tracker
+
+async def track_user_state(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    user = update.effective_user
+    if user is None:
+        return
+    get_idle_tracker(context).touch(user.id, update.effective_chat.id if update.effective_chat else None, time.monotonic())
+    # გამოდევნილი მომხმარებლის ენა ბაზიდან ბრუნდება, სანამ რომელიმე ჰენდლერი მას წაიკითხავს.
+    # ვისაც ენა ჯერ არ აურჩევია, მის ყოველ update-ზე ბაზას აღარ ვკითხულობთ: ჩანაწერი გამოდევნამდე რჩება
+    language_misses = context.bot_data.setdefault('language_misses', set())
+    if 'lang_code' not in context.user_data and user.id not in language_misses:
+        lang_code = await asyncio.to_thread(get_user_language, user.id)
+        if lang_code:
+            context.user_data['lang_code'] = lang_code
+        else:
+            language_misses.add(user.id)
+
+async def evict_idle_user_state(context: ContextTypes.DEFAULT_TYPE) -> None:
+    application = context.application
+    idle_tracker = get_idle_tracker(context)
+    now = time.monotonic()
+    if len(idle_tracker.users) < len(application.user_data) or len(idle_tracker.chats) < len(application.chat_data):
+        idle_tracker.adopt(application.user_data.keys(), application.chat_data.keys(), now)
+    # გადატვირთვის შემდეგ აღდგენილ საუბრებს ConversationHandler ტაიმაუტს არ უნიშნავს, ამიტომ ისინი
+    # მომხმარებელთან ერთად აქ იშლება (წაშლა persistence-ში update_persistence-ით გადადის)
+    conversations = [
+        handler._conversations for handlers in application.handlers.values() for handler in handlers
+        if isinstance(handler, ConversationHandler) and handler.persistent
+    ]
+    conversation_users = {key[-1] for states in conversations for key in states}
+    if not conversation_users <= idle_tracker.users.keys():
+        idle_tracker.adopt(conversation_users, (), now)
+    user_ids, chat_ids = idle_tracker.expired(now)
+    if not user_ids and not chat_ids:
+        return
+    languages = [
+        (user_id, application.user_data[user_id]['lang_code'])
+        for user_id in user_ids if 'lang_code' in application.user_data.get(user_id, {})
+    ]
+    if languages and not await asyncio.to_thread(save_user_languages, languages):
+        # ენა რომ არ დაიკარგოს, ამ ჯერზე არავის ვდევნით; შემდეგი გაწმენდა ისევ სცდის
+        idle_tracker.adopt(user_ids, chat_ids, now)
+        return
+    language_misses = context.bot_data.setdefault('language_misses', set())
+    for user_id in user_ids:
+        application.drop_user_data(user_id)
+        language_misses.discard(user_id)
+    for chat_id in chat_ids:
+        application.drop_chat_data(chat_id)
+    evicted, dropped_conversations = set(user_ids), 0
+    for states in conversations:
+        for key in [key for key in states if key[-1] in evicted]:
+            del states[key]
+            dropped_conversations += 1
+    logger.info(
+        f"Evicted {len(user_ids)} idle users ({dropped_conversations} open conversations) and {len(chat_ids)} chats; "
+        f"{len(application.user_data)} users and {len(application.chat_data)} chats in memory"
+    )
+
+# --- ფოტოს წაკითხვა (ქირომანტია, ყავა) ---
+async def read_image(kind: str, lang_code: str, photo, started: float, user_id: int) -> str | None:
+    try:
+        telegram_file = await photo.get_file()
+        data = bytes(await telegram_file.download_as_bytearray())
+        image_jpeg, image_hash = await image_pipeline.prepare(data)
+    except Exception as e:
+        logger.error(f"Image preparation failed for {kind}: {type(e).__name__}: {e}")
+        return None
+
+    tier = model_router.choose()
+    async with model_router.slot(track_latency=False):
+        text = await get_gemini_interpretation(get_text(f"gemini_{kind}_prompt", lang_code), tier.model_name, image_jpeg=image_jpeg)
+    if text.startswith("("):
+        logger.warning(f"{kind} reading failed: {text}")
+        return None
+    save_image_reading(kind, lang_code, photo.file_unique_id, image_hash, text, user_id)
+    image_pipeline.record("model", time.monotonic() - started, len(image_jpeg))
+    return text
+
+async def image_reading_start(update: Update, context: ContextTypes.DEFAULT_TYPE, kind: str) -> None:
+    lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
+    context.user_data.pop('awaiting_dream', None)
+    context.user_data['awaiting_image'] = kind
+    await update.message.reply_text(get_text(f"{kind}_send_photo", lang_code))
+
+async def handle_reading_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
+    kind = context.user_data.get('awaiting_image')
+    if kind is None:
+        await update.message.reply_text(get_text("image_reading_choose_feature", lang_code), reply_markup=get_main_menu_keyboard(lang_code))
+        return
+    started = time.monotonic()
+    photo = image_pipeline.select(update.message.photo)
+    text = get_image_reading(kind, lang_code, photo.file_unique_id)
+    if text:
+        image_pipeline.record("file_unique_id", time.monotonic() - started)
+        processing_message = None
+    else:
+        processing_message = await update.message.reply_text(get_text("image_reading_processing", lang_code))
+        text = await read_image(kind, lang_code, photo, started, update.effective_user.id)
+    logger.info(f"Image readings: {image_pipeline.summary()}")
+    if text is None:
+        await processing_message.edit_text(get_text("image_reading_failed", lang_code))
+        return
+    context.user_data.pop('awaiting_image', None)
+    parts = split_text(text)
+    if processing_message:
+        await processing_message.edit_text(parts[0])
+    else:
+        await update.message.reply_text(parts[0])
+    for part in parts[1:]:
+        await update.message.reply_text(part)
+    await update.message.reply_text(get_text("main_menu_text", lang_code), reply_markup=get_main_menu_keyboard(lang_code))
+
+# --- სიზმრის ახსნა ---
+async def interpret_dream(dream: str, lang_code: str) -> str | None:
+    dream_cache = get_dream_cache()
+    match = dream_cache.lookup(dream, lang_code)
+    if match and match.kind == "hit":
+        logger.info(f"Dream answered from cache (similarity {match.similarity:.2f}). {dream_cache.summary()}")
+        return match.interpretation
+    if match:
+        prompt = get_text("gemini_dream_seeded_prompt", lang_code).format(
+            dream=dream, reference_dream=match.dream, reference=match.interpretation
+        )
+    else:
+        prompt = get_text("gemini_dream_prompt", lang_code).format(dream=dream)
+    tier = model_router.choose()
+    async with model_router.slot(track_latency=False):
+        interpretation = await get_gemini_interpretation(prompt, tier.model_name)
+    if interpretation.startswith("("):
+        logger.warning(f"Dream interpretation failed: {interpretation}")
+        return None
+    dream_cache.add(dream, lang_code, interpretation)
+    logger.info(f"Dream interpreted by model ({'seeded' if match else 'new'}). {dream_cache.summary()}")
+    return interpretation
+
+async def dream_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
+    context.user_data.pop('awaiting_image', None)
+    context.user_data['awaiting_dream'] = True
+    await update.message.reply_text(get_text("dream_send_text", lang_code))
+
+async def handle_dream_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not context.user_data.pop('awaiting_dream', False):
+        return
+    lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
+    processing_message = await update.message.reply_text(get_text("dream_processing", lang_code))
+    interpretation = await interpret_dream(update.message.text, lang_code)
+    if interpretation is None:
+        await processing_message.edit_text(get_text("dream_failed", lang_code))
+        return
+    parts = split_text(interpretation)
+    await processing_message.edit_text(parts[0])
+    for part in parts[1:]:
+        await update.message.reply_text(part)
+    await update.message.reply_text(get_text("main_menu_text", lang_code), reply_markup=get_main_menu_keyboard(lang_code))
+
+# --- ენობრივი ვარიანტები ---
+SECTION_PATTERNS = {
+    "pis": r"\[SECTION:\s*PlanetsInSignsStart\](.*?)\[SECTION:\s*PlanetsInSignsEnd\]",
+    "pih": r"\[SECTION:\s*PlanetsInHousesStart\](.*?)\[SECTION:\s*PlanetsInHousesEnd\]",
+    "aspects": r"\[SECTION:\s*AspectsStart\](.*?)\[SECTION:\s*AspectsEnd\]",
+}
+SECTION_MARKERS = {
+    "pis": ("PlanetsInSignsStart", "PlanetsInSignsEnd"),
+    "pih": ("PlanetsInHousesStart", "PlanetsInHousesEnd"),
+    "aspects": ("AspectsStart", "AspectsEnd"),
+}
+
+def extract_sections(text: str) -> dict[str, str]:
+    sections = {}
+    for key, pattern in SECTION_PATTERNS.items():
+        match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+        if match and match.group(1).strip():
+            sections[key] = match.group(1).strip()
+    return sections
+
+async def translate_chart_text(text: str, source_lang: str, target_lang: str, interactive: bool = True) -> str | None:
+    sections = extract_sections(text)
+    if sections:
+        text = "\n\n".join(
+            f"[SECTION: {SECTION_MARKERS[key][0]}]\n{body}\n[SECTION: {SECTION_MARKERS[key][1]}]"
+            for key, body in sections.items()
+        )
+    tier = model_router.choose()
+    async with model_router.slot(interactive=interactive):
+        translated = await get_gemini_interpretation(translation_prompt(text, source_lang, target_lang), tier.model_name)
+    if not translated or translated.startswith("("):
+        logger.warning(f"Chart translation {source_lang}->{target_lang} failed: {translated}")
+        return None
+    return translated
+
+async def get_localized_chart_text(user_id: int, lang_code: str, user_data: dict | None = None,
+                                   interactive: bool = True) -> str | None:
+    # საწყისი ტექსტი ვარიანტებამდე იკითხება: თუ შორის ახალი რუკა შეინახა, თარგმანი არ ჩაიწერება
+    source_text = (get_user_data(user_id) or {}).get('full_chart_text')
+    variants = get_chart_variants(user_id)
+    if lang_code in variants:
+        return variants[lang_code]['full_chart_text']
+    if not variants:
+        return (user_data or {}).get('full_chart_text')
+    source_lang = (user_data or {}).get('language_code')
+    source = variants.get(source_lang) or next(iter(variants.values()))
+    translated = await translate_chart_text(source['full_chart_text'], source['language_code'], lang_code, interactive)
+    if translated is None:
+        return source['full_chart_text']
+    if source_text is not None:
+        save_chart_variant(user_id, lang_code, translated, source_text, source.get('model_tier'))
+    return translated
+
+async def pregenerate_chart_variants(user_id: int, source_lang: str) -> None:
+    for lang_code in translations:
+        if lang_code == source_lang:
+            continue
+        if not model_router.is_idle():
+            logger.info(f"Skipping chart variant pre-generation for user {user_id}: router busy.")
+            return
+        if lang_code not in get_chart_variants(user_id):
+            await get_localized_chart_text(user_id, lang_code, interactive=False)
+
 async def generate_and_send_chart(user_id: int, chat_id: int, context: ContextTypes.DEFAULT_TYPE, is_new_data: bool = False, data_to_process: dict | None = None):
     lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
     current_user_data = data_to_process or get_user_data(user_id)
@@ -523,11 +1685,18 @@ async def generate_and_send_chart(user_id: int, chat_id: int, context: ContextTy
         await context.bot.send_message(chat_id=chat_id, text="მონაცემები არასრულია.")
         return ConversationHandler.END
 
-    if not is_new_data and current_user_data.get('full_chart_text'):
-        logger.info(f"Displaying saved chart for user {user_id}")
-        parts = split_text(current_user_data['full_chart_text'])
+    saved_chart_text = None
+    if not is_new_data:
+        variants = get_chart_variants(user_id)
+        if variants and lang_code not in variants:
+            await context.bot.send_message(chat_id=chat_id, text=get_text("translating_chart", lang_code))
+        saved_chart_text = await get_localized_chart_text(user_id, lang_code, current_user_data)
+    if saved_chart_text:
+        logger.info(f"Displaying saved '{lang_code}' chart for user {user_id}")
+        parts = split_text(saved_chart_text)
         for part in parts:
             await context.bot.send_message(chat_id=chat_id, text=part, parse_mode=ParseMode.HTML)
+        await send_saved_chart_image(context, chat_id, user_id, current_user_data, lang_code)
         await context.bot.send_message(chat_id=chat_id, text=get_text("main_menu_text", lang_code), reply_markup=get_main_menu_keyboard(lang_code))
         return ConversationHandler.END
 
@@ -539,103 +1708,24 @@ async def generate_and_send_chart(user_id: int, chat_id: int, context: ContextTy
             logger.warning("GEONAMES_USERNAME not set.")
             await context.bot.send_message(chat_id=chat_id, text=get_text("geonames_warning_user", lang_code))
 
-        subject_instance = await asyncio.to_thread(
-            AstrologicalSubject, name, year, month, day, hour, minute, city, nation=nation, geonames_username=GEONAMES_USERNAME
-        )
+        subject_instance, planets_for_prompt, aspects_for_prompt, aspect_error = await asyncio.to_thread(calculate_chart, current_user_data)
         logger.info(f"Kerykeion data generated for {name}.")
-
-        aspects_data_str_for_prompt = ""
-        try:
-            aspect_calculator = NatalAspects(
-                subject_instance,
-                aspects_list=MAJOR_ASPECTS_TYPES,
-                planets_to_consider=ASPECT_PLANETS,
-                orb_dictionary=ASPECT_ORBS
-            )
-            all_filtered_aspects = aspect_calculator.get_relevant_aspects()
-            if all_filtered_aspects:
-                for aspect in all_filtered_aspects:
-                    p1 = aspect.get('p1_name')
-                    p2 = aspect.get('p2_name')
-                    aspect_type = aspect.get('aspect')
-                    orb = aspect.get('orbit', 0.0)
-                    if p1 and p2 and aspect_type:
-                        aspect_name_ge = aspect_translations.get(aspect_type, aspect_type)
-                        aspect_symbol_char = aspect_symbols.get(aspect_type, "")
-                        p1_emoji = planet_emojis.get(p1, "")
-                        p2_emoji = planet_emojis.get(p2, "")
-                        aspects_data_str_for_prompt += f"- {p1_emoji}{p1} {aspect_symbol_char} {p2_emoji}{p2} ({aspect_name_ge}, ორბისი {orb:.1f}°)\n"
-            if not aspects_data_str_for_prompt:
-                aspects_data_str_for_prompt = "- მნიშვნელოვანი ასპექტები ვერ მოიძებნა.\n"
-        except Exception as aspect_err:
-            logger.error(f"Aspect calculation error: {aspect_err}", exc_info=True)
-            aspects_data_str_for_prompt = "- ასპექტების გამოთვლის შეცდომა.\n"
+        from transits import subject_longitudes
+        save_natal_positions(user_id, subject_longitudes(subject_instance, ASPECT_PLANETS))
+        if aspect_error:
             await context.bot.send_message(chat_id=chat_id, text=get_text("aspect_calculation_error_user", lang_code))
 
-        planets_data_str_for_prompt = ""
-        planet_list_for_prompt = ['Sun', 'Moon', 'Mercury', 'Venus', 'Mars', 'Jupiter', 'Saturn', 'Uranus', 'Neptune', 'Pluto', 'Ascendant', 'Midheaven']
-        for planet_name in planet_list_for_prompt:
-            try:
-                obj_name_in_kerykeion = planet_name.lower()
-                if planet_name == "Midheaven": obj_name_in_kerykeion = "mc"
-                elif planet_name == "Ascendant": obj_name_in_kerykeion = "ascendant"
-                planet_obj = getattr(subject_instance, obj_name_in_kerykeion)
-                sign = planet_obj.get('sign', '?')
-                pos = planet_obj.get('position', 0.0)
-                house_val = planet_obj.get('house')
-                house_str = f", {house_val}-ე სახლი" if isinstance(house_val, int) else ""
-                retro = " (R)" if planet_obj.get('isRetro') == 'true' else ""
-                planets_data_str_for_prompt += f"- {planet_name}: {sign} {pos:.2f}°{house_str}{retro}\n"
-            except AttributeError:
-                if planet_name == "Ascendant": planet_obj = getattr(subject_instance, "first_house", None)
-                elif planet_name == "Midheaven": planet_obj = getattr(subject_instance, "tenth_house", None)
-                else: planet_obj = None
-                if planet_obj:
-                    sign = planet_obj.get('sign', '?')
-                    pos = planet_obj.get('position', 0.0)
-                    planets_data_str_for_prompt += f"- {planet_name}: {sign} {pos:.2f}°\n"
-                else:
-                    logger.error(f"Error getting data for {planet_name}")
-                    planets_data_str_for_prompt += f"- {planet_name}: მონაცემების შეცდომა\n"
-            except Exception as e:
-                logger.error(f"Error getting data for {planet_name}: {e}")
-                planets_data_str_for_prompt += f"- {planet_name}: სრული მონაცემების შეცდომა\n"
-
-        gemini_lang_name = "ქართულ" if lang_code == "ka" else "ინგლისურ" if lang_code == "en" else "რუსულ"
-        large_prompt = (
-            get_text("gemini_main_prompt_intro", lang_code).format(language=gemini_lang_name) + "\n" +
-            get_text("gemini_main_prompt_instruction_1", lang_code).format(name=name) + "\n" +
-            get_text("gemini_main_prompt_instruction_2", lang_code) + "\n" +
-            get_text("gemini_main_prompt_instruction_3", lang_code) + "\n\n" +
-            get_text("gemini_data_header", lang_code) + "\n" +
-            get_text("gemini_name", lang_code).format(name=name) + "\n" +
-            get_text("gemini_birth_date_time", lang_code).format(day=day, month=month, year=year, hour=hour, minute=minute) + "\n" +
-            get_text("gemini_birth_location", lang_code).format(city=city, location_nation_suffix=(f', {nation}' if nation else '')) + "\n" +
-            get_text("gemini_systems_used", lang_code) + "\n\n" +
-            get_text("gemini_planet_positions_header", lang_code) + "\n" +
-            planets_data_str_for_prompt + "\n" +
-            get_text("gemini_aspects_header", lang_code) + "\n" +
-            aspects_data_str_for_prompt + "\n" +
-            get_text("gemini_task_header", lang_code) + "\n" +
-            get_text("gemini_task_instruction_1", lang_code) + "\n" +
-            get_text("gemini_section_pis_start", lang_code) + "\n" +
-            get_text("gemini_pis_instruction", lang_code) + "\n" +
-            get_text("gemini_section_pis_end", lang_code) + "\n\n" +
-            get_text("gemini_section_pih_start", lang_code) + "\n" +
-            get_text("gemini_pih_instruction", lang_code) + "\n" +
-            get_text("gemini_section_pih_end", lang_code) + "\n\n" +
-            get_text("gemini_section_aspects_start", lang_code) + "\n" +
-            get_text("gemini_aspects_instruction", lang_code) + "\n" +
-            get_text("gemini_section_aspects_end", lang_code) + "\n\n" +
-            get_text("gemini_final_instruction", lang_code)
-        )
-
         await processing_message.edit_text(text=get_text("gemini_prompt_start", lang_code), parse_mode=ParseMode.HTML)
-        full_interpretation_text = await get_gemini_interpretation(large_prompt)
-        logger.info(f"Received interpretation for user {chat_id}. Length: {len(full_interpretation_text)}")
+        full_interpretation_text, tier = await interpret_chart(current_user_data, lang_code, planets_for_prompt, aspects_for_prompt)
+        logger.info(f"Received interpretation for user {chat_id} ({tier.name} tier). Length: {len(full_interpretation_text)}")
 
-        save_user_data(user_id, current_user_data, chart_text=full_interpretation_text)
+        save_user_data(
+            user_id, current_user_data, chart_text=full_interpretation_text, model_tier=tier.name,
+            chart_version=None if full_interpretation_text.startswith("(") else chart_version_stamp(tier)
+        )
         current_user_data['full_chart_text'] = full_interpretation_text
+        if PREGENERATE_TRANSLATIONS and not full_interpretation_text.startswith("("):
+            context.application.create_task(pregenerate_chart_variants(user_id, current_user_data.get('lang_code', lang_code)))
 
         final_report_parts = []
         base_info_text = (
@@ -657,16 +1747,13 @@ async def generate_and_send_chart(user_id: int, chat_id: int, context: ContextTy
         base_info_text += time_note + "\n"
         final_report_parts.append(base_info_text)
 
-        pis_text = re.search(r"\[SECTION:\s*PlanetsInSignsStart\](.*?)\[SECTION:\s*PlanetsInSignsEnd\]", full_interpretation_text, re.DOTALL | re.IGNORECASE)
-        pih_text = re.search(r"\[SECTION:\s*PlanetsInHousesStart\](.*?)\[SECTION:\s*PlanetsInHousesEnd\]", full_interpretation_text, re.DOTALL | re.IGNORECASE)
-        asp_text_match = re.search(r"\[SECTION:\s*AspectsStart\](.*?)\[SECTION:\s*AspectsEnd\]", full_interpretation_text, re.DOTALL | re.IGNORECASE)
-
-        if pis_text and pis_text.group(1).strip():
-            final_report_parts.append(f"\n--- 🪐 <b>{get_text('section_title_pis', lang_code)}</b> ---\n\n{pis_text.group(1).strip()}")
-        if pih_text and pih_text.group(1).strip():
-            final_report_parts.append(f"\n--- 🏠 <b>{get_text('section_title_pih', lang_code)}</b> ---\n\n{pih_text.group(1).strip()}")
-        if asp_text_match and asp_text_match.group(1).strip():
-            final_report_parts.append(f"\n--- ✨ <b>{get_text('section_title_aspects', lang_code)}</b> ---\n\n{asp_text_match.group(1).strip()}")
+        sections = extract_sections(full_interpretation_text)
+        if "pis" in sections:
+            final_report_parts.append(f"\n--- 🪐 <b>{get_text('section_title_pis', lang_code)}</b> ---\n\n{sections['pis']}")
+        if "pih" in sections:
+            final_report_parts.append(f"\n--- 🏠 <b>{get_text('section_title_pih', lang_code)}</b> ---\n\n{sections['pih']}")
+        if "aspects" in sections:
+            final_report_parts.append(f"\n--- ✨ <b>{get_text('section_title_aspects', lang_code)}</b> ---\n\n{sections['aspects']}")
 
         if len(final_report_parts) == 1 and full_interpretation_text.startswith("("):
             final_report_parts.append(f"\n<b>ინტერპრეტაცია ვერ მოხერხდა:</b>\n{full_interpretation_text}")
@@ -680,8 +1767,9 @@ async def generate_and_send_chart(user_id: int, chat_id: int, context: ContextTy
         await processing_message.edit_text(text=parts[0], parse_mode=ParseMode.HTML)
         for part in parts[1:]:
             await context.bot.send_message(chat_id=chat_id, text=part, parse_mode=ParseMode.HTML)
+        await send_chart_image(context, chat_id, user_id, subject_instance, lang_code)
 
-    except KerykeionException as ke:
+    except ChartLocationError as ke:
         logger.error(f"KerykeionException: {ke}", exc_info=False)
         await processing_message.edit_text(text=get_text("kerykeion_city_error", lang_code).format(city=city))
         return ConversationHandler.END
@@ -693,6 +1781,181 @@ async def generate_and_send_chart(user_id: int, chat_id: int, context: ContextTy
     await context.bot.send_message(chat_id=chat_id, text=get_text("chart_ready_menu_prompt", lang_code), reply_markup=get_main_menu_keyboard(lang_code))
     return ConversationHandler.END
 
+# --- დღიური ჰოროსკოპები ---
+# მეხსიერებაში: მიმდინარე ლოკალური დღე და (ნიშანი, ენა) -> ტექსტი
+horoscope_cache: dict = {"day": None, "texts": {}}
+horoscope_refresh_lock = asyncio.Lock()
+ZODIAC_START_DATES = [(1, 20, 'Aquarius'), (2, 19, 'Pisces'), (3, 21, 'Aries'), (4, 20, 'Taurus'), (5, 21, 'Gemini'), (6, 21, 'Cancer'),
+                      (7, 23, 'Leo'), (8, 23, 'Virgo'), (9, 23, 'Libra'), (10, 23, 'Scorpio'), (11, 22, 'Sagittarius'), (12, 22, 'Capricorn')]
+
+def horoscope_today() -> str:
+    return datetime.now(HOROSCOPE_TIMEZONE).date().isoformat()
+
+def sun_sign_for_date(month: int, day: int) -> str:
+    sign = 'Capricorn'
+    for start_month, start_day, start_sign in ZODIAC_START_DATES:
+        if (month, day) >= (start_month, start_day):
+            sign = start_sign
+    return sign
+
+def parse_horoscope_response(text: str) -> dict[str, str]:
+    texts = {}
+    for match in re.finditer(r"\[SIGN:\s*([A-Za-z]+)\s*\](.*?)(?=\[SIGN:|\Z)", text, re.DOTALL):
+        sign = match.group(1).capitalize()
+        if sign in ZODIAC_SIGNS and match.group(2).strip():
+            texts[sign] = match.group(2).strip()
+    return texts
+
+async def generate_horoscopes(day: str, lang_code: str) -> dict[str, str]:
+    prompt = get_text("gemini_horoscope_prompt", lang_code).format(date=day)
+    tier = model_router.choose()
+    async with model_router.slot(interactive=False):
+        response = await get_gemini_interpretation(prompt, tier.model_name)
+    texts = parse_horoscope_response(response)
+    if len(texts) < len(ZODIAC_SIGNS):
+        logger.warning(f"Horoscope response for {day}/{lang_code} has {len(texts)} of {len(ZODIAC_SIGNS)} signs.")
+    return texts
+
+async def refresh_daily_horoscopes(context: ContextTypes.DEFAULT_TYPE | None = None) -> None:
+    async with horoscope_refresh_lock:
+        day = horoscope_today()
+        texts = get_daily_horoscopes(day)
+        gemini_ready = await ensure_gemini()
+        for lang_code in translations:
+            if all((sign, lang_code) in texts for sign in ZODIAC_SIGNS) or not gemini_ready:
+                continue
+            generated = await generate_horoscopes(day, lang_code)
+            if generated:
+                save_daily_horoscopes(day, lang_code, generated)
+                texts.update({(sign, lang_code): text for sign, text in generated.items()})
+                invalidate_cache("daily_horoscopes", day)
+        horoscope_cache["day"] = day
+        horoscope_cache["texts"] = texts
+        logger.info(f"Daily horoscopes for {day} loaded: {len(texts)} texts.")
+    # წარუმატებელი ან ნაწილობრივი გენერაცია მომდევნო შუაღამემდე არ უნდა დარჩეს: გამოტოვებული
+    # (ნიშანი, ენა) წყვილები ხელახლა გენერირდება, სანამ ყველა არ შეივსება
+    missing = sum((sign, lang_code) not in texts for sign in ZODIAC_SIGNS for lang_code in translations)
+    if missing > 0 and gemini_ready and context and context.job_queue:
+        if not context.job_queue.get_jobs_by_name(HOROSCOPE_RETRY_JOB):
+            context.job_queue.run_once(refresh_daily_horoscopes, when=HOROSCOPE_RETRY_SECONDS, name=HOROSCOPE_RETRY_JOB)
+            logger.warning(f"Daily horoscopes for {day}: {missing} texts missing, retrying in {HOROSCOPE_RETRY_SECONDS}s.")
+
+def parse_personal_horoscope_response(text: str, user_ids: set[int]) -> dict[int, str]:
+    texts = {}
+    for match in re.finditer(r"\[USER:\s*(\d+)\s*\](.*?)(?=\[USER:|\Z)", text, re.DOTALL):
+        user_id = int(match.group(1))
+        if user_id in user_ids and match.group(2).strip():
+            texts[user_id] = match.group(2).strip()
+    return texts
+
+async def generate_personal_horoscopes(day: str, lang_code: str, batch: dict[int, list]) -> dict[int, str]:
+    users = "\n".join(
+        f"[USER: {user_id}] " + "; ".join(hit.describe() for hit in hits[:PERSONAL_HOROSCOPE_MAX_TRANSITS])
+        for user_id, hits in batch.items()
+    )
+    prompt = get_text("gemini_personal_horoscope_prompt", lang_code).format(date=day, users=users)
+    tier = model_router.choose()
+    async with model_router.slot(interactive=False):
+        response = await get_gemini_interpretation(prompt, tier.model_name)
+    texts = parse_personal_horoscope_response(response, set(batch))
+    if len(texts) < len(batch):
+        logger.warning(f"Personal horoscope batch for {day}/{lang_code} has {len(texts)} of {len(batch)} users.")
+    return texts
+
+async def refresh_personal_horoscopes(context: ContextTypes.DEFAULT_TYPE | None = None) -> None:
+    # დღის ტრანზიტები ერთხელ ითვლება და ყველა ნატალურ რუკას ერთი ვექტორული გავლით ედარება;
+    # მოდელს მხოლოდ მნიშვნელოვანი ტრანზიტების მქონე მომხმარებლები ეგზავნება, პაკეტებად
+    if not await ensure_gemini():
+        return
+    day = horoscope_today()
+    natal = get_natal_positions()
+    if not natal or not natal[0]:
+        return
+    user_ids, positions, languages = natal
+    from transits import transit_longitudes
+    today = datetime.fromisoformat(day)
+    started = time.monotonic()
+    transit = await asyncio.to_thread(transit_longitudes, today.year, today.month, today.day)
+    hits_by_user = await asyncio.to_thread(get_transit_engine().scan, user_ids, positions, transit)
+    logger.info(
+        f"Transit scan for {day}: {len(user_ids)} users, {len(hits_by_user)} with notable transits "
+        f"({time.monotonic() - started:.2f}s)."
+    )
+
+    done = get_personal_horoscope_users(day)
+    language_of = dict(zip(user_ids, languages))
+    pending: dict[str, dict[int, list]] = {}
+    for user_id, hits in hits_by_user.items():
+        if user_id not in done:
+            pending.setdefault(language_of[user_id], {})[user_id] = hits
+    batches = []
+    for lang_code, users in pending.items():
+        items = list(users.items())
+        for start in range(0, len(items), PERSONAL_HOROSCOPE_BATCH):
+            batches.append((lang_code, dict(items[start:start + PERSONAL_HOROSCOPE_BATCH])))
+
+    # პაკეტები პარალელურად, max_concurrency-ის ნახევარი ვორკერით: თითო მოთხოვნა ფონურ model_router.slot()-ს
+    # გადის (რიგის სიღრმესა და EWMA-ში არ ითვლება), ხოლო დანარჩენი სლოტები ინტერაქტიულ მოთხოვნებს რჩება
+    remaining = iter(batches)
+
+    async def generate_batches():
+        for lang_code, batch in remaining:
+            texts = await generate_personal_horoscopes(day, lang_code, batch)
+            if texts:
+                save_personal_horoscopes(day, [(user_id, lang_code, text) for user_id, text in texts.items()])
+
+    await asyncio.gather(*(generate_batches() for _ in range(min(max(1, model_router.max_concurrency // 2), len(batches)))))
+    logger.info(f"Personal horoscopes for {day}: {sum(len(users) for users in pending.values())} users processed.")
+
+def get_cached_horoscope(sign: str, lang_code: str) -> str | None:
+    # ლოკალური შუაღამის ან ინვალიდაციის შემდეგ ქეში ბაზიდან ივსება: ტექსტები შეიძლება სხვა
+    # პროცესმა (მთავარმა ვორკერმა) დააგენერირა
+    day = horoscope_today()
+    if horoscope_cache["day"] != day:
+        texts = get_daily_horoscopes(day)
+        if not texts:
+            return None
+        horoscope_cache["day"] = day
+        horoscope_cache["texts"] = texts
+    return horoscope_cache["texts"].get((sign, lang_code))
+
+async def send_horoscope(message, sign: str, lang_code: str) -> None:
+    text = get_cached_horoscope(sign, lang_code)
+    if text is None:
+        await message.reply_text(get_text("horoscope_not_ready", lang_code), reply_markup=get_main_menu_keyboard(lang_code))
+        return
+    header = get_text("horoscope_header", lang_code).format(sign=get_text(f"sign_{sign}", lang_code), date=horoscope_today())
+    await message.reply_text(f"{header}\n\n{text}", parse_mode=ParseMode.HTML, reply_markup=get_main_menu_keyboard(lang_code))
+
+async def horoscope_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
+    user_data = get_user_data(update.effective_user.id)
+    personal_text = None
+    if user_data:
+        # იგივე ენის წყარო, რომლითაც refresh_personal_horoscopes ტექსტებს ინახავს
+        horoscope_lang = await asyncio.to_thread(get_user_language, update.effective_user.id) or DEFAULT_LANGUAGE
+        personal_text = get_personal_horoscope(horoscope_today(), update.effective_user.id, horoscope_lang)
+    if personal_text:
+        header = get_text("personal_horoscope_header", lang_code).format(date=horoscope_today())
+        await update.message.reply_text(f"{header}\n\n{personal_text}", parse_mode=ParseMode.HTML, reply_markup=get_main_menu_keyboard(lang_code))
+        return
+    if user_data and user_data.get('month') and user_data.get('day'):
+        await send_horoscope(update.message, sun_sign_for_date(user_data['month'], user_data['day']), lang_code)
+        return
+    keyboard = [
+        [InlineKeyboardButton(get_text(f"sign_{sign}", lang_code), callback_data=f"horoscope_{sign}") for sign in ZODIAC_SIGNS[i:i + 3]]
+        for i in range(0, len(ZODIAC_SIGNS), 3)
+    ]
+    await update.message.reply_text(get_text("horoscope_choose_sign", lang_code), reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def horoscope_sign_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
+    sign = query.data.split('_', 1)[1]
+    if sign in ZODIAC_SIGNS:
+        await send_horoscope(query.message, sign, lang_code)
+
 # --- ConversationHandler-ის მდგომარეობები ---
 (LANG_CHOICE, SAVED_DATA_OR_NAME, NAME_CONV, BIRTH_DATE_CONV, BIRTH_TIME_CONV, COUNTRY_CONV, CITY_CONV) = range(7)
 
@@ -726,6 +1989,8 @@ async def handle_language_choice(update: Update, context: ContextTypes.DEFAULT_T
     await query.answer()
     lang_code = query.data.split('_')[1]
     context.user_data['lang_code'] = lang_code
+    # არჩეული ენა ბაზაშიც ინახება: პერსონალური ჰოროსკოპები ამ ენაზე გენერირდება
+    await asyncio.to_thread(save_user_languages, [(update.effective_user.id, lang_code)])
 
     await query.edit_message_text(text=get_text("language_chosen", lang_code))
     user_data = get_user_data(update.effective_user.id)
@@ -832,6 +2097,15 @@ async def handle_saved_data_choice_conv(update: Update, context: ContextTypes.DE
         )
         return ConversationHandler.END
 
+async def restart_chart_data_entry(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    # საუბრის მდგომარეობა გადატვირთვიდან აღდგა, chart_data კი უკვე გამოდევნილია: შევსება სახელიდან იწყება
+    lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
+    await update.message.reply_text(
+        get_text("ask_name", lang_code),
+        reply_markup=ReplyKeyboardMarkup([[KeyboardButton(get_text("cancel_button_text", lang_code))]], resize_keyboard=True)
+    )
+    return NAME_CONV
+
 async def handle_name_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
     name = update.message.text.strip()
@@ -850,6 +2124,8 @@ async def handle_name_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     return BIRTH_DATE_CONV
 
 async def handle_birth_date_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if 'chart_data' not in context.user_data:
+        return await restart_chart_data_entry(update, context)
     lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
     text = update.message.text.strip()
     try:
@@ -875,6 +2151,8 @@ async def handle_birth_date_conv(update: Update, context: ContextTypes.DEFAULT_T
         return BIRTH_DATE_CONV
 
 async def handle_birth_time_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if 'chart_data' not in context.user_data:
+        return await restart_chart_data_entry(update, context)
     lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
     text = update.message.text.strip()
     if text == get_text("time_unknown_button", lang_code):
@@ -901,6 +2179,8 @@ async def handle_birth_time_conv(update: Update, context: ContextTypes.DEFAULT_T
     return COUNTRY_CONV
 
 async def handle_country_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if 'chart_data' not in context.user_data:
+        return await restart_chart_data_entry(update, context)
     lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
     country = update.message.text.strip()
     if len(country) < 2:
@@ -917,6 +2197,8 @@ async def handle_country_conv(update: Update, context: ContextTypes.DEFAULT_TYPE
     return CITY_CONV
 
 async def handle_city_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if 'chart_data' not in context.user_data:
+        return await restart_chart_data_entry(update, context)
     lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
     city = update.message.text.strip()
     if len(city) < 2:
@@ -925,14 +2207,21 @@ async def handle_city_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             reply_markup=ReplyKeyboardMarkup([[KeyboardButton(get_text("cancel_button_text", lang_code))]], resize_keyboard=True)
         )
         return CITY_CONV
-    context.user_data['chart_data']['city'] = city
+    # დასრულებული საუბრის მონაცემები მეხსიერებაში აღარ რჩება: ისინი უკვე ბაზაშია
+    chart_data = context.user_data.pop('chart_data')
+    chart_data['city'] = city
     await update.message.reply_text(get_text("data_collection_complete", lang_code))
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
-    await generate_and_send_chart(user_id, chat_id, context, is_new_data=True, data_to_process=context.user_data['chart_data'])
+    await generate_and_send_chart(user_id, chat_id, context, is_new_data=True, data_to_process=chart_data)
     return ConversationHandler.END
 
+async def conversation_timed_out(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    # მიტოვებული შევსება (მაგ. BIRTH_TIME_CONV-ზე): ნაწილობრივი მონაცემები იშლება
+    context.user_data.pop('chart_data', None)
+
 async def cancel_conv(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    context.user_data.pop('chart_data', None)
     lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
     await update.message.reply_text(
         get_text("chart_generation_cancelled", lang_code),
@@ -977,6 +2266,8 @@ async def view_my_chart_command(update: Update, context: ContextTypes.DEFAULT_TY
 async def delete_data_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
     lang_code = context.user_data.get('lang_code', DEFAULT_LANGUAGE)
+    # ნაწილობრივ შევსებული მონაცემებიც იშლება, რომ შენახულ მდგომარეობაში აღარ დარჩეს
+    context.user_data.pop('chart_data', None)
     if delete_user_data(user_id):
         await update.message.reply_text(
             get_text("data_deleted_success", lang_code),
@@ -1017,14 +2308,38 @@ async def prompt_for_name_after_lang(update: Update, context: ContextTypes.DEFAU
     )
     return NAME_CONV
 
-# --- მთავარი ფუნქცია ---
-def main() -> None:
-    init_db()
-    if not TELEGRAM_BOT_TOKEN:
-        logger.critical("TELEGRAM_BOT_TOKEN not set.")
-        return
-
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+# --- ფონური გახურება ---
+def warm_up_heavy_modules() -> None:
+    # პირველი რუკის, სიზმრის ან ჰოროსკოპის მოთხოვნამდე: kerykeion და swisseph-ის ეფემერიდები,
+    # ეფემერიდების ცხრილი, numpy-ზე დამოკიდებული ძრავები და Gemini-ს კლიენტი
+    started = time.monotonic()
+    logger.info("Warm-up started.")
+    from kerykeion import AstrologicalSubject
+    from ephemeris_table import default_table
+
+    AstrologicalSubject("Warm-up", 2000, 1, 1, 12, 0, lng=0.0, lat=51.48, tz_str="Etc/UTC", online=False)
+    default_table()
+    get_transit_engine()
+    get_dream_cache()
+    load_gemini()
+    logger.info(f"Warm-up finished in {time.monotonic() - started:.2f}s.")
+
+async def warm_up(context: ContextTypes.DEFAULT_TYPE) -> None:
+    try:
+        await asyncio.to_thread(warm_up_heavy_modules)
+    except Exception as e:
+        # გახურება მხოლოდ დაჩქარებაა: შეცდომისას მოდულები პირველ მოთხოვნაზე ჩაიტვირთება
+        logger.warning(f"Warm-up failed: {type(e).__name__}: {e}")
+
+# --- აპლიკაციის აწყობა ---
+def build_application(token: str, base_url: str | None = None, persistence: BasePersistence | None = None,
+                      background_jobs: bool = True) -> Application:
+    builder = Application.builder().token(token).post_shutdown(shutdown_worker_pools)
+    if base_url:
+        builder = builder.base_url(base_url)
+    if persistence:
+        builder = builder.persistence(persistence)
+    application = builder.build()
 
     main_conv_handler = ConversationHandler(
         entry_points=[CommandHandler('start', start_command)],
@@ -1043,15 +2358,21 @@ def main() -> None:
             BIRTH_TIME_CONV: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_birth_time_conv)],
             COUNTRY_CONV: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_country_conv)],
             CITY_CONV: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_city_conv)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timed_out)],
         },
         fallbacks=[CommandHandler('cancel', cancel_conv)],
-        allow_reentry=True
+        allow_reentry=True,
+        conversation_timeout=CONVERSATION_TIMEOUT_SECONDS,
+        name="main_conversation",
+        persistent=persistence is not None
     )
 
+    application.add_handler(TypeHandler(Update, track_user_state), group=-1)
     application.add_handler(main_conv_handler)
     application.add_handler(CommandHandler("createchart", create_chart_start_conv))
     application.add_handler(CommandHandler("mydata", my_data_command))
     application.add_handler(CommandHandler("deletedata", delete_data_command))
+    application.add_handler(CallbackQueryHandler(horoscope_sign_callback, pattern='^horoscope_[A-Za-z]+$'))
 
     main_menu_buttons_regex_parts = []
     for lang_code_iter in ["ka", "en", "ru"]:
@@ -1076,11 +2397,44 @@ def main() -> None:
             await delete_data_command(update, context)
         elif user_message == get_text("create_chart_button_text", lang_code):
             await create_chart_start_conv(update, context)
+        elif user_message == get_text("main_menu_button_horoscope", lang_code):
+            await horoscope_command(update, context)
+        elif user_message == get_text("main_menu_button_dream", lang_code):
+            await dream_start(update, context)
+        elif user_message == get_text("main_menu_button_palmistry", lang_code):
+            await image_reading_start(update, context, "palmistry")
+        elif user_message == get_text("main_menu_button_coffee", lang_code):
+            await image_reading_start(update, context, "coffee")
         else:
             await handle_other_menu_buttons(update, context)
 
     application.add_handler(MessageHandler(filters.Regex(combined_regex) & filters.TEXT & ~filters.COMMAND, general_menu_handler))
+    application.add_handler(MessageHandler(filters.PHOTO, handle_reading_photo))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_dream_text))
+
+    if application.job_queue:
+        # JobQueue application.start()-ით ეშვება, ანუ polling-ის ან webhook-ის დაწყების შემდეგ
+        application.job_queue.run_once(warm_up, when=0)
+        application.job_queue.run_repeating(evict_idle_user_state, interval=USER_STATE_SWEEP_SECONDS, first=USER_STATE_SWEEP_SECONDS)
+    # საერთო ფონური სამუშაოები (ჰოროსკოპები, რუკების განახლება) მრავალვორკერიან რეჟიმში მხოლოდ ერთ პროცესში ეშვება
+    if application.job_queue and background_jobs:
+        application.job_queue.run_repeating(upgrade_degraded_charts, interval=DEGRADED_UPGRADE_INTERVAL_SECONDS, first=DEGRADED_UPGRADE_INTERVAL_SECONDS)
+        application.job_queue.run_once(refresh_daily_horoscopes, when=1)
+        application.job_queue.run_daily(refresh_daily_horoscopes, time=dt_time(0, 0, 5, tzinfo=HOROSCOPE_TIMEZONE))
+        application.job_queue.run_once(refresh_personal_horoscopes, when=30)
+        application.job_queue.run_daily(refresh_personal_horoscopes, time=dt_time(0, 10, tzinfo=HOROSCOPE_TIMEZONE))
+    return application
+
+# --- მთავარი ფუნქცია ---
+def main() -> None:
+    init_db()
+    if not TELEGRAM_BOT_TOKEN:
+        logger.critical("TELEGRAM_BOT_TOKEN not set.")
+        return
 
+    persistence = SQLitePersistence(DB_FILE, update_interval=PERSISTENCE_FLUSH_SECONDS,
+                                     conversation_timeout=CONVERSATION_TIMEOUT_SECONDS) if PERSISTENCE_ENABLED else None
+    application = build_application(TELEGRAM_BOT_TOKEN, persistence=persistence)
     logger.info("Starting bot...")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+# user_birth_data-ის ნაკადური ექსპორტი შეკუმშულ JSONL-ში და იმპორტი უკან, upsert-ით.
+# ცხრილი მეხსიერებაში მთლიანად არასდროს იტვირთება: ექსპორტი user_id-ის keyset გვერდებით
+# კითხულობს, იმპორტი კი ფაილს ხაზ-ხაზად კითხულობს და პაკეტებს executemany-ით დიდ
+# ტრანზაქციებში წერს. იმპორტი იდემპოტენტურია: შეწყვეტის შემდეგ თავიდან გაშვება საკმარისია.
+# იმპორტი ცოცხალ ბაზაზე მუშაობს: ბაზა WAL-ში გადადის და ტრანზაქციები მოკლეა, რომ ბოტის ჩაწერები
+# busy timeout-ს არ ამოწურავდეს. ბოტის პროცესების user_record ქეში იმპორტირებულ ცვლილებებს
+# TTL-ის ამოწურვისას დაინახავს, სინასტრიის ინდექსი კი SynastryMatcher-ის სრული გადატვირთვისას.
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import bot
+from synastry import SYNASTRY_RELOAD_SECONDS
+
+TABLE = "user_birth_data"
+KEY_COLUMN = "user_id"
+EXPORT_BATCH_ROWS = 5000
+IMPORT_BATCH_ROWS = 5000
+# ~0.25 წმ ჩაწერის ლოკი ერთ ტრანზაქციაზე; ბოტის sqlite3.connect 5 წმ-იან busy timeout-ს ელოდება
+IMPORT_TRANSACTION_ROWS = 5000
+COMPRESS_LEVEL = 6
+# ამ სვეტებიდან გამოითვლება natal_positions და user_chart_images (ენა სურათის წარწერებს ცვლის)
+DERIVED_SOURCE_COLUMNS = ["year", "month", "day", "hour", "minute", "city", "nation", "language_code", "full_chart_text"]
+SQL_VARIABLES_PER_QUERY = 500
+
+def table_columns(conn: sqlite3.Connection) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({TABLE})")]
+
+def select_columns(available: list[str], columns: list[str] | None = None, exclude: list[str] = ()) -> list[str]:
+    unknown = [column for column in (columns or []) + list(exclude) if column not in available]
+    if unknown:
+        raise ValueError(f"Unknown {TABLE} columns: {', '.join(unknown)}")
+    selected = [column for column in (columns or available) if column not in exclude]
+    # გასაღების გარეშე იმპორტი upsert-ს ვერ შეძლებს
+    return selected if KEY_COLUMN in selected else [KEY_COLUMN] + selected
+
+def open_text(path: str, mode: str, level: int = COMPRESS_LEVEL, compressed: bool | None = None):
+    if path.endswith(".gz") if compressed is None else compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=level) if mode == "w" else gzip.open(path, "rt", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+# --- ექსპორტი ---
+def export_rows(db_file: str, output: str, columns: list[str] | None = None, exclude: list[str] = (),
+                batch_rows: int = EXPORT_BATCH_ROWS, level: int = COMPRESS_LEVEL) -> int:
+    conn = sqlite3.connect(db_file)
+    try:
+        selected = select_columns(table_columns(conn), columns, exclude)
+        key_index = selected.index(KEY_COLUMN)
+        # ყოველი გვერდი ცალკე მოკლე წაკითხვაა: ბლოკი გვერდებს შორის თავისუფლდება და ბოტის ჩაწერებს არ აჩერებს
+        query = f"SELECT {', '.join(selected)} FROM {TABLE} WHERE {KEY_COLUMN} > ? ORDER BY {KEY_COLUMN} LIMIT ?"
+        exported, after_user_id = 0, -2 ** 63
+        temporary = f"{output}.tmp"
+        try:
+            with open_text(temporary, "w", level, compressed=output.endswith(".gz")) as out:
+                while True:
+                    rows = conn.execute(query, (after_user_id, batch_rows)).fetchall()
+                    if not rows:
+                        break
+                    out.writelines(json.dumps(dict(zip(selected, row)), ensure_ascii=False) + "\n" for row in rows)
+                    exported += len(rows)
+                    after_user_id = rows[-1][key_index]
+        except BaseException:
+            # ნახევრად ჩაწერილი ფაილი წინა სრულ ექსპორტს არ ცვლის
+            os.remove(temporary)
+            raise
+        os.replace(temporary, output)
+        return exported
+    finally:
+        conn.close()
+
+# --- იმპორტი ---
+def upsert_statement(columns: list[str]) -> str:
+    # ON CONFLICT ... DO UPDATE: ფაილში არმყოფი სვეტები (მაგ. გამოტოვებული full_chart_text) ბაზაში უცვლელი რჩება
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != KEY_COLUMN)
+    return (
+        f"INSERT INTO {TABLE} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+        f"ON CONFLICT({KEY_COLUMN}) DO " + (f"UPDATE SET {updates}" if updates else "NOTHING")
+    )
+
+def current_values(conn: sqlite3.Connection, user_ids: list[int], compared: list[str]) -> dict[int, tuple]:
+    # ბაზაში უკვე არსებული მომხმარებლების compared სვეტები, upsert-მდე
+    current = {}
+    for start in range(0, len(user_ids), SQL_VARIABLES_PER_QUERY):
+        chunk = user_ids[start:start + SQL_VARIABLES_PER_QUERY]
+        rows = conn.execute(
+            f"SELECT {KEY_COLUMN}, {', '.join(compared)} FROM {TABLE} "
+            f"WHERE {KEY_COLUMN} IN ({', '.join('?' for _ in chunk)})", chunk
+        )
+        current.update((row[0], tuple(row[1:])) for row in rows)
+    return current
+
+def write_batch(conn: sqlite3.Connection, statement: str, columns: list[str], batch: list[tuple]) -> None:
+    key_index = columns.index(KEY_COLUMN)
+    compared = [column for column in DERIVED_SOURCE_COLUMNS if column in columns]
+    current = current_values(conn, [row[key_index] for row in batch], compared) if compared else {}
+    indexes = [columns.index(column) for column in compared]
+    changed = [
+        (row[key_index],) for row in batch
+        if row[key_index] in current and tuple(row[i] for i in indexes) != current[row[key_index]]
+    ]
+    conn.executemany(statement, batch)
+    # ძველი პოზიციები და სურათი იშლება; ბოტი მათ საჭიროებისას თავიდან ითვლის (get_users_without_natal_positions,
+    # send_saved_chart_image). სინასტრიის ინდექსი ამას SynastryMatcher-ის სრული გადატვირთვისას ხედავს
+    conn.executemany("DELETE FROM natal_positions WHERE user_id = ?", changed)
+    conn.executemany("DELETE FROM user_chart_images WHERE user_id = ?", changed)
+    if "full_chart_text" in columns:
+        # იგივე, რასაც save_user_data აკეთებს: ახალი ტექსტი ძველ ენობრივ ვარიანტებს ანაცვლებს, ცარიელი კი შლის.
+        # უცვლელი ტექსტის ხელახალი იმპორტი თარგმანებს ინარჩუნებს
+        text_index, current_text_index = columns.index("full_chart_text"), compared.index("full_chart_text")
+        rows = [
+            row for row in batch
+            if row[key_index] not in current or row[text_index] != current[row[key_index]][current_text_index]
+        ]
+        conn.executemany("DELETE FROM chart_interpretations WHERE user_id = ?", ((row[key_index],) for row in rows))
+        conn.executemany(
+            "INSERT INTO chart_interpretations (user_id, language_code, full_chart_text, model_tier) "
+            f"SELECT user_id, COALESCE(language_code, ?), full_chart_text, model_tier FROM {TABLE} WHERE user_id = ?",
+            ((bot.DEFAULT_LANGUAGE, row[key_index]) for row in rows if row[text_index] is not None),
+        )
+
+def import_rows(db_file: str, source: str, batch_rows: int = IMPORT_BATCH_ROWS,
+                transaction_rows: int = IMPORT_TRANSACTION_ROWS) -> dict:
+    conn = sqlite3.connect(db_file)
+    try:
+        # WAL-ში ბოტის წამკითხველები იმპორტის ტრანზაქციას არ ელოდებიან; რეჟიმი ბაზის ფაილში რჩება
+        conn.execute("PRAGMA journal_mode=WAL")
+        available = table_columns(conn)
+        before = conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+        columns, statement, batch = None, None, []
+        imported = uncommitted = 0
+        with open_text(source, "r") as lines:
+            for line_number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if columns is None:
+                    columns = select_columns(available, list(record))
+                    if columns != list(record):
+                        raise ValueError(f"{source}: rows have no {KEY_COLUMN} column")
+                    statement = upsert_statement(columns)
+                elif record.keys() != set(columns):
+                    raise ValueError(f"{source}:{line_number}: columns differ from the first row")
+                batch.append(tuple(record[column] for column in columns))
+                if len(batch) >= batch_rows:
+                    write_batch(conn, statement, columns, batch)
+                    imported += len(batch)
+                    uncommitted += len(batch)
+                    batch = []
+                    if uncommitted >= transaction_rows:
+                        conn.commit()
+                        uncommitted = 0
+        if batch:
+            write_batch(conn, statement, columns, batch)
+            imported += len(batch)
+        conn.commit()
+        after = conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+        return {"rows": imported, "inserted": after - before, "updated": imported - (after - before)}
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# --- ბენჩმარკი ---
+def run_phase(function, *args):
+    # ყოველი ფაზა ახალ პროცესში: ru_maxrss მხოლოდ ამ ფაზის პიკს აჩვენებს და წინა ფაზების მეხსიერებას არ ითვლის
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(measured, function, *args).result()
+
+def measured(function, *args) -> tuple[object, float, float]:
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+CHART_WORDS = {
+    "ka": "მზე მთვარე ასცედენტი სახლი ასპექტი ტრიგონი კვადრატი ენერგია ხასიათი ურთიერთობა კარიერა ემოცია".split(),
+    "en": "sun moon ascendant house aspect trine square energy character relationships career emotion".split(),
+    "ru": "солнце луна асцендент дом аспект тригон квадрат энергия характер отношения карьера эмоции".split(),
+}
+
+def synthetic_rows(count: int, chart_chars: int, seed: int):
+    rng = random.Random(seed)
+    # ტექსტების აუზი: ყოველ ჩანაწერზე ახალი ტექსტის აგება ბაზის შევსებას ბენჩმარკზე დიდხანს გააგრძელებდა
+    texts = {}
+    for lang_code, words in CHART_WORDS.items():
+        texts[lang_code] = []
+        for _ in range(64):
+            text = ""
+            while len(text) < chart_chars:
+                text += " ".join(rng.choice(words) for _ in range(12)) + ". "
+            texts[lang_code].append(text[:chart_chars])
+    cities = [("Tbilisi", "GE"), ("Batumi", "GE"), ("Kutaisi", "GE"), ("London", "GB"), ("Moscow", "RU"), ("Berlin", "DE")]
+    for user_id in range(1, count + 1):
+        lang_code = rng.choice(("ka", "en", "ru"))
+        city, nation = rng.choice(cities)
+        has_chart = rng.random() < 0.9
+        yield (
+            user_id, f"User {user_id}", rng.randint(1940, 2010), rng.randint(1, 12), rng.randint(1, 28),
+            rng.randint(0, 23), rng.randint(0, 59), city, nation, lang_code,
+            rng.choice(texts[lang_code]) + f" #{user_id}" if has_chart else None,
+            "full" if has_chart else None, "p1:bench" if has_chart else None,
+        )
+
+def create_database(path: str) -> None:
+    bot.DB_FILE = path
+    bot.init_db()
+
+def fill_database(path: str, count: int, chart_chars: int, seed: int) -> None:
+    create_database(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        f"INSERT INTO {TABLE} (user_id, name, year, month, day, hour, minute, city, nation, language_code, "
+        "full_chart_text, model_tier, chart_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        synthetic_rows(count, chart_chars, seed),
+    )
+    conn.commit()
+    conn.close()
+
+def table_checksum(path: str) -> tuple:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            f"SELECT COUNT(*), TOTAL(user_id * year), TOTAL(LENGTH(full_chart_text)), COUNT(model_tier) FROM {TABLE}"
+        ).fetchone()
+    finally:
+        conn.close()
+
+def fetchall_export(db_file: str, output: str, level: int) -> int:
+    # შედარებისთვის: ძველი ad-hoc სკრიპტების გზა, მთელი ცხრილი ერთი fetchall()-ით
+    conn = sqlite3.connect(db_file)
+    cursor = conn.execute(f"SELECT * FROM {TABLE}")
+    columns = [description[0] for description in cursor.description]
+    rows = cursor.fetchall()
+    conn.close()
+    with open_text(output, "w", level) as out:
+        for row in rows:
+            out.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+    return len(rows)
+
+def report(label: str, rows: int, elapsed: float, peak_mb: float, extra: str = "") -> None:
+    print(f"  {label:<28} {rows:>9} rows in {elapsed:6.1f}s = {rows / elapsed:>9,.0f} rows/s, peak RSS {peak_mb:6.1f} MiB{extra}")
+
+def benchmark(args: argparse.Namespace) -> None:
+    _, _, idle_mb = run_phase(time.sleep, 0)
+    print(f"Peak RSS of an idle phase process (bot imported): {idle_mb:.1f} MiB")
+    for count in args.rows:
+        print(f"{count} rows, {args.chart_chars}-character chart texts:")
+        with tempfile.TemporaryDirectory(dir=args.tmp_dir) as directory:
+            source, target = str(Path(directory) / "source.db"), str(Path(directory) / "target.db")
+            started = time.perf_counter()
+            fill_database(source, count, args.chart_chars, args.seed)
+            print(f"  {'source database':<28} {os.path.getsize(source) / 2 ** 20:,.0f} MiB built in {time.perf_counter() - started:.1f}s")
+
+            full, slim = str(Path(directory) / "full.jsonl.gz"), str(Path(directory) / "slim.jsonl.gz")
+            for label, output, exclude in (("export all columns", full, []), ("export without chart text", slim, ["full_chart_text"])):
+                exported, elapsed, peak_mb = run_phase(export_rows, source, output, None, exclude, args.batch_rows, args.level)
+                report(label, exported, elapsed, peak_mb, f", {os.path.getsize(output) / 2 ** 20:,.0f} MiB gzip")
+
+            create_database(target)
+            for label in ("import into empty table", "import again (all updates)"):
+                counts, elapsed, peak_mb = run_phase(import_rows, target, full, args.batch_rows, args.transaction_rows)
+                report(label, counts["rows"], elapsed, peak_mb, f", {counts['inserted']} inserted / {counts['updated']} updated")
+            match = table_checksum(source) == table_checksum(target)
+            print(f"  round trip {'matches' if match else 'DIFFERS from'} the source table")
+
+            if args.fetchall:
+                exported, elapsed, peak_mb = run_phase(fetchall_export, source, str(Path(directory) / "fetchall.jsonl.gz"), args.level)
+                report("fetchall() export (old way)", exported, elapsed, peak_mb)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=f"Stream {TABLE} to and from compressed JSONL.")
+    parser.add_argument("--db", default=bot.DB_FILE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Write the table to JSONL (gzip-compressed when the name ends in .gz).")
+    export_parser.add_argument("output")
+    export_parser.add_argument("--columns", help=f"Comma-separated columns to export; {KEY_COLUMN} is always included.")
+    export_parser.add_argument("--exclude", default="", help="Comma-separated columns to leave out, e.g. full_chart_text.")
+    export_parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS)
+    export_parser.add_argument("--level", type=int, default=COMPRESS_LEVEL, help="gzip compression level.")
+    import_help = (
+        "Upsert rows from an export; columns missing from the file are left untouched. Safe against the live "
+        "database (switches it to WAL, short transactions), but running bots only see imported rows once their "
+        f"user_record cache entries expire ({bot.USER_RECORD_CACHE_TTL_SECONDS}s) and the synastry index on its next "
+        f"full reload ({SYNASTRY_RELOAD_SECONDS}s)."
+    )
+    import_parser = subparsers.add_parser("import", help=import_help, description=import_help)
+    import_parser.add_argument("source")
+    import_parser.add_argument("--batch-rows", type=int, default=IMPORT_BATCH_ROWS)
+    import_parser.add_argument("--transaction-rows", type=int, default=IMPORT_TRANSACTION_ROWS,
+                               help="Rows per commit; each commit holds the write lock the bot's writes wait on.")
+    bench_parser = subparsers.add_parser("benchmark", help="Measure rows/sec and peak memory on synthetic tables.")
+    bench_parser.add_argument("--rows", type=lambda value: [int(n) for n in value.split(",")], default=[100_000, 1_000_000],
+                              help="Comma-separated table sizes.")
+    bench_parser.add_argument("--chart-chars", type=int, default=800)
+    bench_parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS)
+    bench_parser.add_argument("--transaction-rows", type=int, default=IMPORT_TRANSACTION_ROWS)
+    bench_parser.add_argument("--level", type=int, default=COMPRESS_LEVEL)
+    bench_parser.add_argument("--fetchall", action="store_true", help="Also time the old fetchall() export for comparison.")
+    bench_parser.add_argument("--tmp-dir", default=None)
+    bench_parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args)
+        return
+    started = time.perf_counter()
+    try:
+        if args.command == "export":
+            columns = [column for column in args.columns.split(",") if column] if args.columns else None
+            exclude = [column for column in args.exclude.split(",") if column]
+            exported = export_rows(args.db, args.output, columns, exclude, args.batch_rows, args.level)
+            print(f"Exported {exported} rows to {args.output} in {time.perf_counter() - started:.1f}s.")
+        else:
+            create_database(args.db)
+            counts = import_rows(args.db, args.source, args.batch_rows, args.transaction_rows)
+            print(f"Imported {counts['rows']} rows ({counts['inserted']} inserted, {counts['updated']} updated) "
+                  f"in {time.perf_counter() - started:.1f}s.")
+    except (sqlite3.Error, ValueError, OSError) as e:
+        raise SystemExit(f"{args.command} failed: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# ნატალური რუკის ბორბლის სურათი: Kerykeion-ის SVG → PNG (resvg) პროცესების პულში,
+# ქეში რუკის ანაბეჭდითა (fingerprint) და თემით. Telegram-ის file_id ბოტის ბაზაში ინახება.
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+RENDER_VERSION = "1"
+CHART_POINTS = ['Sun', 'Moon', 'Mercury', 'Venus', 'Mars', 'Jupiter', 'Saturn', 'Uranus', 'Neptune', 'Pluto', 'Ascendant', 'Medium_Coeli']
+HOUSE_NAMES = ['first_house', 'second_house', 'third_house', 'fourth_house', 'fifth_house', 'sixth_house',
+               'seventh_house', 'eighth_house', 'ninth_house', 'tenth_house', 'eleventh_house', 'twelfth_house']
+CHART_LANGUAGES = {'en': 'EN', 'ru': 'RU'}
+DEFAULT_THEME = "classic"
+DEFAULT_SIZE = 1024
+
+def chart_language(lang_code: str) -> str:
+    return CHART_LANGUAGES.get(lang_code, 'EN')
+
+def render_spec(subject) -> dict:
+    # პულის პროცესში სუბიექტი ამ მონაცემებიდან ოფლაინ აიგება (geonames-ის გარეშე)
+    return {
+        "year": subject.year, "month": subject.month, "day": subject.day, "hour": subject.hour, "minute": subject.minute,
+        "lng": subject.lng, "lat": subject.lat, "tz_str": subject.tz_str,
+        "zodiac_type": subject.zodiac_type, "houses_system_identifier": subject.houses_system_identifier,
+    }
+
+def chart_fingerprint(subject, lang_code: str) -> str:
+    # ბორბალზე სახელი არ იხატება, ამიტომ ერთნაირი მომენტი და ადგილი ერთ სურათს იზიარებს
+    points = [round(getattr(subject, name.lower()).get('abs_pos'), 2) for name in CHART_POINTS]
+    houses = [round(getattr(subject, name).get('abs_pos'), 2) for name in HOUSE_NAMES]
+    payload = json.dumps([RENDER_VERSION, chart_language(lang_code), subject.zodiac_type, points, houses])
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def render_chart_png(spec: dict, theme: str, language: str, size: int) -> tuple[bytes, float, float]:
+    # პულის პროცესში სრულდება: SVG-ის აგებაც და რასტრიზაციაც CPU-ს ტვირთავს.
+    # resvg საკუთარ wheel-შია და სისტემურ libcairo-ს არ საჭიროებს
+    import resvg_py
+    from kerykeion import AstrologicalSubject, KerykeionChartSVG
+
+    started = time.perf_counter()
+    subject = AstrologicalSubject(
+        "Chart", spec["year"], spec["month"], spec["day"], spec["hour"], spec["minute"],
+        lng=spec["lng"], lat=spec["lat"], tz_str=spec["tz_str"], zodiac_type=spec["zodiac_type"],
+        houses_system_identifier=spec["houses_system_identifier"], online=False,
+    )
+    # resvg CSS ცვლადებს არ იცნობს, ამიტომ ისინი SVG-შივე იხსნება
+    svg = KerykeionChartSVG(subject, theme=theme, chart_language=language, active_points=CHART_POINTS).makeWheelOnlyTemplate(
+        minify=True, remove_css_variables=True
+    )
+    svg_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    png = resvg_py.svg_to_bytes(svg_string=svg, width=size, height=size, background="white")
+    return png, svg_seconds, time.perf_counter() - started
+
+class RenderStats:
+    def __init__(self):
+        self.counts = Counter()
+        self.svg_seconds = []
+        self.raster_seconds = []
+
+    def record_render(self, svg_seconds: float, raster_seconds: float):
+        self.counts["rendered"] += 1
+        self.svg_seconds.append(svg_seconds)
+        self.raster_seconds.append(raster_seconds)
+        # მეხსიერება არ იზრდება: ბოლო 1000 გაზომვა საკმარისია მედიანისთვის
+        del self.svg_seconds[:-1000], self.raster_seconds[:-1000]
+
+    def summary(self) -> str:
+        requests = sum(self.counts[key] for key in ("file_id", "disk", "rendered"))
+        hits = self.counts["file_id"] + self.counts["disk"]
+        text = (
+            f"{requests} chart images: {self.counts['file_id']} by file_id, {self.counts['disk']} from disk, "
+            f"{self.counts['rendered']} rendered, {self.counts['failed']} failed"
+            + (f", hit rate {100 * hits / requests:.0f}%" if requests else "")
+        )
+        if self.svg_seconds:
+            text += (
+                f"; median render {statistics.median(self.svg_seconds):.2f}s svg + "
+                f"{statistics.median(self.raster_seconds):.2f}s png"
+            )
+        return text
+
+class ChartRenderer:
+    def __init__(self, workers: int, cache_dir: str, theme: str = DEFAULT_THEME, size: int = DEFAULT_SIZE):
+        self.workers = workers
+        self.cache_dir = Path(cache_dir)
+        self.theme = theme
+        self.size = size
+        self.stats = RenderStats()
+        self._pool = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # spawn: პროცესები ბოტის ციკლის და ნაკადების მდგომარეობას არ იმემკვიდრებს
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def cache_path(self, fingerprint: str, theme: str) -> Path:
+        return self.cache_dir / f"{fingerprint}_{theme}.png"
+
+    async def render(self, subject, lang_code: str, theme: str | None = None) -> tuple[str, bytes]:
+        theme = theme or self.theme
+        fingerprint = chart_fingerprint(subject, lang_code)
+        path = self.cache_path(fingerprint, theme)
+        if path.exists():
+            self.stats.counts["disk"] += 1
+            return fingerprint, path.read_bytes()
+        loop = asyncio.get_running_loop()
+        try:
+            png, svg_seconds, raster_seconds = await loop.run_in_executor(
+                self.pool, render_chart_png, render_spec(subject), theme, chart_language(lang_code), self.size
+            )
+        except BrokenProcessPool:
+            # მოკლული პროცესის შემდეგ პული აღარ მუშაობს: შემდეგი მოთხოვნა ახალს შექმნის
+            self.shutdown()
+            raise
+        self.stats.record_render(svg_seconds, raster_seconds)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(".tmp")
+        temporary.write_bytes(png)
+        os.replace(temporary, path)
+        return fingerprint, png
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+# --- ბენჩმარკი ---
+def benchmark(charts: int, requests: int, workers_list: list[int], seed: int) -> None:
+    import random
+    import tempfile
+
+    from kerykeion import AstrologicalSubject
+    from PIL import Image
+
+    rng = random.Random(seed)
+    subjects = [
+        AstrologicalSubject("Bench", rng.randint(1950, 2010), rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23),
+                            rng.randint(0, 59), lng=44.8, lat=41.7, tz_str="Asia/Tbilisi", online=False)
+        for _ in range(charts)
+    ]
+    # მოთხოვნების ნაკადი: ახალი რუკები და ძველი რუკების ხელახალი ნახვა (ზიპფის განაწილება)
+    weights = [1 / (rank + 1) for rank in range(charts)]
+    stream = rng.choices(range(charts), weights=weights, k=requests)
+
+    for workers in workers_list:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            renderer = ChartRenderer(workers, cache_dir)
+            uploaded = set()
+
+            async def request(index: int):
+                fingerprint = chart_fingerprint(subjects[index], 'en')
+                # ატვირთვის შემდეგ file_id-ით გაგზავნა: რენდერიც და ატვირთვაც გამოტოვებულია
+                if fingerprint in uploaded:
+                    renderer.stats.counts["file_id"] += 1
+                    return
+                await renderer.render(subjects[index], 'en')
+                uploaded.add(fingerprint)
+
+            async def run():
+                started = time.perf_counter()
+                await asyncio.gather(*(request(index) for index in sorted(set(stream))))
+                cold = time.perf_counter() - started
+                for index in stream:
+                    await request(index)
+                return cold
+
+            renderer.pool.submit(int).result()  # პროცესების გაშვება გაზომვის გარეთ
+            cold = asyncio.run(run())
+            renderer.shutdown()
+            # რასტრიზაციის შემოწმება: ქეშში ნამდვილი size×size PNG-ები უნდა იყოს
+            for path in Path(cache_dir).glob("*.png"):
+                with Image.open(path) as image:
+                    if image.format != "PNG" or image.size != (renderer.size, renderer.size):
+                        raise SystemExit(f"{path.name} is {image.format} {image.size}, expected a {renderer.size}x{renderer.size} PNG.")
+            print(f"workers={workers}: {len(set(stream))} distinct charts rendered in {cold:.2f}s "
+                  f"({len(set(stream)) / cold:.1f} charts/s); {renderer.stats.summary()}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark chart-wheel rendering and the image cache.")
+    parser.add_argument("--charts", type=int, default=40, help="Distinct synthetic charts.")
+    parser.add_argument("--requests", type=int, default=400, help="Chart views drawn from a Zipf distribution over the charts.")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated render pool sizes to compare.")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    benchmark(args.charts, args.requests, [int(w) for w in args.workers.split(",")], args.seed)
+
+if __name__ == "__main__":
+    main()
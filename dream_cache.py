@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# სიზმრების მსგავსების ქეში: MinHash ხელმოწერები და LSH ზოლები მეხსიერებაში,
+# LRU გამოდევნით. ძალიან ახლო სიზმარს ქეშიდან ვპასუხობთ, საშუალოდ მსგავსს კი
+# ქეშირებული ახსნა მოდელს ნიმუშად მიეწოდება.
+import argparse
+import random
+import re
+import statistics
+import time
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+NUM_PERMUTATIONS = 64
+BANDS = 16  # 16 ზოლი × 4 სტრიქონი: კანდიდატად ხვდება დაახლ. 0.5-ზე მეტი მსგავსების წყვილები
+HIT_THRESHOLD = 0.8
+SEED_THRESHOLD = 0.75  # უფრო დაბალ ზღვარზე ნიმუშის მოტივი ხშირად არ ემთხვევა
+CACHE_CAPACITY = 5000
+PREFIX_LENGTH = 5  # სიტყვის დასაწყისი ფლექსიური ენებისთვის (ka, ru) უხეში ფუძის როლს ასრულებს
+MERSENNE_PRIME = (1 << 31) - 1
+
+def shingles(text: str, prefix_length: int = PREFIX_LENGTH) -> set[str]:
+    words = [word[:prefix_length] for word in re.findall(r"\w+", text.lower()) if len(word) > 2]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+@dataclass
+class DreamMatch:
+    kind: str  # "hit" ან "seed"
+    similarity: float
+    interpretation: str
+    dream: str
+
+class DreamCache:
+    def __init__(self, capacity: int = CACHE_CAPACITY, hit_threshold: float = HIT_THRESHOLD,
+                 seed_threshold: float = SEED_THRESHOLD, num_permutations: int = NUM_PERMUTATIONS,
+                 bands: int = BANDS, seed: int = 1):
+        if num_permutations % bands:
+            raise ValueError("num_permutations must be divisible by bands")
+        self.capacity = capacity
+        self.hit_threshold = hit_threshold
+        self.seed_threshold = seed_threshold
+        self.bands = bands
+        self.rows = num_permutations // bands
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        # id -> (ენა, ხელმოწერა, სიზმარი, ახსნა); რიგი = LRU რიგი
+        self.entries: OrderedDict[int, tuple[str, np.ndarray, str, str]] = OrderedDict()
+        self.buckets: dict[tuple, set[int]] = {}
+        self.next_id = 0
+        self.stats = Counter()
+
+    def signature(self, text: str) -> np.ndarray | None:
+        tokens = shingles(text)
+        if not tokens:
+            return None
+        hashes = np.array([zlib.crc32(token.encode()) for token in tokens], dtype=np.uint64) % MERSENNE_PRIME
+        return ((np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, lang_code: str, signature: np.ndarray) -> list[tuple]:
+        return [(lang_code, band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def lookup(self, text: str, lang_code: str) -> DreamMatch | None:
+        signature = self.signature(text)
+        if signature is None:
+            self.stats["miss"] += 1
+            return None
+        candidates = set()
+        for key in self._band_keys(lang_code, signature):
+            candidates |= self.buckets.get(key, set())
+        best_id, best_similarity = None, 0.0
+        for entry_id in candidates:
+            similarity = float(np.mean(self.entries[entry_id][1] == signature))
+            if similarity > best_similarity:
+                best_id, best_similarity = entry_id, similarity
+        if best_id is None or best_similarity < self.seed_threshold:
+            self.stats["miss"] += 1
+            return None
+        self.entries.move_to_end(best_id)
+        _, _, dream, interpretation = self.entries[best_id]
+        kind = "hit" if best_similarity >= self.hit_threshold else "seed"
+        self.stats[kind] += 1
+        return DreamMatch(kind, best_similarity, interpretation, dream)
+
+    def add(self, text: str, lang_code: str, interpretation: str) -> None:
+        signature = self.signature(text)
+        if signature is None:
+            return
+        entry_id = self.next_id
+        self.next_id += 1
+        self.entries[entry_id] = (lang_code, signature, text, interpretation)
+        for key in self._band_keys(lang_code, signature):
+            self.buckets.setdefault(key, set()).add(entry_id)
+        while len(self.entries) > self.capacity:
+            self._evict()
+
+    def _evict(self) -> None:
+        entry_id, (lang_code, signature, _, _) = self.entries.popitem(last=False)
+        for key in self._band_keys(lang_code, signature):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[key]
+        self.stats["evicted"] += 1
+
+    def summary(self) -> str:
+        lookups = self.stats["hit"] + self.stats["seed"] + self.stats["miss"]
+        if not lookups:
+            return "no dream lookups yet"
+        return (
+            f"{lookups} dream lookups: {self.stats['hit']} cached ({100 * self.stats['hit'] / lookups:.0f}%), "
+            f"{self.stats['seed']} seeded, {self.stats['miss']} new, {len(self.entries)} cached entries, "
+            f"{self.stats['evicted']} evicted"
+        )
+
+# --- სინთეზური კორპუსი ---
+MOTIFS = {
+    "en": {
+        "teeth": ["my teeth were falling out", "my teeth fell out one by one", "I lost all my teeth", "my teeth crumbled in my mouth"],
+        "falling": ["I was falling from a tall building", "I fell off a cliff", "I was falling and could not stop", "I fell from a great height"],
+        "chased": ["someone was chasing me", "a stranger was chasing me through the streets", "I was being chased and could not run", "a man chased me in the dark"],
+        "flying": ["I was flying over the city", "I could fly above the houses", "I flew high over the sea", "I was flying like a bird"],
+        "exam": ["I was late for an exam", "I was taking an exam I had not studied for", "I failed an important exam", "I could not find the exam room"],
+        "water": ["I was drowning in deep water", "I was swimming in a dark sea", "a huge wave covered me", "water was flooding my house"],
+        "snake": ["a snake bit me", "I saw a big snake in my bed", "a black snake was following me", "I was holding a snake"],
+        "relative": ["my late grandmother visited me", "my dead father talked to me", "I saw my late grandfather smiling", "my grandmother who died was cooking"],
+    },
+    "ru": {
+        "teeth": ["у меня выпадали зубы", "у меня выпали все зубы", "зубы выпадали один за другим", "зубы крошились во рту"],
+        "falling": ["я падал с высокого здания", "я упал с обрыва", "я падал и не мог остановиться", "я падала с большой высоты"],
+        "chased": ["за мной кто-то гнался", "незнакомец гнался за мной по улицам", "за мной гнались а я не мог бежать", "мужчина гнался за мной в темноте"],
+        "flying": ["я летал над городом", "я летала над домами", "я летел высоко над морем", "я летал как птица"],
+        "exam": ["я опоздал на экзамен", "я сдавал экзамен к которому не готовился", "я провалил важный экзамен", "я не мог найти аудиторию экзамена"],
+        "water": ["я тонул в глубокой воде", "я плавал в тёмном море", "огромная волна накрыла меня", "вода затопила мой дом"],
+        "snake": ["меня укусила змея", "я увидела большую змею в кровати", "чёрная змея ползла за мной", "я держал змею в руках"],
+        "relative": ["ко мне пришла покойная бабушка", "мой умерший отец говорил со мной", "я видел покойного дедушку он улыбался", "умершая бабушка готовила еду"],
+    },
+    "ka": {
+        "teeth": ["კბილები მცვიოდა", "ყველა კბილი ამცვივდა", "კბილები სათითაოდ მცვიოდა", "კბილები პირში მეფშვნებოდა"],
+        "falling": ["მაღალი შენობიდან ვვარდებოდი", "კლდიდან გადავვარდი", "ვვარდებოდი და ვერ ვჩერდებოდი", "დიდი სიმაღლიდან ვვარდებოდი"],
+        "chased": ["ვიღაც მომდევდა", "უცნობი ქუჩებში მომდევდა", "მომდევდნენ და სირბილი ვერ შევძელი", "სიბნელეში კაცი მომდევდა"],
+        "flying": ["ქალაქის თავზე დავფრინავდი", "სახლების თავზე ვფრენდი", "ზღვის თავზე მაღლა დავფრინავდი", "ჩიტივით დავფრინავდი"],
+        "exam": ["გამოცდაზე დამაგვიანდა", "გამოცდას ვაბარებდი და არ ვიყავი მომზადებული", "მნიშვნელოვანი გამოცდა ჩავიჭერი", "საგამოცდო ოთახს ვერ ვპოულობდი"],
+        "water": ["ღრმა წყალში ვიხრჩობოდი", "ბნელ ზღვაში ვცურავდი", "დიდმა ტალღამ დამფარა", "წყალმა სახლი დატბორა"],
+        "snake": ["გველმა მიკბინა", "ლოგინში დიდი გველი დავინახე", "შავი გველი მომდევდა", "ხელში გველი მეჭირა"],
+        "relative": ["გარდაცვლილი ბებია მესტუმრა", "გარდაცვლილი მამა მელაპარაკებოდა", "გარდაცვლილი ბაბუა დავინახე და იღიმოდა", "გარდაცვლილი ბებია საჭმელს ამზადებდა"],
+    },
+}
+OPENINGS = {
+    "en": ["I dreamed that", "Last night I dreamed", "I had a dream where", "In my dream", ""],
+    "ru": ["Мне приснилось что", "Сегодня ночью мне снилось что", "Во сне", "Мне снилось как", ""],
+    "ka": ["დამესიზმრა რომ", "წუხელ დამესიზმრა რომ", "სიზმარში", "ვნახე სიზმარი რომ", ""],
+}
+ENDINGS = {
+    "en": ["", "", "and I woke up scared", "what does it mean?", "it felt very real", "and then I woke up"],
+    "ru": ["", "", "и я проснулся в страхе", "что это значит?", "всё было как наяву", "и потом я проснулась"],
+    "ka": ["", "", "და შეშინებულმა გამეღვიძა", "რას ნიშნავს?", "ძალიან რეალური იყო", "და მერე გამეღვიძა"],
+}
+
+def synthetic_dream(rng: random.Random, lang_code: str, motifs: list[str], weights: list[float]) -> tuple[str, tuple]:
+    # ზოგი სიზმარი ერთ მოტივს შეიცავს, ზოგი ორს (ასეთი კომბინაცია იშვიათად მეორდება)
+    chosen = [rng.choices(motifs, weights)[0]]
+    if rng.random() < 0.3:
+        chosen.append(rng.choice([m for m in motifs if m != chosen[0]]))
+    parts = [rng.choice(OPENINGS[lang_code])] + [rng.choice(MOTIFS[lang_code][m]) for m in chosen] + [rng.choice(ENDINGS[lang_code])]
+    return " ".join(part for part in parts if part), tuple(chosen)
+
+def report(dreams: int, thresholds: list[tuple[float, float]], capacity: int, seed: int) -> None:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(dreams):
+        lang_code = rng.choice(list(MOTIFS))
+        motifs = list(MOTIFS[lang_code])
+        weights = [1 / (rank + 1) for rank in range(len(motifs))]
+        text, labels = synthetic_dream(rng, lang_code, motifs, weights)
+        corpus.append((lang_code, text, labels))
+
+    print(f"{dreams} synthetic dreams in {len(MOTIFS)} languages, cache capacity {capacity}")
+    for hit_threshold, seed_threshold in thresholds:
+        cache = DreamCache(capacity=capacity, hit_threshold=hit_threshold, seed_threshold=seed_threshold)
+        labels_by_text = {}
+        correct = Counter()
+        timings = []
+        for lang_code, text, labels in corpus:
+            started = time.perf_counter()
+            match = cache.lookup(text, lang_code)
+            timings.append(time.perf_counter() - started)
+            if match is not None:
+                # ქეშის პასუხი სწორია, თუ ნაპოვნ სიზმარს იგივე მოტივები ჰქონდა
+                correct[match.kind] += labels_by_text[match.dream] == labels
+            if match is None or match.kind == "seed":
+                cache.add(text, lang_code, f"interpretation of {text}")
+                labels_by_text[text] = labels
+        stats = cache.stats
+        model_calls = stats["seed"] + stats["miss"]
+        print(
+            f"hit>={hit_threshold} seed>={seed_threshold}: {stats['hit']} answered from cache "
+            f"({100 * stats['hit'] / dreams:.1f}%, precision {100 * correct['hit'] / max(stats['hit'], 1):.1f}%), "
+            f"{stats['seed']} seeded (precision {100 * correct['seed'] / max(stats['seed'], 1):.1f}%), "
+            f"model calls {model_calls} of {dreams} (saved {dreams - model_calls}), "
+            f"lookup median {1e6 * statistics.median(timings):.0f}µs, evicted {stats['evicted']}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report dream-cache hit rate and saved model calls on a synthetic corpus.")
+    parser.add_argument("--dreams", type=int, default=5000)
+    parser.add_argument("--capacity", type=int, default=CACHE_CAPACITY)
+    parser.add_argument("--thresholds", default="0.8:0.5,0.8:0.65,0.8:0.7,0.8:0.75,0.9:0.75",
+                        help="Comma-separated hit:seed similarity threshold pairs to compare.")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+    thresholds = [tuple(float(v) for v in pair.split(":")) for pair in args.thresholds.split(",")]
+    report(args.dreams, thresholds, args.capacity, args.seed)
+
+if __name__ == "__main__":
+    main()
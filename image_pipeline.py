@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+# ფოტოების მილსადენი ქირომანტიისა და ყავის ჩახედვისთვის: Telegram-იდან მხოლოდ საკმარისი
+# ზომის ვერსია ჩამოიტვირთება, შემცირება და ხელახალი კოდირება პროცესების პულში ხდება,
+# განმეორებული ფოტოები კი მხოლოდ file_unique_id-ით ამოიცნობა (აღქმითი ჰეში, dHash, ინახება, მაგრამ
+# ერთნაირად გადაღებულ სხვადასხვა ფოტოს ვერ ასხვავებს — იხ. --validate).
+import argparse
+import asyncio
+import io
+import multiprocessing
+import random
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+IMAGE_MIN_SIDE = 640  # ხელისგულის ხაზებისა და ნალექის ნიმუშის გასარჩევად საკმარისი მოკლე გვერდი
+IMAGE_MAX_SIDE = 1024
+IMAGE_JPEG_QUALITY = 85
+# ხელახლა ატვირთული/შეკუმშული ფოტოს მაქსიმალური მანძილი; --validate აჩვენებს, რომ ეს ზღვარი
+# ერთნაირად გადაღებულ სხვა ფოტოებსაც იჭერს, ამიტომ ბოტი ჰეშით წაკითხვას ხელახლა არ იყენებს
+DHASH_MAX_DISTANCE = 4
+
+def select_photo_size(sizes, min_side: int = IMAGE_MIN_SIDE):
+    # Telegram ერთ ფოტოს რამდენიმე ზომით ინახავს: ვიღებთ უმცირესს, რომლის მოკლე გვერდი საკმარისია
+    adequate = [size for size in sizes if min(size.width, size.height) >= min_side]
+    if adequate:
+        return min(adequate, key=lambda size: size.width * size.height)
+    return max(sizes, key=lambda size: size.width * size.height)
+
+def dhash(image, hash_size: int = 8) -> int:
+    from PIL import Image
+
+    gray = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = gray.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for column in range(hash_size):
+            bits = bits << 1 | (pixels[offset + column] > pixels[offset + column + 1])
+    return bits
+
+def prepare_image(data: bytes, max_side: int = IMAGE_MAX_SIDE, quality: int = IMAGE_JPEG_QUALITY) -> tuple[bytes, int]:
+    # პულის პროცესში სრულდება: დეკოდირება, ორიენტაცია, ჰეში, შემცირება და JPEG
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB")
+    image_hash = dhash(image)
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=quality, optimize=True)
+    return output.getvalue(), image_hash
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+class ImagePipeline:
+    def __init__(self, workers: int, min_side: int = IMAGE_MIN_SIDE, max_side: int = IMAGE_MAX_SIDE,
+                 quality: int = IMAGE_JPEG_QUALITY):
+        self.workers = workers
+        self.min_side = min_side
+        self.max_side = max_side
+        self.quality = quality
+        self.outcomes = Counter()
+        self.bytes_downloaded = 0
+        self.bytes_to_model = 0
+        self.latencies = []
+        self._pool = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def select(self, sizes):
+        return select_photo_size(sizes, self.min_side)
+
+    async def prepare(self, data: bytes) -> tuple[bytes, int]:
+        self.bytes_downloaded += len(data)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.pool, prepare_image, data, self.max_side, self.quality)
+        except BrokenProcessPool:
+            # მოკლული პროცესის შემდეგ პული აღარ მუშაობს: შემდეგი მოთხოვნა ახალს შექმნის
+            self.shutdown()
+            raise
+
+    def record(self, outcome: str, latency: float, model_bytes: int = 0):
+        # outcome: "file_unique_id" (ქეშიდან) ან "model" (ახალი წაკითხვა)
+        self.outcomes[outcome] += 1
+        self.bytes_to_model += model_bytes
+        self.latencies.append(latency)
+        del self.latencies[:-1000]
+
+    def summary(self) -> str:
+        readings = sum(self.outcomes.values())
+        if not readings:
+            return "no image readings yet"
+        cached = self.outcomes["file_unique_id"]
+        p95 = statistics.quantiles(self.latencies, n=20)[-1] if len(self.latencies) > 1 else self.latencies[0]
+        return (
+            f"{readings} image readings ({dict(self.outcomes)}, {100 * cached / readings:.0f}% cached), "
+            f"downloaded {self.bytes_downloaded / 1e6:.2f} MB, sent to model {self.bytes_to_model / 1e6:.2f} MB, "
+            f"latency p50 {statistics.median(self.latencies):.2f}s p95 {p95:.2f}s"
+        )
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+# --- ბენჩმარკი სინთეზური ფოტოებით ---
+# Telegram-ის ფოტოს ზომები (გრძელი გვერდი) და სიმულირებული ქსელი/მოდელი
+TELEGRAM_SIZES = (90, 320, 800, 1280, 2560)
+
+class FakePhotoSize:
+    def __init__(self, file_unique_id: str, data: bytes, width: int, height: int):
+        self.file_unique_id = file_unique_id
+        self.data = data
+        self.width = width
+        self.height = height
+        self.file_size = len(data)
+
+def synthetic_photo(seed: int, quality: int = 90) -> bytes:
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(seed)
+    image = Image.new("RGB", (2560, 1920), tuple(rng.randint(120, 220) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(250):
+        x, y = rng.randint(0, 2560), rng.randint(0, 1920)
+        draw.line((x, y, x + rng.randint(-600, 600), y + rng.randint(-400, 400)),
+                  fill=tuple(rng.randint(0, 255) for _ in range(3)), width=rng.randint(2, 14))
+    noise = Image.effect_noise((2560, 1920), 40).convert("RGB")
+    image = Image.blend(image, noise, 0.25).filter(ImageFilter.GaussianBlur(1))
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=quality)
+    return output.getvalue()
+
+def synthetic_scene(layout_seed: int, detail_seed: int):
+    # ერთნაირი კადრი (ფონი, ხელისგული/ფინჯანი, დიდი ფორმები) layout_seed-ით, წვრილი ხაზები detail_seed-ით:
+    # ერთი layout_seed და სხვადასხვა detail_seed = ერთნაირად გადაღებული, მაგრამ სხვა ხელი ან ნალექი
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(layout_seed)
+    image = Image.new("RGB", (2560, 1920), tuple(rng.randint(120, 220) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    cx, cy = 1280 + rng.randint(-200, 200), 960 + rng.randint(-150, 150)
+    rx, ry = rng.randint(600, 800), rng.randint(500, 700)
+    draw.ellipse((cx - rx, cy - ry, cx + rx, cy + ry), fill=tuple(rng.randint(150, 240) for _ in range(3)))
+    for _ in range(6):
+        x, y = rng.randint(0, 2560), rng.randint(0, 1920)
+        draw.line((x, y, x + rng.randint(-900, 900), y + rng.randint(-700, 700)),
+                  fill=tuple(rng.randint(0, 255) for _ in range(3)), width=rng.randint(40, 120))
+    detail = random.Random(detail_seed)
+    for _ in range(60):
+        x, y = cx + detail.randint(-rx // 2, rx // 2), cy + detail.randint(-ry // 2, ry // 2)
+        draw.line((x, y, x + detail.randint(-400, 400), y + detail.randint(-300, 300)),
+                  fill=tuple(detail.randint(40, 140) for _ in range(3)), width=detail.randint(3, 10))
+    noise = Image.effect_noise((2560, 1920), 40).convert("RGB")
+    return Image.blend(image, noise, 0.2).filter(ImageFilter.GaussianBlur(1))
+
+def reencoded_hash(image, side: int, quality: int) -> int:
+    from PIL import Image
+
+    copy = image.copy()
+    copy.thumbnail((side, side))
+    output = io.BytesIO()
+    copy.save(output, "JPEG", quality=quality)
+    return dhash(Image.open(io.BytesIO(output.getvalue())).convert("RGB"))
+
+def validate(scenes: int, seed: int) -> None:
+    # მანძილები სამ ჯგუფში: იგივე ფოტო ხელახლა (800px, q70), ერთნაირად გადაღებული სხვა ფოტო, სრულიად სხვა ფოტო
+    reuploads, near_identical, unrelated = [], [], []
+    for i in range(scenes):
+        original = synthetic_scene(seed + i, seed + 10_000 + i)
+        stored = reencoded_hash(original, 1280, 87)
+        reuploads.append(hamming(stored, reencoded_hash(original, 800, 70)))
+        near_identical.append(hamming(stored, reencoded_hash(synthetic_scene(seed + i, seed + 20_000 + i), 1280, 87)))
+        unrelated.append(hamming(stored, reencoded_hash(synthetic_scene(seed + 30_000 + i, seed + 40_000 + i), 1280, 87)))
+    for label, distances in (("re-upload of the same photo", reuploads), ("same framing, different photo", near_identical),
+                             ("unrelated photo", unrelated)):
+        matched = sum(distance <= DHASH_MAX_DISTANCE for distance in distances)
+        print(f"{label:<31} distance min {min(distances):>2} median {statistics.median(distances):>4} max {max(distances):>2}; "
+              f"within {DHASH_MAX_DISTANCE}: {matched}/{len(distances)}")
+    print("The bot reuses readings only for exact file_unique_id matches; near-identical distinct photos rule out dHash reuse.")
+
+def telegram_sizes(photo_id: str, original: bytes) -> list[FakePhotoSize]:
+    from PIL import Image
+
+    sizes = []
+    base = Image.open(io.BytesIO(original))
+    for side in TELEGRAM_SIZES:
+        image = base.copy()
+        image.thumbnail((side, side))
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=87)
+        sizes.append(FakePhotoSize(f"{photo_id}-{side}", output.getvalue(), *image.size))
+    return sizes
+
+async def simulate(photos: list[list[FakePhotoSize]], stream: list[int], optimized: bool, workers: int,
+                   download_mbps: float, upload_mbps: float, model_seconds: float, concurrency: int,
+                   arrival_interval: float) -> str:
+    from model_router import ModelRouter, ModelTier
+
+    pipeline = ImagePipeline(workers)
+    router = ModelRouter([ModelTier("vision", "fake-vision")], max_concurrency=concurrency)
+    readings: dict[int, str] = {}
+    by_unique_id: dict[str, int] = {}
+    if optimized:
+        pipeline.pool.submit(int).result()
+
+    async def reading(sizes: list[FakePhotoSize]):
+        started = time.monotonic()
+        photo = pipeline.select(sizes) if optimized else max(sizes, key=lambda size: size.width)
+        if optimized and photo.file_unique_id in by_unique_id:
+            pipeline.record("file_unique_id", time.monotonic() - started)
+            return
+        await asyncio.sleep(photo.file_size / (download_mbps * 125_000))
+        if optimized:
+            jpeg, _ = await pipeline.prepare(photo.data)
+        else:
+            pipeline.bytes_downloaded += len(photo.data)
+            jpeg = photo.data
+        async with router.slot():
+            await asyncio.sleep(len(jpeg) / (upload_mbps * 125_000) + model_seconds)
+        reading_id = len(readings)
+        readings[reading_id] = "reading"
+        if optimized:
+            by_unique_id[photo.file_unique_id] = reading_id
+        pipeline.record("model", time.monotonic() - started, len(jpeg))
+
+    tasks = []
+    for index in stream:
+        tasks.append(asyncio.create_task(reading(photos[index])))
+        await asyncio.sleep(random.expovariate(1 / arrival_interval))
+    await asyncio.gather(*tasks)
+    pipeline.shutdown()
+    return f"{'pipeline' if optimized else 'naive   '}: {pipeline.summary()}"
+
+def benchmark(uploads: int, distinct: int, resend_share: float, workers: int, download_mbps: float,
+              upload_mbps: float, model_seconds: float, concurrency: int, arrival_interval: float, seed: int) -> None:
+    rng = random.Random(seed)
+    originals = [synthetic_photo(seed * 1000 + i) for i in range(distinct)]
+    photos = [telegram_sizes(f"p{i}", original) for i, original in enumerate(originals)]
+    # იგივე ფოტო სხვა ჩატიდან/ხელახლა გადაღებული: ახალი file_unique_id, მსგავსი შიგთავსი — ბოტის მსგავსად
+    # ისინი მოდელთან მიდის, ხელახლა მხოლოდ ზუსტად იგივე file_unique_id გამოიყენება
+    near_duplicates = [telegram_sizes(f"n{i}", synthetic_photo(seed * 1000 + i, quality=70)) for i in range(distinct)]
+    stream, catalog = [], photos + near_duplicates
+    for i in range(uploads):
+        if i < distinct or rng.random() > resend_share:
+            stream.append(i % distinct)
+        else:
+            original = rng.randrange(distinct)
+            stream.append(original if rng.random() < 0.5 else distinct + original)
+    print(f"{uploads} uploads of {distinct} distinct photos ({resend_share:.0%} re-sends or near-duplicates), "
+          f"download {download_mbps} Mbit/s, upload {upload_mbps} Mbit/s, model {model_seconds}s, "
+          f"one upload per ~{arrival_interval}s")
+    for optimized in (False, True):
+        random.seed(seed)
+        print(asyncio.run(simulate(catalog, stream, optimized, workers, download_mbps, upload_mbps, model_seconds,
+                                   concurrency, arrival_interval)))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark bytes transferred and latency per image reading.")
+    parser.add_argument("--uploads", type=int, default=60)
+    parser.add_argument("--distinct", type=int, default=20)
+    parser.add_argument("--resend-share", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--download-mbps", type=float, default=50.0)
+    parser.add_argument("--upload-mbps", type=float, default=20.0)
+    parser.add_argument("--model-seconds", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--arrival-interval", type=float, default=0.5, help="Mean seconds between uploads.")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--validate", action="store_true", help="Report dHash distances for re-uploads and near-identical distinct photos instead.")
+    parser.add_argument("--scenes", type=int, default=40, help="Synthetic scenes for --validate.")
+    args = parser.parse_args()
+    if args.validate:
+        validate(args.scenes, args.seed)
+        return
+    benchmark(args.uploads, args.distinct, args.resend_share, args.workers, args.download_mbps, args.upload_mbps,
+              args.model_seconds, args.concurrency, args.arrival_interval, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+# -*- coding: utf-8 -*-
+# სასაუბრო დატვირთვის გენერატორი: სკრიპტირებული დიალოგები გადის რეალურ
+# ConversationHandler-ზე, Bot API კი ლოკალური ყალბი სერვერია.
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes
+
+import bot
+from persistence import PERSISTENCE_FLUSH_SECONDS, SQLitePersistence
+
+logger = logging.getLogger("loadgen")
+
+FAKE_TOKEN = "123456:LOADTEST"
+FAKE_BOT_ID = 123456
+
+# --- ყალბი Bot API ---
+class FakeBotAPI:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.calls = defaultdict(int)
+        self.first_call_at: dict[str, float] = {}
+        # getUpdates-ისთვის: სატესტო update-ები, რომლებსაც long polling-ით მოითხოვს ბოტი
+        self.updates: list[dict] = []
+        self._updates_added = asyncio.Event()
+        self._closing = False
+        self._connections: set[asyncio.Task] = set()
+        self._server = None
+        self._message_ids = itertools.count(1)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        # ლოდინში მყოფი getUpdates-ები ცარიელი პასუხით მთავრდება, რომ კავშირები დაიხუროს
+        self._closing = True
+        self._updates_added.set()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._connections:
+            await asyncio.wait(self._connections, timeout=5)
+
+    def add_update(self, update: dict):
+        self.updates.append(update)
+        self._updates_added.set()
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset", 0) or 0)
+        deadline = time.monotonic() + float(params.get("timeout", 0) or 0)
+        while True:
+            pending = [update for update in self.updates if update["update_id"] >= offset]
+            if pending or self._closing or time.monotonic() >= deadline:
+                return pending
+            self._updates_added.clear()
+            try:
+                await asyncio.wait_for(self._updates_added.wait(), timeout=deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                pass
+
+    def _result_for(self, method: str, params: dict):
+        if method == "getme":
+            return {"id": FAKE_BOT_ID, "is_bot": True, "first_name": "LoadBot", "username": "load_test_bot"}
+        if method in ("sendmessage", "editmessagetext"):
+            chat_id = int(params.get("chat_id", 0) or 0)
+            return {
+                "message_id": int(params.get("message_id", 0) or 0) or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": FAKE_BOT_ID, "is_bot": True, "first_name": "LoadBot"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+
+                method = path.rsplit("/", 1)[-1].lower()
+                params = {}
+                if body:
+                    if headers.get("content-type", "").startswith("application/json"):
+                        params = json.loads(body)
+                    else:
+                        params = {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+                self.calls[method] += 1
+                self.first_call_at.setdefault(method, time.time())
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                result = await self._get_updates(params) if method == "getupdates" else self._result_for(method, params)
+                payload = json.dumps({"ok": True, "result": result}).encode("utf-8")
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+# --- სკრიპტები ---
+@dataclass
+class Step:
+    label: str
+    kind: str  # "text" ან "callback"
+    payload: str
+
+def _onboarding_tail(lang: str) -> list[Step]:
+    return [
+        Step("time", "text", "15:30"),
+        Step("country", "text", "Georgia"),
+        Step("city", "text", "Tbilisi"),
+    ]
+
+def script_happy_path(lang: str) -> list[Step]:
+    return [
+        Step("start", "text", "/start"),
+        Step("lang", "callback", f"lang_{lang}"),
+        Step("name", "text", "Load Tester"),
+        Step("date", "text", "1989/11/29"),
+    ] + _onboarding_tail(lang)
+
+def script_invalid_retries(lang: str) -> list[Step]:
+    return [
+        Step("start", "text", "/start"),
+        Step("lang", "callback", f"lang_{lang}"),
+        Step("name_retry", "text", "X"),
+        Step("name", "text", "Retry Tester"),
+        Step("date_retry", "text", "1989-11-29"),
+        Step("date_retry", "text", "1800/01/01"),
+        Step("date", "text", "1990/01/15"),
+        Step("time_retry", "text", "25:61"),
+        Step("time", "text", bot.get_text("time_unknown_button", lang)),
+        Step("country", "text", "Georgia"),
+        Step("city", "text", "Batumi"),
+    ]
+
+def script_cancel(lang: str) -> list[Step]:
+    return [
+        Step("start", "text", "/start"),
+        Step("lang", "callback", f"lang_{lang}"),
+        Step("name", "text", "Cancel Tester"),
+        Step("date", "text", "1975/06/01"),
+        Step("cancel", "text", "/cancel"),
+    ]
+
+def script_reentry(lang: str) -> list[Step]:
+    return [
+        Step("start", "text", "/start"),
+        Step("lang", "callback", f"lang_{lang}"),
+        Step("name", "text", "Reentry Tester"),
+        Step("restart", "text", "/start"),
+        Step("initiate", "callback", "initiate_chart_creation"),
+        Step("name", "text", "Reentry Tester"),
+        Step("date", "text", "2001/02/03"),
+    ] + _onboarding_tail(lang)
+
+def script_menu_taps(lang: str) -> list[Step]:
+    keys = ["main_menu_button_view_chart", "main_menu_button_horoscope", "main_menu_button_dream",
+            "main_menu_button_palmistry", "main_menu_button_coffee", "main_menu_button_help"]
+    return [Step("start", "text", "/start"), Step("lang", "callback", f"lang_{lang}"), Step("cancel", "text", "/cancel")] + [
+        Step(f"menu:{key.removeprefix('main_menu_button_')}", "text", bot.get_text(key, lang)) for key in keys
+    ]
+
+def script_returning_user(lang: str) -> list[Step]:
+    return script_happy_path(lang) + [
+        Step("start", "text", "/start"),
+        Step("initiate", "callback", "initiate_chart_creation"),
+        Step("use_saved", "callback", "use_saved_chart_conv"),
+    ]
+
+SCRIPTS = {
+    "happy": script_happy_path,
+    "invalid": script_invalid_retries,
+    "cancel": script_cancel,
+    "reentry": script_reentry,
+    "menu": script_menu_taps,
+    "returning": script_returning_user,
+}
+DEFAULT_MIX = "happy=4,invalid=2,cancel=1,reentry=1,menu=2,returning=1"
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCRIPTS:
+            raise argparse.ArgumentTypeError(f"Unknown script '{name}'. Known: {', '.join(SCRIPTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+# --- Update-ების აგება ---
+class UpdateFactory:
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+
+    def _message(self, user_id: int, text: str, from_bot: bool = False) -> dict:
+        sender = (
+            {"id": FAKE_BOT_ID, "is_bot": True, "first_name": "LoadBot"}
+            if from_bot else {"id": user_id, "is_bot": False, "first_name": "Load", "language_code": "en"}
+        )
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": sender,
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return message
+
+    def build(self, user_id: int, step: Step) -> dict:
+        if step.kind == "callback":
+            return {
+                "update_id": next(self._update_ids),
+                "callback_query": {
+                    "id": str(next(self._update_ids)),
+                    "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+                    "chat_instance": str(user_id),
+                    "data": step.payload,
+                    "message": self._message(user_id, "inline keyboard", from_bot=True),
+                },
+            }
+        return {"update_id": next(self._update_ids), "message": self._message(user_id, step.payload)}
+
+# --- სტატისტიკა ---
+@dataclass
+class LoadStats:
+    latencies: dict = field(default_factory=lambda: defaultdict(list))
+    errors: dict = field(default_factory=lambda: defaultdict(int))
+    conversations: dict = field(default_factory=lambda: defaultdict(int))
+    current_label: dict = field(default_factory=dict)
+
+    def record(self, label: str, seconds: float, failed: bool):
+        self.latencies[label].append(seconds)
+        if failed:
+            self.errors[label] += 1
+
+    def report(self, elapsed: float, api_calls: dict) -> str:
+        def pct(values, q):
+            if len(values) == 1:
+                return values[0]
+            return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+        all_latencies = [v for values in self.latencies.values() for v in values]
+        total_errors = sum(self.errors.values())
+        lines = [
+            f"Elapsed: {elapsed:.1f}s, conversations: {sum(self.conversations.values())} "
+            f"({', '.join(f'{k}={v}' for k, v in sorted(self.conversations.items()))})",
+            f"Updates: {len(all_latencies)} ({len(all_latencies) / elapsed if elapsed else 0:.1f}/s), "
+            f"errors: {total_errors} ({100 * total_errors / max(len(all_latencies), 1):.2f}%)",
+            f"Bot API calls: {sum(api_calls.values())} ({', '.join(f'{k}={v}' for k, v in sorted(api_calls.items()))})",
+            "",
+            f"{'transition':<22}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}",
+        ]
+        for label in sorted(self.latencies):
+            values = sorted(self.latencies[label])
+            lines.append(
+                f"{label:<22}{len(values):>8}{pct(values, 50) * 1000:>10.2f}{pct(values, 95) * 1000:>10.2f}"
+                f"{pct(values, 99) * 1000:>10.2f}{values[-1] * 1000:>10.2f}{self.errors.get(label, 0):>8}"
+            )
+        return "\n".join(lines)
+
+# --- სიმულატორი ---
+class LoadGenerator:
+    def __init__(self, application: Application, mix: dict[str, float], languages: list[str],
+                 think_ms: float = 0.0, seed: int | None = None, write_through: bool = False):
+        self.application = application
+        self.write_through = write_through
+        self.mix = mix
+        self.languages = languages
+        self.think = think_ms / 1000
+        self.random = random.Random(seed)
+        self.stats = LoadStats()
+        self.factory = UpdateFactory()
+        self._user_ids = itertools.count(10_000_000)
+        application.add_error_handler(self._on_error)
+
+    async def _on_error(self, update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+        user = getattr(update, "effective_user", None)
+        label = self.stats.current_label.get(user.id) if user else None
+        self.stats.errors[label or "unknown"] += 1
+        logger.debug(f"Handler error for {label}: {context.error}")
+
+    async def run_conversation(self):
+        script_name = self.random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        lang = self.random.choice(self.languages)
+        user_id = next(self._user_ids)
+        for step in SCRIPTS[script_name](lang):
+            update = Update.de_json(self.factory.build(user_id, step), self.application.bot)
+            self.stats.current_label[user_id] = step.label
+            started = time.perf_counter()
+            failed = False
+            try:
+                await self.application.process_update(update)
+                if self.write_through:
+                    # საბაზისო ვარიანტი შედარებისთვის: ყოველი update-ის შემდეგ სინქრონული ჩაწერა
+                    await self.application.update_persistence()
+                    await self.application.persistence.flush()
+            except Exception as e:
+                failed = True
+                logger.debug(f"process_update failed at {step.label}: {e}")
+            self.stats.record(step.label, time.perf_counter() - started, failed)
+            if self.think:
+                await asyncio.sleep(self.random.expovariate(1 / self.think))
+        self.stats.current_label.pop(user_id, None)
+        self.stats.conversations[script_name] += 1
+
+    async def run_closed_loop(self, duration: float, users: int):
+        deadline = time.monotonic() + duration
+
+        async def virtual_user():
+            while time.monotonic() < deadline:
+                await self.run_conversation()
+
+        await asyncio.gather(*(virtual_user() for _ in range(users)))
+
+    async def run_open_loop(self, duration: float, rate: float):
+        deadline = time.monotonic() + duration
+        tasks = set()
+        while time.monotonic() < deadline:
+            task = asyncio.create_task(self.run_conversation())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            await asyncio.sleep(self.random.expovariate(rate))
+        if tasks:
+            await asyncio.gather(*tasks)
+
+async def fake_generate_and_send_chart(user_id: int, chat_id: int, context: ContextTypes.DEFAULT_TYPE,
+                                       is_new_data: bool = False, data_to_process: dict | None = None,
+                                       chart_latency: float = 0.0):
+    lang_code = context.user_data.get('lang_code', bot.DEFAULT_LANGUAGE)
+    current_user_data = data_to_process or bot.get_user_data(user_id)
+    if not current_user_data:
+        await context.bot.send_message(chat_id=chat_id, text=bot.get_text("no_data_found", lang_code))
+        return bot.ConversationHandler.END
+    if is_new_data or not current_user_data.get('full_chart_text'):
+        if chart_latency:
+            await asyncio.sleep(chart_latency)
+        bot.save_user_data(user_id, current_user_data, chart_text="[SECTION: PlanetsInSignsStart]load test[SECTION: PlanetsInSignsEnd]")
+    await context.bot.send_message(chat_id=chat_id, text=bot.get_text("chart_ready_menu_prompt", lang_code),
+                                   reply_markup=bot.get_main_menu_keyboard(lang_code))
+    return bot.ConversationHandler.END
+
+async def run(args: argparse.Namespace) -> str:
+    api = FakeBotAPI(latency_ms=args.api_latency_ms)
+    await api.start()
+
+    db_dir = tempfile.TemporaryDirectory()
+    bot.DB_FILE = args.db or str(Path(db_dir.name) / "loadgen.db")
+    bot.init_db()
+    if not args.real_charts:
+        chart_latency = args.chart_latency_ms / 1000
+
+        async def generate(*a, **kw):
+            return await fake_generate_and_send_chart(*a, chart_latency=chart_latency, **kw)
+
+        bot.generate_and_send_chart = generate
+
+    persistence = None
+    if args.persistence != "off":
+        persistence = SQLitePersistence(bot.DB_FILE, update_interval=args.flush_interval,
+                                        conversation_timeout=bot.CONVERSATION_TIMEOUT_SECONDS)
+    application = bot.build_application(FAKE_TOKEN, base_url=api.base_url, persistence=persistence)
+    generator = LoadGenerator(application, args.mix, args.languages, think_ms=args.think_ms, seed=args.seed,
+                              write_through=args.persistence == "write-through")
+
+    async def persistence_updater():
+        # Application.start()-ის ინტერვალური ციკლის ანალოგი (polling აქ არ ეშვება)
+        while True:
+            await asyncio.sleep(args.flush_interval)
+            await application.update_persistence()
+
+    updater = None
+    try:
+        await application.initialize()
+        if args.persistence == "write-behind":
+            updater = asyncio.create_task(persistence_updater())
+        started = time.perf_counter()
+        if args.rate:
+            await generator.run_open_loop(args.duration, args.rate)
+        else:
+            await generator.run_closed_loop(args.duration, args.users)
+        elapsed = time.perf_counter() - started
+    finally:
+        if updater:
+            updater.cancel()
+        await application.shutdown()
+        await api.stop()
+        db_dir.cleanup()
+    report = generator.stats.report(elapsed, api.calls)
+    if persistence:
+        report += f"\nPersistence: {persistence.summary()}"
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay scripted conversations through the bot's ConversationHandler against a local fake Bot API.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Run time in seconds.")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users (closed loop).")
+    parser.add_argument("--rate", type=float, default=0.0, help="Target conversations/sec (open loop); overrides --users.")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Script weights, default '{DEFAULT_MIX}'.")
+    parser.add_argument("--languages", type=lambda s: s.split(","), default=["ka", "en", "ru"])
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mean think time between steps.")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="Latency added by the fake Bot API.")
+    parser.add_argument("--chart-latency-ms", type=float, default=0.0, help="Simulated chart generation time.")
+    parser.add_argument("--real-charts", action="store_true", help="Run the real Kerykeion/Gemini pipeline on completed onboarding.")
+    parser.add_argument("--db", help="SQLite file to use instead of a temporary one.")
+    parser.add_argument("--persistence", choices=["off", "write-through", "write-behind"], default="off",
+                        help="Persist user_data and conversation states; write-through writes after every update.")
+    parser.add_argument("--flush-interval", type=float, default=PERSISTENCE_FLUSH_SECONDS, help="Write-behind interval in seconds.")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    logging.getLogger("telegram").setLevel(logging.WARNING)
+    logging.getLogger("bot").setLevel(logging.WARNING)
+    logging.getLogger("__main__").setLevel(logging.WARNING)
+    print(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# დატვირთვაზე დამოკიდებული მოდელის არჩევა: რიგის სიღრმისა და ბოლო
+# დაყოვნების მიხედვით ირჩევა მოდელის დონე ან მოკლე ინსტრუქციები.
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class ModelTier:
+    name: str
+    model_name: str
+    brief: bool = False
+    # დონე აირჩევა, სანამ რიგი და დაყოვნება ამ ზღვრებს არ აღემატება
+    max_queue_depth: int | None = None
+    max_latency: float | None = None
+
+class ModelRouter:
+    def __init__(self, tiers: list[ModelTier], max_concurrency: int, ewma_alpha: float = 0.2):
+        self.tiers = tiers
+        self.max_concurrency = max_concurrency
+        self.ewma_alpha = ewma_alpha
+        self.in_flight = 0
+        self.waiting = 0
+        # ფონური/პაკეტური მოთხოვნები: იმავე ლიმიტს იზიარებს, მაგრამ რიგის სიღრმეში და დაყოვნებაში არ ითვლება
+        self.background_in_flight = 0
+        self.latency_ewma = 0.0
+        self.choices = Counter()
+        self._semaphore = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self.in_flight + self.waiting
+
+    @property
+    def primary(self) -> ModelTier:
+        return self.tiers[0]
+
+    def choose(self) -> ModelTier:
+        depth = self.queue_depth
+        for tier in self.tiers:
+            if tier.max_queue_depth is not None and depth > tier.max_queue_depth:
+                continue
+            if tier.max_latency is not None and self.latency_ewma > tier.max_latency:
+                continue
+            break
+        self.choices[tier.name] += 1
+        return tier
+
+    def is_degraded(self, tier_name: str | None) -> bool:
+        return tier_name is not None and tier_name != self.primary.name
+
+    def is_idle(self) -> bool:
+        # ფონური გაუმჯობესება მხოლოდ მაშინ, როცა ძირითადი დონე თავისუფლად ეტევა
+        primary = self.primary
+        return (
+            self.waiting == 0
+            and self.in_flight + self.background_in_flight < max(1, self.max_concurrency // 2)
+            and (primary.max_latency is None or self.latency_ewma <= primary.max_latency / 2)
+        )
+
+    def record_latency(self, seconds: float):
+        if self.latency_ewma == 0.0:
+            self.latency_ewma = seconds
+        else:
+            self.latency_ewma += self.ewma_alpha * (seconds - self.latency_ewma)
+
+    @asynccontextmanager
+    async def slot(self, interactive: bool = True, track_latency: bool = True):
+        # interactive=False: ღამის პაკეტები და ფონური გადაწერა choose()-ის სიღრმესა და EWMA-ს არ ცვლის;
+        # track_latency=False: მომხმარებლის სხვა ტიპის (სურათი, სიზმარი) ზარი რიგში ითვლება, დაყოვნება კი არა
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if interactive:
+            self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            if interactive:
+                self.waiting -= 1
+        if interactive:
+            self.in_flight += 1
+        else:
+            self.background_in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            if interactive:
+                self.in_flight -= 1
+            else:
+                self.background_in_flight -= 1
+            self._semaphore.release()
+            if interactive and track_latency:
+                self.record_latency(time.monotonic() - started)
+
+# --- სიმულაცია ყალბი მოდელებით ---
+class FakeModel:
+    def __init__(self, name: str, base_latency: float, per_sentence: float):
+        self.name = name
+        self.base_latency = base_latency
+        self.per_sentence = per_sentence
+
+    async def generate(self, brief: bool) -> float:
+        sentences = 2 if brief else 5
+        latency = (self.base_latency + self.per_sentence * sentences) * random.uniform(0.8, 1.2)
+        await asyncio.sleep(latency)
+        return latency
+
+async def simulate(requests: int, arrival_rate: float, concurrency: int, time_scale: float, routed: bool = True) -> str:
+    tiers = [
+        ModelTier("full", "fast-model", brief=False, max_queue_depth=concurrency, max_latency=3.0 * time_scale),
+        ModelTier("brief", "fast-model", brief=True, max_queue_depth=concurrency * 3, max_latency=6.0 * time_scale),
+        ModelTier("lite", "lite-model", brief=True),
+    ]
+    models = {
+        "fast-model": FakeModel("fast-model", 0.3 * time_scale, 0.3 * time_scale),
+        "lite-model": FakeModel("lite-model", 0.1 * time_scale, 0.1 * time_scale),
+    }
+    router = ModelRouter(tiers if routed else tiers[:1], max_concurrency=concurrency)
+    waits = []
+    served = Counter()
+
+    async def user_request():
+        requested = time.monotonic()
+        tier = router.choose()
+        async with router.slot():
+            await models[tier.model_name].generate(tier.brief)
+        served[tier.name] += 1
+        waits.append((time.monotonic() - requested) / time_scale)
+
+    tasks = []
+    for _ in range(requests):
+        tasks.append(asyncio.create_task(user_request()))
+        await asyncio.sleep(random.expovariate(arrival_rate) * time_scale)
+    await asyncio.gather(*tasks)
+
+    waits.sort()
+    p95 = statistics.quantiles(waits, n=20)[-1] if len(waits) > 1 else waits[0]
+    return (
+        f"{'routed' if routed else 'fixed '} rate={arrival_rate}/s concurrency={concurrency}: "
+        f"tiers {dict(served)}, p50 {statistics.median(waits):.2f}s, p95 {p95:.2f}s, max {waits[-1]:.2f}s"
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate model routing under load with fake models of different speeds.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rates", default="1,5,20", help="Comma-separated arrival rates (requests/sec) to compare.")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="Multiplier applied to simulated time (model latencies and arrivals).")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    for rate in map(float, args.rates.split(",")):
+        for routed in (False, True):
+            print(asyncio.run(simulate(args.requests, rate, args.concurrency, args.time_scale, routed)))
+
+if __name__ == "__main__":
+    main()
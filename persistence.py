@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+# სასაუბრო მდგომარეობის შენახვა SQLite-ში: context.user_data და ConversationHandler-ის
+# მდგომარეობები მეხსიერებაში გროვდება და ინტერვალით, ერთ ტრანზაქციად იწერება (write-behind),
+# ასე რომ გადატვირთვის შემდეგ მომხმარებელი შევსებას იქიდან აგრძელებს, სადაც შეჩერდა.
+import argparse
+import asyncio
+import json
+import logging
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+PERSISTENCE_FLUSH_SECONDS = 5.0
+
+class SQLitePersistence(BasePersistence):
+    def __init__(self, db_file: str, update_interval: float = PERSISTENCE_FLUSH_SECONDS,
+                 partition: tuple[int, int] | None = None, conversation_timeout: float | None = None):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.db_file = db_file
+        # (ინდექსი, ვორკერების რაოდენობა): ვორკერი მხოლოდ თავისი მომხმარებლების ჩანაწერებს ტვირთავს
+        self.partition = partition
+        # ამაზე ძველი საუბარი (მიტოვებული შევსება) ჩატვირთვისას იშლება: აღდგენილ საუბარს
+        # ConversationHandler ტაიმაუტს აღარ უნიშნავს და ის სამუდამოდ დარჩებოდა
+        self.conversation_timeout = conversation_timeout
+        # ჩასაწერი ცვლილებები (JSON ან None წაშლისთვის); ერთი გასაღების ბოლო მნიშვნელობა იმარჯვებს
+        self._pending_users: dict[int, str | None] = {}
+        self._pending_conversations: dict[tuple[str, str], str | None] = {}
+        self._write_task: asyncio.Task | None = None
+        self.stats = Counter()
+        self.write_seconds = 0.0
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        try:
+            conn = sqlite3.connect(self.db_file)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS persisted_user_data (
+                    user_id INTEGER PRIMARY KEY,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS persisted_conversations (
+                    name TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    updated_at REAL,
+                    PRIMARY KEY (name, key)
+                )
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(persisted_conversations)")]
+            if 'updated_at' not in columns:
+                # ძველ ჩანაწერებს დრო არ აქვს: ვთვლით, რომ ახლა შეინახა და ერთი ტაიმაუტის შემდეგ იშლება
+                conn.execute("ALTER TABLE persisted_conversations ADD COLUMN updated_at REAL")
+                conn.execute("UPDATE persisted_conversations SET updated_at = ?", (time.time(),))
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Persistence table creation error: {e}")
+
+    # --- ჩატვირთვა (Application.initialize) ---
+    async def get_user_data(self) -> dict[int, dict]:
+        try:
+            conn = sqlite3.connect(self.db_file)
+            if self.partition:
+                index, workers = self.partition
+                rows = conn.execute("SELECT user_id, data FROM persisted_user_data WHERE user_id % ? = ?", (workers, index)).fetchall()
+            else:
+                rows = conn.execute("SELECT user_id, data FROM persisted_user_data").fetchall()
+            conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error loading persisted user data: {e}")
+            return {}
+        logger.info(f"Restored user data for {len(rows)} users")
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    async def get_conversations(self, name: str) -> dict:
+        try:
+            conn = sqlite3.connect(self.db_file)
+            expired = 0
+            if self.conversation_timeout is not None:
+                with conn:
+                    expired = conn.execute(
+                        "DELETE FROM persisted_conversations WHERE name = ? AND updated_at < ?",
+                        (name, time.time() - self.conversation_timeout)
+                    ).rowcount
+            rows = conn.execute("SELECT key, state FROM persisted_conversations WHERE name = ?", (name,)).fetchall()
+            conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error loading persisted conversations for {name}: {e}")
+            return {}
+        conversations = {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+        if self.partition:
+            # გასაღები (chat_id, user_id)-ია; დაყოფა user_id-ით ხდება
+            index, workers = self.partition
+            conversations = {key: state for key, state in conversations.items() if key[-1] % workers == index}
+        logger.info(f"Restored {len(conversations)} '{name}' conversations, dropped {expired} older than the timeout")
+        return conversations
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    # --- ცვლილებების დაგროვება ---
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._pending_users[user_id] = json.dumps(data, ensure_ascii=False)
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._pending_users[user_id] = None
+        self._schedule_write()
+
+    async def update_conversation(self, name: str, key: tuple, new_state: object | None) -> None:
+        self._pending_conversations[(name, json.dumps(key))] = None if new_state is None else json.dumps(new_state)
+        self._schedule_write()
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        # ბაზაში სხვა არავინ წერს, მეხსიერების ასლი ყოველთვის უახლესია
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    # --- ჩაწერა ---
+    def _schedule_write(self) -> None:
+        # Application ერთი ინტერვალის ცვლილებებს ერთ gather-ში გადმოსცემს; ჩაწერის ამოცანა მათ შემდეგ
+        # ეშვება და მთელ პარტიას ერთ ტრანზაქციაში წერს. მიმდინარე ჩაწერისას მოსული ცვლილებები
+        # იმავე ამოცანის შემდეგ იტერაციაში ჩაიწერება.
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self) -> bool:
+        while self._pending_users or self._pending_conversations:
+            users, self._pending_users = self._pending_users, {}
+            conversations, self._pending_conversations = self._pending_conversations, {}
+            if not await asyncio.to_thread(self._write_batch, users, conversations):
+                # წარუმატებელი პარტია ბრუნდება, ოღონდ უფრო ახალ ცვლილებებს არ გადაფარავს
+                for user_id, data in users.items():
+                    self._pending_users.setdefault(user_id, data)
+                for key, state in conversations.items():
+                    self._pending_conversations.setdefault(key, state)
+                return False
+        return True
+
+    def _write_batch(self, users: dict[int, str | None], conversations: dict[tuple[str, str], str | None]) -> bool:
+        started = time.perf_counter()
+        try:
+            conn = sqlite3.connect(self.db_file)
+            # user_data და მდგომარეობა ერთ ტრანზაქციაშია: ავარიის შემდეგ ისინი ერთმანეთს ყოველთვის შეესაბამება
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO persisted_user_data (user_id, data) VALUES (?, ?)",
+                    [(user_id, data) for user_id, data in users.items() if data is not None]
+                )
+                conn.executemany(
+                    "DELETE FROM persisted_user_data WHERE user_id = ?",
+                    [(user_id,) for user_id, data in users.items() if data is None]
+                )
+                now = time.time()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO persisted_conversations (name, key, state, updated_at) VALUES (?, ?, ?, ?)",
+                    [(name, key, state, now) for (name, key), state in conversations.items() if state is not None]
+                )
+                conn.executemany(
+                    "DELETE FROM persisted_conversations WHERE name = ? AND key = ?",
+                    [(name, key) for (name, key), state in conversations.items() if state is None]
+                )
+            conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing persistence batch ({len(users)} users, {len(conversations)} conversations): {e}")
+            self.stats["failed_batches"] += 1
+            return False
+        self.write_seconds += time.perf_counter() - started
+        self.stats["batches"] += 1
+        self.stats["user_rows"] += len(users)
+        self.stats["conversation_rows"] += len(conversations)
+        return True
+
+    async def flush(self) -> None:
+        # ლოდინისას სხვა update-ებს შეუძლიათ ახალი ჩაწერის ამოცანა დაიწყონ, ამიტომ ციკლი
+        while self._pending_users or self._pending_conversations or (self._write_task and not self._write_task.done()):
+            self._schedule_write()
+            if not await self._write_task:
+                logger.error(
+                    f"Persistence flush left {len(self._pending_users)} users and "
+                    f"{len(self._pending_conversations)} conversations unwritten"
+                )
+                return
+
+    def summary(self) -> str:
+        batches = self.stats["batches"]
+        return (
+            f"{batches} persistence batches, {self.stats['user_rows']} user rows, "
+            f"{self.stats['conversation_rows']} conversation rows, {self.stats['failed_batches']} failed"
+            + (f", {1000 * self.write_seconds / batches:.1f} ms per batch" if batches else "")
+        )
+
+# --- გადატვირთვის შემოწმება ---
+async def replay(application, factory, user_id: int, steps) -> None:
+    from telegram import Update
+
+    for step in steps:
+        await application.process_update(Update.de_json(factory.build(user_id, step), application.bot))
+
+async def check_restart() -> bool:
+    import bot
+    import loadgen
+
+    api = loadgen.FakeBotAPI()
+    await api.start()
+    db_dir = tempfile.TemporaryDirectory()
+    bot.DB_FILE = str(Path(db_dir.name) / "check.db")
+    bot.init_db()
+    bot.generate_and_send_chart = loadgen.fake_generate_and_send_chart
+    factory = loadgen.UpdateFactory()
+    Step = loadgen.Step
+    start = [Step("start", "text", "/start"), Step("lang", "callback", "lang_ru"), Step("name", "text", "Restart Tester")]
+    tail = [Step("time", "text", "15:30"), Step("country", "text", "Georgia"), Step("city", "text", "Tbilisi")]
+
+    def build(db_file: str):
+        # ინტერვალი დიდია: ჩაწერა მხოლოდ ხელით update_persistence()-ით ან გაჩერებისას ხდება
+        return bot.build_application(loadgen.FAKE_TOKEN, base_url=api.base_url,
+                                     persistence=SQLitePersistence(db_file, update_interval=3600,
+                                                                   conversation_timeout=bot.CONVERSATION_TIMEOUT_SECONDS))
+
+    def outcome(application, user_id: int) -> tuple:
+        saved = bot.get_user_data(user_id) or {}
+        return application.user_data.get(user_id, {}).get('lang_code'), saved.get('name'), saved.get('year'), saved.get('language_code')
+
+    expected = ('ru', 'Restart Tester', 1989, 'ru')
+    results = {}
+    try:
+        # 1. სუფთა გაჩერება შევსების შუაში: ყველაფერი shutdown-ისას იწერება
+        application = build(bot.DB_FILE)
+        await application.initialize()
+        await replay(application, factory, 1, start + [Step("date", "text", "1989/11/29")])
+        await application.shutdown()
+        application = build(bot.DB_FILE)
+        await application.initialize()
+        await replay(application, factory, 1, tail)
+        results["clean shutdown"] = outcome(application, 1)
+        await application.shutdown()
+
+        # 2. ავარია: ბაზის ასლი ბოლო ინტერვალური ჩაწერის მომენტში; შემდეგი ნაბიჯი იკარგება და მეორდება
+        application = build(bot.DB_FILE)
+        await application.initialize()
+        await replay(application, factory, 2, start)
+        await application.update_persistence()
+        await application.persistence.flush()
+        crashed_db = str(Path(db_dir.name) / "crashed.db")
+        shutil.copy(bot.DB_FILE, crashed_db)
+        await replay(application, factory, 2, [Step("date", "text", "1970/01/01")])
+        await application.shutdown()
+        bot.DB_FILE = crashed_db
+        application = build(crashed_db)
+        await application.initialize()
+        await replay(application, factory, 2, [Step("date", "text", "1989/11/29")] + tail)
+        results["crash after flush"] = outcome(application, 2)
+        await application.shutdown()
+
+        # 3. მიტოვებული შევსება: ტაიმაუტზე ძველი საუბარი ჩატვირთვისას იშლება და /start-ის გარეშე
+        # გაგზავნილი ტექსტი შევსებას აღარ აგრძელებს
+        application = build(bot.DB_FILE)
+        await application.initialize()
+        await replay(application, factory, 3, start)
+        await application.shutdown()
+        conn = sqlite3.connect(bot.DB_FILE)
+        with conn:
+            conn.execute("UPDATE persisted_conversations SET updated_at = updated_at - ?", (bot.CONVERSATION_TIMEOUT_SECONDS + 1,))
+        conn.close()
+        application = build(bot.DB_FILE)
+        await application.initialize()
+        await replay(application, factory, 3, [Step("date", "text", "1989/11/29")] + tail)
+        await application.shutdown()
+        conn = sqlite3.connect(bot.DB_FILE)
+        abandoned_rows = conn.execute("SELECT COUNT(*) FROM persisted_conversations WHERE key LIKE '%3]'").fetchone()[0]
+        conn.close()
+        results["abandoned onboarding"] = (abandoned_rows, bot.get_user_data(3))
+    finally:
+        await api.stop()
+        db_dir.cleanup()
+
+    abandoned = results.pop("abandoned onboarding", None)
+    ok = abandoned == (0, None)
+    print(f"abandoned onboarding: {abandoned[0] if abandoned else '?'} conversation rows after restart, "
+          f"chart saved={bool(abandoned and abandoned[1])} -> {'ok' if ok else 'FAILED'}")
+    for scenario, result in results.items():
+        passed = result == expected
+        ok &= passed
+        print(f"{scenario}: lang_code={result[0]}, saved name={result[1]!r}, year={result[2]}, language={result[3]} "
+              f"-> {'ok' if passed else 'FAILED'}")
+    return ok and len(results) == 2
+
+# --- ბენჩმარკი ---
+async def benchmark(duration: float, users: int, intervals: list[float], seed: int) -> None:
+    import loadgen
+
+    modes = [("off", None, False), ("write-through", 0.0, True)] + [(f"write-behind {i:g}s", i, False) for i in intervals]
+    for label, interval, write_through in modes:
+        args = argparse.Namespace(
+            duration=duration, users=users, rate=0.0, mix=loadgen.parse_mix(loadgen.DEFAULT_MIX), languages=["ka", "en", "ru"],
+            think_ms=0.0, api_latency_ms=0.0, chart_latency_ms=0.0, real_charts=False, db=None, seed=seed,
+            persistence="off" if interval is None else ("write-through" if write_through else "write-behind"),
+            flush_interval=interval or PERSISTENCE_FLUSH_SECONDS,
+        )
+        report = await loadgen.run(args)
+        lines = report.splitlines()
+        print(f"{label:<20}{lines[1]}")
+        for line in lines:
+            if line.startswith("Persistence:"):
+                print(f"{'':<20}{line}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite conversation persistence utilities.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("check", help="Verify that onboarding resumes correctly after a clean restart and after a crash.")
+    bench = subparsers.add_parser("benchmark", help="Compare updates/sec with persistence off, write-through and write-behind.")
+    bench.add_argument("--duration", type=float, default=10.0)
+    bench.add_argument("--users", type=int, default=50)
+    bench.add_argument("--intervals", default="1,5", help="Comma-separated write-behind intervals in seconds.")
+    bench.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for name in ("telegram", "httpx", "bot", "persistence", "__main__"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    if args.command == "check":
+        raise SystemExit(0 if asyncio.run(check_restart()) else 1)
+    asyncio.run(benchmark(args.duration, args.users, [float(i) for i in args.intervals.split(",")], args.seed))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+# ნატალური რუკის პრომპტის კომპილატორი: ენობრივი შაბლონები იქმნება ერთხელ,
+# რუკის მონაცემები კი ენისგან დამოუკიდებელ, კომპაქტურ ცხრილად გადაეცემა.
+import argparse
+import json
+import math
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+PROMPT_VERSION = "2"
+LANGUAGE_NAMES = {"ka": "ქართულ", "en": "English", "ru": "русском"}
+FIELD_SEPARATOR = "|"
+HOUSE_NAMES = [
+    "First_House", "Second_House", "Third_House", "Fourth_House", "Fifth_House", "Sixth_House",
+    "Seventh_House", "Eighth_House", "Ninth_House", "Tenth_House", "Eleventh_House", "Twelfth_House",
+]
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+def estimate_tokens(text: str) -> int:
+    # SentencePiece-ის მიახლოება: ლათინური ~4 სიმბოლო ტოკენზე, სხვა დამწერლობები ~2
+    total = 0
+    for piece in _TOKEN_RE.findall(text):
+        chars_per_token = 4 if piece.isascii() else 2
+        total += max(1, math.ceil(len(piece) / chars_per_token))
+    return total
+
+def house_number(value) -> int | None:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value in HOUSE_NAMES:
+        return HOUSE_NAMES.index(value) + 1
+    return None
+
+def encode_planets(planets: list[dict]) -> list[str]:
+    rows = []
+    for planet in planets:
+        house = planet.get("house")
+        rows.append(FIELD_SEPARATOR.join([
+            planet["name"],
+            planet.get("sign") or "?",
+            f"{planet.get('position', 0.0):.2f}",
+            str(house) if house else "",
+            "R" if planet.get("retro") else "",
+        ]))
+    return rows
+
+def encode_aspects(aspects: list[dict]) -> list[str]:
+    return [
+        FIELD_SEPARATOR.join([aspect["p1"], aspect["aspect"], aspect["p2"], f"{aspect.get('orb', 0.0):.1f}"])
+        for aspect in aspects
+    ]
+
+@dataclass
+class LanguageTemplate:
+    static_prompt: str
+    static_tokens: int
+    instruction: str
+    brief_instruction: str
+    data_header: str
+    name_line: str
+    birth_line: str
+    location_line: str
+    planets_header: str
+    aspects_header: str
+
+@dataclass
+class CompiledPrompt:
+    static_prompt: str
+    user_prompt: str
+    static_tokens: int
+    user_tokens: int
+    dropped_aspects: list[dict] = field(default_factory=list)
+
+    @property
+    def full_prompt(self) -> str:
+        return self.static_prompt + "\n\n" + self.user_prompt
+
+    @property
+    def total_tokens(self) -> int:
+        return self.static_tokens + self.user_tokens
+
+class PromptCompiler:
+    def __init__(self, text_lookup: Callable[[str, str], str], languages, token_budget: int | None = None,
+                 token_counter: Callable[[str], int] = estimate_tokens):
+        self.text_lookup = text_lookup
+        self.token_budget = token_budget
+        self.token_counter = token_counter
+        self._templates = {lang: self._build_template(lang) for lang in languages}
+
+    def _build_template(self, lang: str) -> LanguageTemplate:
+        t = lambda key: self.text_lookup(key, lang)
+        static_prompt = "\n".join([
+            t("gemini_main_prompt_intro").format(language=LANGUAGE_NAMES.get(lang, lang)),
+            t("gemini_main_prompt_instruction_2"),
+            t("gemini_main_prompt_instruction_3"),
+            t("gemini_systems_used"),
+            "",
+            t("gemini_task_header"),
+            t("gemini_task_instruction_1"),
+            t("gemini_section_pis_start"),
+            t("gemini_pis_instruction"),
+            t("gemini_section_pis_end"),
+            "",
+            t("gemini_section_pih_start"),
+            t("gemini_pih_instruction"),
+            t("gemini_section_pih_end"),
+            "",
+            t("gemini_section_aspects_start"),
+            t("gemini_aspects_instruction"),
+            t("gemini_section_aspects_end"),
+            "",
+            t("gemini_final_instruction"),
+        ])
+        return LanguageTemplate(
+            static_prompt=static_prompt,
+            static_tokens=self.token_counter(static_prompt),
+            instruction=t("gemini_main_prompt_instruction_1"),
+            brief_instruction=t("gemini_main_prompt_instruction_1_brief"),
+            data_header=t("gemini_data_header"),
+            name_line=t("gemini_name"),
+            birth_line=t("gemini_birth_date_time"),
+            location_line=t("gemini_birth_location"),
+            planets_header=t("gemini_planet_positions_header"),
+            aspects_header=t("gemini_aspects_header"),
+        )
+
+    def template(self, lang: str) -> LanguageTemplate:
+        if lang not in self._templates:
+            self._templates[lang] = self._build_template(lang)
+        return self._templates[lang]
+
+    def static_prompt(self, lang: str) -> str:
+        return self.template(lang).static_prompt
+
+    def _render_user(self, template: LanguageTemplate, birth: dict, planet_rows: list[str], aspect_rows: list[str],
+                     brief: bool = False) -> str:
+        nation = birth.get("nation")
+        instruction = template.brief_instruction if brief else template.instruction
+        lines = [
+            instruction.format(name=birth["name"]),
+            "",
+            template.data_header,
+            template.name_line.format(name=birth["name"]),
+            template.birth_line.format(day=birth["day"], month=birth["month"], year=birth["year"],
+                                       hour=birth["hour"], minute=birth["minute"]),
+            template.location_line.format(city=birth["city"], location_nation_suffix=(f", {nation}" if nation else "")),
+            "",
+            template.planets_header,
+            *planet_rows,
+            "",
+            template.aspects_header,
+            *(aspect_rows or ["-"]),
+        ]
+        return "\n".join(lines)
+
+    def compile(self, lang: str, birth: dict, planets: list[dict], aspects: list[dict], brief: bool = False) -> CompiledPrompt:
+        template = self.template(lang)
+        planet_rows = encode_planets(planets)
+        # ბიუჯეტის გადაჭარბებისას პირველად იჭრება ყველაზე ფართო ორბისის ასპექტები
+        kept_aspects = sorted(aspects, key=lambda a: a.get("orb", 0.0))
+        dropped = []
+        user_prompt = self._render_user(template, birth, planet_rows, encode_aspects(kept_aspects), brief)
+        user_tokens = self.token_counter(user_prompt)
+        while self.token_budget and template.static_tokens + user_tokens > self.token_budget and kept_aspects:
+            dropped.append(kept_aspects.pop())
+            user_prompt = self._render_user(template, birth, planet_rows, encode_aspects(kept_aspects), brief)
+            user_tokens = self.token_counter(user_prompt)
+        return CompiledPrompt(template.static_prompt, user_prompt, template.static_tokens, user_tokens, dropped)
+
+# --- თარგმანი ---
+TRANSLATION_LANGUAGE_NAMES = {"ka": "Georgian", "en": "English", "ru": "Russian"}
+
+def translation_prompt(sections_text: str, source_lang: str, target_lang: str) -> str:
+    source = TRANSLATION_LANGUAGE_NAMES.get(source_lang, source_lang)
+    target = TRANSLATION_LANGUAGE_NAMES.get(target_lang, target_lang)
+    return (
+        f"Translate this natal chart interpretation from {source} to {target}.\n"
+        "Keep every [SECTION: ...] marker and HTML tag exactly as is, keep the paragraph structure, "
+        "and return only the translated text.\n\n"
+        + sections_text
+    )
+
+# --- ტოკენების რეგრესიის შემოწმება ---
+SAMPLE_BIRTH = {"name": "Nino", "year": 1989, "month": 11, "day": 29, "hour": 15, "minute": 30,
+                "city": "Tbilisi", "nation": "GE"}
+SAMPLE_PLANETS = [
+    {"name": "Sun", "sign": "Sag", "position": 7.12, "house": 8}, {"name": "Moon", "sign": "Pis", "position": 21.4, "house": 11},
+    {"name": "Mercury", "sign": "Sag", "position": 19.9, "house": 8}, {"name": "Venus", "sign": "Cap", "position": 23.05, "house": 9},
+    {"name": "Mars", "sign": "Sco", "position": 16.3, "house": 7}, {"name": "Jupiter", "sign": "Can", "position": 8.77, "house": 3, "retro": True},
+    {"name": "Saturn", "sign": "Cap", "position": 12.6, "house": 9}, {"name": "Uranus", "sign": "Cap", "position": 3.2, "house": 9},
+    {"name": "Neptune", "sign": "Cap", "position": 11.0, "house": 9}, {"name": "Pluto", "sign": "Sco", "position": 15.1, "house": 7},
+    {"name": "Ascendant", "sign": "Tau", "position": 2.3}, {"name": "Midheaven", "sign": "Cap", "position": 14.8},
+]
+SAMPLE_ASPECTS = [
+    {"p1": "Sun", "aspect": "sextile", "p2": "Moon", "orb": 4.3}, {"p1": "Sun", "aspect": "trine", "p2": "Jupiter", "orb": 1.7},
+    {"p1": "Moon", "aspect": "square", "p2": "Mercury", "orb": 1.5}, {"p1": "Venus", "aspect": "conjunction", "p2": "Saturn", "orb": 10.4},
+    {"p1": "Mars", "aspect": "conjunction", "p2": "Pluto", "orb": 1.2}, {"p1": "Saturn", "aspect": "conjunction", "p2": "Neptune", "orb": 1.6},
+    {"p1": "Moon", "aspect": "sextile", "p2": "Pluto", "orb": 6.3}, {"p1": "Ascendant", "aspect": "trine", "p2": "Neptune", "orb": 3.7},
+]
+
+def render_legacy_prompt(text_lookup: Callable[[str, str], str], lang: str) -> str:
+    # პირველი ვერსია: get_text-ების კონკატენაცია ემოჯებით და ქართული ფრაზებით
+    emojis = {"Sun": "☀️", "Moon": "🌙", "Mercury": "☿️", "Venus": "♀️", "Mars": "♂️", "Jupiter": "♃", "Saturn": "♄",
+              "Uranus": "♅", "Neptune": "♆", "Pluto": "♇", "Ascendant": "⬆️", "Midheaven": " Mᶜ"}
+    names = {"conjunction": "შეერთება", "opposition": "ოპოზიცია", "square": "კვადრატი", "trine": "ტრიგონი", "sextile": "სექსტილი"}
+    symbols = {"conjunction": "☌", "opposition": "☍", "square": "□", "trine": "△", "sextile": "∗"}
+    t = lambda key: text_lookup(key, lang)
+    b = SAMPLE_BIRTH
+    planets = ""
+    for p in SAMPLE_PLANETS:
+        house = f", {p['house']}-ე სახლი" if p.get("house") else ""
+        retro = " (R)" if p.get("retro") else ""
+        planets += f"- {p['name']}: {p['sign']} {p['position']:.2f}°{house}{retro}\n"
+    aspects = "".join(
+        f"- {emojis[a['p1']]}{a['p1']} {symbols[a['aspect']]} {emojis[a['p2']]}{a['p2']} ({names[a['aspect']]}, ორბისი {a['orb']:.1f}°)\n"
+        for a in SAMPLE_ASPECTS
+    )
+    return "\n".join([
+        t("gemini_main_prompt_intro").format(language={"ka": "ქართულ", "en": "ინგლისურ"}.get(lang, "რუსულ")),
+        t("gemini_main_prompt_instruction_1").format(name=b["name"]),
+        t("gemini_main_prompt_instruction_2"),
+        t("gemini_main_prompt_instruction_3") + "\n",
+        t("gemini_data_header"),
+        t("gemini_name").format(name=b["name"]),
+        t("gemini_birth_date_time").format(day=b["day"], month=b["month"], year=b["year"], hour=b["hour"], minute=b["minute"]),
+        t("gemini_birth_location").format(city=b["city"], location_nation_suffix=f", {b['nation']}"),
+        t("gemini_systems_used") + "\n",
+        t("gemini_planet_positions_header"), planets,
+        t("gemini_aspects_header"), aspects,
+        t("gemini_task_header"), t("gemini_task_instruction_1"),
+        t("gemini_section_pis_start"), t("gemini_pis_instruction"), t("gemini_section_pis_end") + "\n",
+        t("gemini_section_pih_start"), t("gemini_pih_instruction"), t("gemini_section_pih_end") + "\n",
+        t("gemini_section_aspects_start"), t("gemini_aspects_instruction"), t("gemini_section_aspects_end") + "\n",
+        t("gemini_final_instruction"),
+    ])
+
+def measure_versions(text_lookup: Callable[[str, str], str], languages, token_counter: Callable[[str], int]) -> dict:
+    compiler = PromptCompiler(text_lookup, languages, token_counter=token_counter)
+    results = {"1": {}, PROMPT_VERSION: {}}
+    for lang in languages:
+        results["1"][lang] = {"static": 0, "user": token_counter(render_legacy_prompt(text_lookup, lang))}
+        compiled = compiler.compile(lang, SAMPLE_BIRTH, SAMPLE_PLANETS, SAMPLE_ASPECTS)
+        results[PROMPT_VERSION][lang] = {"static": compiled.static_tokens, "user": compiled.user_tokens}
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare chart prompt token counts across prompt versions.")
+    parser.add_argument("--history", default="prompt_token_history.json", help="JSON file with token counts of recorded versions.")
+    parser.add_argument("--record", action="store_true", help="Store the current version's counts in the history file.")
+    parser.add_argument("--gemini", action="store_true", help="Count with the Gemini token counter instead of the local estimate.")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Allowed growth over the last recorded version.")
+    args = parser.parse_args()
+
+    import bot
+    counter = estimate_tokens
+    if args.gemini:
+        model = bot.load_gemini()
+        if not model:
+            sys.exit("GEMINI_API_KEY is not set.")
+        counter = lambda text: model.count_tokens(text).total_tokens
+    languages = list(bot.translations)
+    measured = measure_versions(bot.get_text, languages, counter)
+
+    history_path = Path(args.history)
+    history = json.loads(history_path.read_text(encoding="utf-8")) if history_path.exists() else {}
+    versions = {**{k: v for k, v in history.items() if k != PROMPT_VERSION}, **measured}
+    print(f"{'version':<10}" + "".join(f"{lang + ' static':>12}{lang + ' user':>10}{lang + ' total':>11}" for lang in languages))
+    # ვერსიები რიცხვებია: ლექსიკური დალაგებით "10" "2"-მდე მოხვდებოდა
+    for version, counts in sorted(versions.items(), key=lambda item: int(item[0])):
+        print(f"{version:<10}" + "".join(
+            f"{counts[lang]['static']:>12}{counts[lang]['user']:>10}{counts[lang]['static'] + counts[lang]['user']:>11}"
+            if lang in counts else f"{'-':>12}{'-':>10}{'-':>11}" for lang in languages
+        ))
+
+    regressions = []
+    previous = [v for v in sorted(history, key=int) if int(v) < int(PROMPT_VERSION)]
+    if previous:
+        last = history[previous[-1]]
+        for lang, counts in measured[PROMPT_VERSION].items():
+            if lang in last:
+                before = last[lang]["static"] + last[lang]["user"]
+                after = counts["static"] + counts["user"]
+                if after > before * (1 + args.tolerance):
+                    regressions.append(f"{lang}: {before} -> {after} tokens")
+    if args.record:
+        history[PROMPT_VERSION] = measured[PROMPT_VERSION]
+        history.setdefault("1", measured["1"])
+        history_path.write_text(json.dumps(history, indent=2, ensure_ascii=False), encoding="utf-8")
+    if regressions:
+        sys.exit("Prompt token regression against version " + previous[-1] + ": " + "; ".join(regressions))
+
+if __name__ == "__main__":
+    main()
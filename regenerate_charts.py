@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# რუკების მასობრივი განახლება: პრომპტის ან მოდელის ცვლილების შემდეგ სხვა ვერსიით დაწერილი
+# full_chart_text ჩანაწერები user_id-ის რიგით, შეზღუდული პარალელიზმით, იმავე
+# Kerykeion → Gemini გზით გადაიწერება. პროგრესი checkpoint ფაილში ინახება.
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+import bot
+from transits import subject_longitudes
+
+CHECKPOINT_FILE = "regenerate_charts.checkpoint.json"
+BIRTH_FIELDS = ('name', 'year', 'month', 'day', 'hour', 'minute', 'city', 'nation')
+
+def load_checkpoint(path: str, chart_version: str) -> dict:
+    # სხვა ვერსიის checkpoint არ გამოიყენება: ახალი ვერსია ყველა ჩანაწერს თავიდან ამოწმებს
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("chart_version") == chart_version:
+            return checkpoint
+    return {"chart_version": chart_version, "last_user_id": 0, "counts": {}, "failed": []}
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(temporary, path)
+
+async def regenerate_row(row: dict, tier: bot.ModelTier) -> str:
+    lang_code = row.get('language_code') or bot.DEFAULT_LANGUAGE
+    try:
+        subject, planets, aspects, _ = await asyncio.to_thread(bot.calculate_chart, row)
+        text, _ = await bot.interpret_chart(row, lang_code, planets, aspects, tier=tier, interactive=False)
+    except Exception as e:
+        bot.logger.error(f"Regeneration failed for user {row['user_id']}: {type(e).__name__}: {e}")
+        return "failed"
+    if text.startswith("("):
+        bot.logger.warning(f"Regeneration for user {row['user_id']} returned no interpretation: {text}")
+        return "failed"
+    # მომხმარებელმა ამასობაში შეიძლება ახალი მონაცემები შეიყვანა
+    current = bot.get_user_data(row['user_id'])
+    if not current or any(current.get(f) != row.get(f) for f in BIRTH_FIELDS):
+        return "skipped"
+    bot.save_user_data(
+        row['user_id'], {**row, 'lang_code': lang_code}, chart_text=text, model_tier=tier.name,
+        chart_version=bot.chart_version_stamp(tier)
+    )
+    bot.save_natal_positions(row['user_id'], subject_longitudes(subject, bot.ASPECT_PLANETS))
+    return "updated"
+
+async def run(args: argparse.Namespace) -> int:
+    bot.init_db()
+    tier = next(t for t in bot.MODEL_TIERS if t.name == args.tier)
+    chart_version = bot.chart_version_stamp(tier)
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    checkpoint = load_checkpoint(args.checkpoint, chart_version)
+    if not args.dry_run and not bot.load_gemini():
+        print("GEMINI_API_KEY is not set; nothing can be regenerated (use --dry-run to list stale rows).")
+        return 1
+
+    # როუტერის სემაფორი პირველ გამოყენებამდე იქმნება, ამიტომ ლიმიტი აქვე ერთიანდება
+    bot.model_router.max_concurrency = args.concurrency
+    semaphore = asyncio.Semaphore(args.concurrency)
+    counts = Counter(checkpoint["counts"])
+    failed = set(checkpoint["failed"])
+    after_user_id = checkpoint["last_user_id"]
+    remaining = args.limit
+    started = time.monotonic()
+    print(f"Target version {chart_version}, resuming after user_id {after_user_id}" if after_user_id else f"Target version {chart_version}")
+
+    async def regenerate(row: dict) -> tuple[int, str]:
+        async with semaphore:
+            return row['user_id'], await regenerate_row(row, tier)
+
+    seen = 0
+    while remaining is None or remaining > 0:
+        page_size = args.batch_size if remaining is None else min(args.batch_size, remaining)
+        rows = bot.get_stale_chart_users(after_user_id, chart_version, page_size)
+        if not rows:
+            break
+        if args.dry_run:
+            for row in rows:
+                print(f"user {row['user_id']}: {row.get('chart_version') or 'unversioned'} -> {chart_version}")
+            counts["stale"] += len(rows)
+        else:
+            for user_id, status in await asyncio.gather(*(regenerate(row) for row in rows if row['user_id'] not in failed)):
+                counts[status] += 1
+                if status == "failed":
+                    failed.add(user_id)
+            checkpoint.update(last_user_id=rows[-1]['user_id'], counts=dict(counts), failed=sorted(failed))
+            save_checkpoint(args.checkpoint, checkpoint)
+        after_user_id = rows[-1]['user_id']
+        seen += len(rows)
+        if remaining is not None:
+            remaining -= len(rows)
+        if not args.dry_run:
+            elapsed = time.monotonic() - started
+            print(f"up to user_id {after_user_id}: {dict(counts)} ({seen / elapsed:.2f} rows/s)")
+
+    print(f"{'Dry run' if args.dry_run else 'Done'}: {dict(counts)} in {time.monotonic() - started:.1f}s")
+    if failed and not args.dry_run:
+        print(f"{len(failed)} failed rows are listed in {args.checkpoint}; run with --restart to retry them.")
+    return 0
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Regenerate stored charts whose prompt/model version is out of date.")
+    parser.add_argument("--tier", default=bot.model_router.primary.name, choices=[t.name for t in bot.MODEL_TIERS],
+                        help="Model tier to regenerate with; its version stamp decides which rows are stale.")
+    parser.add_argument("--concurrency", type=int, default=bot.GEMINI_MAX_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows fetched per keyset page; progress is checkpointed per page.")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many stale rows.")
+    parser.add_argument("--dry-run", action="store_true", help="List stale rows without calling the model or writing anything.")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and rescan from the first user (retries failed rows).")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# გაშვების დროის ბენჩმარკი: bot-ის იმპორტის დაშლა `python -X importtime`-ით და დრო პროცესის
+# გაშვებიდან პირველ პასუხამდე (/start) ყალბ Bot API-ზე. შედეგები startup_history.jsonl-ში
+# გროვდება, რომ ყოველი ცვლილების გავლენა წინა გაზომვას შევადაროთ.
+# ეს მოდული იმპორტისას მძიმე არაფერს ტვირთავს: bot შვილობილ პროცესში იტვირთება.
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+HISTORY_FILE = ROOT / "startup_history.jsonl"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+WARMUP_STARTED = "Warm-up started"
+WARMUP_FINISHED = "Warm-up finished"
+TOP_MODULES = 8
+
+def child_env() -> dict:
+    # Gemini-ს გასაღების გარეშე: ქსელური კლიენტი არ იქმნება და გაზომვა გარე სერვისზე არ არის დამოკიდებული
+    return dict(os.environ, GEMINI_API_KEY="", PYTHONUNBUFFERED="1", PYTHONDONTWRITEBYTECODE="1")
+
+# --- იმპორტის დრო ---
+def parse_importtime(output: str, module: str = "bot") -> tuple[float, dict[str, float]]:
+    # ლოგში შვილობილი მოდულები მშობლამდე იბეჭდება, ამიტომ პირველი დონის სია ყოველ ზედა დონის ხაზზე თავიდან იწყება
+    children: dict[str, float] = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)) / 1e6, len(match.group(3)) // 2, match.group(4)
+        if depth == 1:
+            children[name] = cumulative
+        elif depth == 0:
+            if name == module:
+                return cumulative, children
+            children = {}
+    return 0.0, {}
+
+def measure_import(repeat: int) -> tuple[float, dict[str, float]]:
+    totals, breakdowns = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(repeat):
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", "import bot"],
+                cwd=tmp, env=dict(child_env(), PYTHONPATH=str(ROOT)), capture_output=True, text=True, check=True,
+            )
+            total, direct = parse_importtime(result.stderr)
+            totals.append(total)
+            breakdowns.append(direct)
+    median = statistics.median(totals)
+    breakdown = breakdowns[totals.index(min(totals, key=lambda value: abs(value - median)))]
+    return median, dict(sorted(breakdown.items(), key=lambda item: item[1], reverse=True)[:TOP_MODULES])
+
+# --- დრო პირველ პასუხამდე ---
+def run_child(token: str, base_url: str) -> None:
+    # შვილობილი პროცესი: იგივე გზა, რაც bot.main()-ში, ოღონდ ყალბ API-ზე
+    import bot
+    from telegram import Update
+    from persistence import SQLitePersistence
+
+    bot.init_db()
+    persistence = SQLitePersistence(bot.DB_FILE, update_interval=bot.PERSISTENCE_FLUSH_SECONDS,
+                                    conversation_timeout=bot.CONVERSATION_TIMEOUT_SECONDS) if bot.PERSISTENCE_ENABLED else None
+    application = bot.build_application(token, base_url=base_url, persistence=persistence)
+    application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+async def measure_first_reply(timeout: float) -> dict:
+    from loadgen import FAKE_TOKEN, FakeBotAPI, Step, UpdateFactory
+
+    api = FakeBotAPI()
+    await api.start()
+    api.add_update(UpdateFactory().build(1001, Step("start", "text", "/start")))
+    result = {"first_reply_seconds": None, "polling_seconds": None, "warmup_seconds": None}
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.time()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, str(Path(__file__).resolve()), "child", "--token", FAKE_TOKEN, "--base-url", api.base_url,
+            cwd=tmp, env=child_env(), stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+        )
+        warming_up, warmed_up = asyncio.Event(), asyncio.Event()
+        log_tail: list[str] = []
+
+        async def read_log():
+            async for raw in process.stderr:
+                line = raw.decode("utf-8", "replace").rstrip()
+                log_tail[:] = (log_tail + [line])[-20:]
+                if WARMUP_STARTED in line:
+                    warming_up.set()
+                elif WARMUP_FINISHED in line:
+                    result["warmup_seconds"] = time.time() - started
+                    warmed_up.set()
+
+        reader = asyncio.create_task(read_log())
+        deadline = time.monotonic() + timeout
+        while "sendmessage" not in api.first_call_at and process.returncode is None and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        if "sendmessage" in api.first_call_at:
+            result["first_reply_seconds"] = api.first_call_at["sendmessage"] - started
+            result["polling_seconds"] = api.first_call_at["getupdates"] - started
+            # ფონური გახურება პასუხის შემდეგ მთავრდება: თუ დაიწყო, მასაც ვუცდით
+            await asyncio.sleep(0.5)
+            if warming_up.is_set():
+                try:
+                    await asyncio.wait_for(warmed_up.wait(), timeout=max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    pass
+        else:
+            print("\n".join(log_tail), file=sys.stderr)
+        if process.returncode is None:
+            process.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(process.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        await reader
+    await api.stop()
+    return result
+
+# --- ისტორია ---
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def load_history() -> list[dict]:
+    if not HISTORY_FILE.exists():
+        return []
+    with HISTORY_FILE.open(encoding="utf-8") as history:
+        return [json.loads(line) for line in history if line.strip()]
+
+def format_seconds(value: float | None) -> str:
+    return "-" if value is None else f"{value:.3f}s"
+
+def format_delta(current: float | None, previous: float | None) -> str:
+    # previous=None: წინა ჩანაწერი არ არის ან მაშინ ეს მეტრიკა არ იზომებოდა
+    if current is None or previous is None:
+        return ""
+    return f" ({current - previous:+.3f}s)"
+
+def print_entry(entry: dict, previous: dict | None) -> None:
+    previous_imports = previous.get("imports", {}) if previous else None
+    previous = previous or {}
+    print(f"revision {entry['revision']} at {entry['recorded_at']}" + (f" — {entry['note']}" if entry.get("note") else ""))
+    for key, label in (("import_seconds", "import bot"), ("polling_seconds", "polling started"),
+                       ("first_reply_seconds", "first /start reply"), ("warmup_seconds", "warm-up finished")):
+        print(f"  {label:<20} {format_seconds(entry.get(key))}{format_delta(entry.get(key), previous.get(key))}")
+    print("  slowest direct imports of bot:")
+    for name, seconds in entry["imports"].items():
+        print(f"    {name:<24} {format_seconds(seconds)}{format_delta(seconds, None if previous_imports is None else previous_imports.get(name, 0.0))}")
+
+def measure(args: argparse.Namespace) -> None:
+    import_seconds, imports = measure_import(args.repeat)
+    replies = [asyncio.run(measure_first_reply(args.timeout)) for _ in range(args.repeat)]
+    if any(reply["first_reply_seconds"] is None for reply in replies):
+        raise SystemExit("The bot did not answer /start; see the log above.")
+    entry = {
+        "revision": git_revision(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "note": args.note,
+        "import_seconds": round(import_seconds, 4),
+    }
+    for key in ("polling_seconds", "first_reply_seconds", "warmup_seconds"):
+        values = [reply[key] for reply in replies if reply[key] is not None]
+        entry[key] = round(statistics.median(values), 4) if values else None
+    entry["imports"] = {name: round(seconds, 4) for name, seconds in imports.items()}
+    history = load_history()
+    print_entry(entry, history[-1] if history else None)
+    if not args.dry_run:
+        with HISTORY_FILE.open("a", encoding="utf-8") as output:
+            output.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        print(f"Recorded in {HISTORY_FILE.name} ({len(history) + 1} entries).")
+
+def show_history(args: argparse.Namespace) -> None:
+    history = load_history()[-args.last:]
+    for previous, entry in zip([None] + history[:-1], history):
+        print_entry(entry, previous)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Startup-time benchmark: import breakdown and time to the first /start reply.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    measure_parser = subparsers.add_parser("measure", help="Measure startup and append the result to the history file.")
+    measure_parser.add_argument("--repeat", type=int, default=3, help="Runs per metric; medians are recorded.")
+    measure_parser.add_argument("--timeout", type=float, default=60.0)
+    measure_parser.add_argument("--note", default="", help="Free-form label stored with the entry.")
+    measure_parser.add_argument("--dry-run", action="store_true", help="Print the result without recording it.")
+    history_parser = subparsers.add_parser("history", help="Print recorded entries with deltas.")
+    history_parser.add_argument("--last", type=int, default=10)
+    child_parser = subparsers.add_parser("child")
+    child_parser.add_argument("--token", required=True)
+    child_parser.add_argument("--base-url", required=True)
+    args = parser.parse_args()
+    if args.command == "child":
+        run_child(args.token, args.base_url)
+    elif args.command == "measure":
+        measure(args)
+    else:
+        show_history(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+# სინასტრია (თავსებადობა): ყველა მომხმარებლის ნატალური გრძედები ერთ შეკუმშულ float32 მასივშია,
+# რომელიც ცალკეული ჩანაწერებით ახლდება. ერთი მომხმარებლის N კანდიდატთან შედარება ერთი
+# ვექტორული გავლაა, საუკეთესო k კი argpartition-ით გამოირჩევა.
+import argparse
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from transits import ASPECT_ANGLES
+
+# ჰარმონიული ასპექტები ქულას მატებს, დაძაბული აკლებს; წვლილი ორბისის შიგნით სიზუსტის პროპორციულია
+ASPECT_WEIGHTS = {'conjunction': 1.0, 'trine': 1.0, 'sextile': 0.6, 'opposition': -0.5, 'square': -0.8}
+SYNASTRY_TOP_K = 10
+SYNASTRY_RELOAD_SECONDS = 3600
+SYNASTRY_STALE_LIMIT = 10000
+
+@dataclass
+class SynastryAspect:
+    point: str
+    aspect: str
+    other_point: str
+    deviation: float
+
+    def describe(self) -> str:
+        return f"{self.point} {self.aspect} {self.other_point} ({self.deviation:.1f}°)"
+
+@dataclass
+class SynastryMatch:
+    user_id: int
+    score: float
+    aspects: list[SynastryAspect] = field(default_factory=list)
+
+# --- ინდექსი ---
+class NatalIndex:
+    # positions: წერტილი × მომხმარებელი (P×N), რომ ვექტორული გავლის შიდა ციკლი მომხმარებლებზე მიდიოდეს.
+    # user_id -> სვეტი; წაშლისას ბოლო სვეტი ცარიელ ადგილზე გადადის, ამიტომ მასივი ყოველთვის მჭიდროა
+    def __init__(self, points: list[str], capacity: int = 1024):
+        self.points = points
+        self.user_ids = np.zeros(capacity, dtype=np.int64)
+        self.positions = np.full((len(points), capacity), np.nan, dtype=np.float32)
+        self.rows: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _reserve(self, size: int) -> None:
+        if size <= len(self.user_ids):
+            return
+        capacity = max(size, 2 * len(self.user_ids))
+        user_ids = np.zeros(capacity, dtype=np.int64)
+        positions = np.full((len(self.points), capacity), np.nan, dtype=np.float32)
+        user_ids[:len(self)] = self.user_ids[:len(self)]
+        positions[:, :len(self)] = self.positions[:, :len(self)]
+        self.user_ids, self.positions = user_ids, positions
+
+    def load(self, user_ids, positions) -> None:
+        # positions: ASPECT_PLANETS რიგით დალაგებული გრძედები, None უცნობი წერტილისთვის
+        self.rows = {}
+        self._reserve(len(user_ids))
+        self.user_ids[:len(user_ids)] = user_ids
+        self.positions[:, :len(user_ids)] = np.array(positions, dtype=np.float32).reshape(len(user_ids), len(self.points)).T
+        self.rows = {int(user_id): row for row, user_id in enumerate(user_ids)}
+
+    def upsert(self, user_id: int, longitudes) -> None:
+        row = self.rows.get(user_id)
+        if row is None:
+            row = len(self)
+            self._reserve(row + 1)
+            self.rows[user_id] = row
+            self.user_ids[row] = user_id
+        self.positions[:, row] = np.array(longitudes, dtype=np.float32)
+
+    def remove(self, user_id: int) -> None:
+        row = self.rows.pop(user_id, None)
+        if row is None:
+            return
+        last = len(self)
+        if row != last:
+            moved = int(self.user_ids[last])
+            self.user_ids[row] = moved
+            self.positions[:, row] = self.positions[:, last]
+            self.rows[moved] = row
+        self.positions[:, last] = np.nan
+
+    def get(self, user_id: int) -> np.ndarray | None:
+        row = self.rows.get(user_id)
+        return None if row is None else self.positions[:, row]
+
+    @property
+    def packed(self) -> np.ndarray:
+        return self.positions[:, :len(self)]
+
+# --- ქულები ---
+class SynastryEngine:
+    def __init__(self, points: list[str], aspect_types: list[str], orbs: dict,
+                 aspect_weights: dict = ASPECT_WEIGHTS, chunk_size: int = 1024):
+        self.points = points
+        self.aspect_types = aspect_types
+        angles = np.array([ASPECT_ANGLES[a] for a in aspect_types], dtype=np.float32)
+        # უახლოესი ასპექტი ერთი searchsorted-ით, როგორც TransitEngine-ში
+        self.aspect_order = np.argsort(angles).astype(np.int8)
+        self.sorted_angles = angles[self.aspect_order]
+        self.angle_midpoints = (self.sorted_angles[:-1] + self.sorted_angles[1:]) / 2
+        self.sorted_weights = np.array([aspect_weights.get(a, 0.0) for a in aspect_types], dtype=np.float32)[self.aspect_order]
+        self.chunk_size = chunk_size
+        orb_of = lambda name: orbs.get(name, orbs.get('default', 6))
+        # წყვილის ორბისი: ორი წერტილის ორბისებიდან უმცირესი
+        self.inverse_orbs = np.array(
+            [[1.0 / min(orb_of(a), orb_of(b)) for b in points] for a in points], dtype=np.float32
+        )
+        # ძირითადი ასპექტები 30°-ის ჯერადებია და ყველა ორბისი 15°-ზე ნაკლებია: უახლოესი ჯერადი
+        # (rint) ერთადერთი ასპექტია, რომელიც ორბისში შეიძლება მოხვდეს, searchsorted აღარ სჭირდება
+        self.step = float(math.gcd(*(int(ASPECT_ANGLES[a]) for a in aspect_types)) or 180)
+        if max(orb_of(point) for point in points) >= self.step / 2:
+            raise ValueError(f"Orbs must be below {self.step / 2:g}° for aspects on a {self.step:g}° grid")
+        # გრძედები ბიჯის ერთეულებში; rint(სხვაობა) ∈ [-steps, steps], წანაცვლებით ცხრილის [1, 2·steps+1] ინდექსები.
+        # 0 და ბოლო ინდექსი clip-ისთვისაა (NaN-ის ან გადავსების შემთხვევა, მაშინ სიზუსტეც 0-ია)
+        steps = round(360 / self.step)
+        self.step_offset = steps + 1
+        weight_of_angle = {ASPECT_ANGLES[a]: aspect_weights.get(a, 0.0) for a in aspect_types}
+        self.grid_weights = np.zeros(2 * steps + 3, dtype=np.float32)
+        for multiple in range(-steps, steps + 1):
+            angle = abs(multiple * self.step) % 360
+            self.grid_weights[multiple + self.step_offset] = weight_of_angle.get(min(angle, 360 - angle), 0.0)
+        self.step_scaled_orbs = (-self.step * self.inverse_orbs)[:, :, None]
+
+    def _score_chunk(self, natal: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        # P×P×C: მომხმარებლის i წერტილსა და კანდიდატის j წერტილს შორის სხვაობა ბიჯის ერთეულებში
+        separation = candidates[None, :, :] - natal[:, None, None]
+        multiple = np.rint(separation)
+        separation -= multiple
+        np.abs(separation, out=separation)
+        with np.errstate(invalid="ignore"):
+            weights = np.take(self.grid_weights, multiple.astype(np.intp) + self.step_offset, mode="clip")
+        # სიზუსტე 1 (ზუსტი ასპექტი) → 0 (ორბისის ზღვარი); უცნობი წერტილი (NaN) fmax-ით 0 ხდება
+        separation *= self.step_scaled_orbs
+        separation += 1.0
+        np.fmax(separation, 0.0, out=separation)
+        return np.einsum("ijc,ijc->c", separation, weights)
+
+    def score(self, natal: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        # candidates: P×N, როგორც NatalIndex.packed
+        natal = natal / self.step
+        scores = np.empty(candidates.shape[1], dtype=np.float32)
+        for start in range(0, candidates.shape[1], self.chunk_size):
+            stop = start + self.chunk_size
+            scores[start:stop] = self._score_chunk(natal, candidates[:, start:stop] / self.step)
+        return scores
+
+    def aspects(self, natal: np.ndarray, other: np.ndarray) -> list[SynastryAspect]:
+        separation = np.abs(other[None, :] - natal[:, None])
+        separation = np.minimum(separation, 360.0 - separation)
+        nearest = np.searchsorted(self.angle_midpoints, separation)
+        deviation = np.abs(separation - self.sorted_angles[nearest])
+        hits = deviation * self.inverse_orbs < 1.0
+        return sorted(
+            (SynastryAspect(self.points[i], self.aspect_types[self.aspect_order[nearest[i, j]]], self.points[j], float(deviation[i, j]))
+             for i, j in zip(*np.nonzero(hits))),
+            key=lambda aspect: aspect.deviation,
+        )
+
+    def top_matches(self, index: NatalIndex, user_id: int, k: int = SYNASTRY_TOP_K) -> list[SynastryMatch]:
+        row = index.rows.get(user_id)
+        if row is None or len(index) < 2:
+            return []
+        natal = index.positions[:, row].copy()
+        scores = self.score(natal, index.packed)
+        scores[row] = -np.inf
+        k = min(k, len(index) - 1)
+        # სრული დალაგების ნაცვლად: k საუკეთესო O(N)-ში, შემდეგ მხოლოდ მათი დალაგება
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            SynastryMatch(int(index.user_ids[i]), float(scores[i]), self.aspects(natal, index.positions[:, i]))
+            for i in top
+        ]
+
+# --- მომხმარებლების ინდექსი ---
+class SynastryMatcher:
+    # ინდექსი პირველ მოთხოვნაზე სრულად იტვირთება, შემდეგ მხოლოდ შეცვლილი მომხმარებლები ახლდება.
+    # load_positions(user_ids | None) bot.get_natal_positions-ის ფორმით ბრუნდება, შეცდომისას None.
+    # invalidate-ს bot.cache_invalidation_hooks-ის სიგნატურა აქვს; ჰუკის გარეთ ჩაწერილ ცვლილებებს
+    # (მაგ. bulk_data.py) reload_seconds-ის შემდეგ სრული გადატვირთვა ხედავს
+    def __init__(self, points: list[str], aspect_types: list[str], orbs: dict, load_positions,
+                 reload_seconds: float = SYNASTRY_RELOAD_SECONDS, stale_limit: int = SYNASTRY_STALE_LIMIT):
+        self.points = points
+        self.engine = SynastryEngine(points, aspect_types, orbs)
+        self.load_positions = load_positions
+        self.reload_seconds = reload_seconds
+        self.stale_limit = stale_limit
+        self.index: NatalIndex | None = None
+        self.loaded_at = 0.0
+        self.stale: set[int] = set()
+        self.lock = threading.Lock()
+
+    def invalidate(self, name: str, key=None) -> None:
+        if name == "natal_positions" and self.index is not None:
+            self.stale.add(key)
+
+    def refresh(self) -> NatalIndex | None:
+        # ნაკრები წაკითხვამდე იხსნება, რომ წაკითხვისას მოსული ცვლილება არ დაიკარგოს; წარუმატებელი
+        # წაკითხვისას ის ბრუნდება და ინდექსი უცვლელი რჩება (ცარიელი პასუხი "ყველა წაიშალა" არ არის)
+        # ბევრი ცვლილებისას (მაგ. regenerate_charts.py) სრული ჩატვირთვა უფრო იაფია, ვიდრე დიდი IN (...) სია
+        stale = list(self.stale)
+        self.stale.difference_update(stale)
+        if (self.index is None or time.monotonic() - self.loaded_at > self.reload_seconds
+                or len(stale) > self.stale_limit):
+            loaded = self.load_positions(None)
+            if loaded is None:
+                self.stale.update(stale)
+                return self.index
+            index = NatalIndex(self.points)
+            index.load(loaded[0], loaded[1])
+            self.index, self.loaded_at = index, time.monotonic()
+        elif stale:
+            loaded = self.load_positions(stale)
+            if loaded is None:
+                self.stale.update(stale)
+                return self.index
+            for user_id in stale:
+                self.index.remove(user_id)
+            for user_id, longitudes in zip(loaded[0], loaded[1]):
+                self.index.upsert(user_id, longitudes)
+        return self.index
+
+    def top_matches(self, user_id: int, k: int = SYNASTRY_TOP_K) -> list[SynastryMatch]:
+        with self.lock:
+            index = self.refresh()
+            return self.engine.top_matches(index, user_id, k) if index is not None else []
+
+# --- ბენჩმარკი ---
+def pairwise_score(engine: SynastryEngine, natal: list[float], other: list[float], orbs: dict) -> float:
+    # შედარებისთვის: NatalAspects-ის სტილის წყვილ-წყვილად გამოთვლა თითო კანდიდატზე
+    orb_of = lambda name: orbs.get(name, orbs.get('default', 6))
+    score = 0.0
+    for i, a in enumerate(engine.points):
+        for j, b in enumerate(engine.points):
+            if math.isnan(natal[i]) or math.isnan(other[j]):
+                continue
+            separation = abs(other[j] - natal[i])
+            separation = min(separation, 360.0 - separation)
+            orb = min(orb_of(a), orb_of(b))
+            for aspect in engine.aspect_types:
+                deviation = abs(separation - ASPECT_ANGLES[aspect])
+                if deviation < orb:
+                    score += ASPECT_WEIGHTS.get(aspect, 0.0) * (1 - deviation / orb)
+                    break
+    return score
+
+def benchmark(sizes: list[int], k: int, repeat: int, seed: int, pairwise_sample: int) -> None:
+    import bot
+
+    rng = np.random.default_rng(seed)
+    engine = SynastryEngine(bot.ASPECT_PLANETS, bot.MAJOR_ASPECTS_TYPES, bot.ASPECT_ORBS)
+    points = len(bot.ASPECT_PLANETS)
+    for users in sizes:
+        positions = rng.uniform(0, 360, size=(users, points)).astype(np.float32)
+        # ~10%-ს დაბადების დრო უცნობია: ასცედენტი და MC აკლია
+        positions[rng.random(users) < 0.1, -2:] = np.nan
+        index = NatalIndex(bot.ASPECT_PLANETS)
+        started = time.perf_counter()
+        index.load(np.arange(1, users + 1), positions)
+        load_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        updates = min(users, 10_000)
+        for user_id in rng.integers(1, users + 1, size=updates).tolist():
+            index.upsert(user_id, rng.uniform(0, 360, size=points))
+        upsert_us = (time.perf_counter() - started) / updates * 1e6
+
+        timings = []
+        queries = rng.integers(1, users + 1, size=repeat).tolist()
+        for user_id in queries:
+            started = time.perf_counter()
+            matches = engine.top_matches(index, user_id, k)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(
+            f"users={users:>9,}: top-{k} p50 {timings[len(timings) // 2] * 1000:8.1f} ms, best {timings[0] * 1000:8.1f} ms "
+            f"({users / timings[len(timings) // 2]:,.0f} candidates/s); index {index.packed.nbytes / 2 ** 20:.1f} MiB, "
+            f"load {load_seconds * 1000:.0f} ms, upsert {upsert_us:.1f} µs"
+        )
+
+    # ვექტორული ქულის სისწორე და სიჩქარე წყვილ-წყვილად გამოთვლასთან შედარებით
+    sample = index.packed[:, :pairwise_sample].T.tolist()
+    natal = index.positions[:, 0]
+    started = time.perf_counter()
+    expected = [pairwise_score(engine, natal.tolist(), other, bot.ASPECT_ORBS) for other in sample]
+    pairwise_seconds = time.perf_counter() - started
+    actual = engine.score(natal, index.packed[:, :pairwise_sample])
+    print(
+        f"pairwise Python loop: {pairwise_sample / pairwise_seconds:,.0f} candidates/s "
+        f"(1M users would take {1_000_000 / (pairwise_sample / pairwise_seconds):,.0f}s); "
+        f"top match: {matches[0].user_id} score {matches[0].score:.2f} [{'; '.join(a.describe() for a in matches[0].aspects[:3])}]; "
+        f"max |vectorized - pairwise| = {np.max(np.abs(actual - np.array(expected))):.2e}"
+    )
+
+def show_matches(db_file: str | None, user_id: int, k: int) -> bool:
+    import bot
+
+    if db_file:
+        bot.DB_FILE = db_file
+    matcher = SynastryMatcher(bot.ASPECT_PLANETS, bot.MAJOR_ASPECTS_TYPES, bot.ASPECT_ORBS, bot.get_natal_positions)
+    started = time.perf_counter()
+    matches = matcher.top_matches(user_id, k)
+    elapsed = time.perf_counter() - started
+    if matcher.index is None:
+        print(f"Could not load natal positions from {bot.DB_FILE}")
+        return False
+    if user_id not in matcher.index.rows:
+        print(f"User {user_id} has no natal positions ({len(matcher.index)} users indexed)")
+        return False
+    print(f"Top {len(matches)} of {len(matcher.index) - 1} candidates for user {user_id} ({elapsed * 1000:.0f} ms with index load):")
+    for match in matches:
+        print(f"  {match.user_id:>12} {match.score:7.2f}  {'; '.join(aspect.describe() for aspect in match.aspects[:5])}")
+    return True
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Synastry index and top-k compatibility search.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    matches = subparsers.add_parser("matches", help="List the most compatible users for one user from the bot database.")
+    matches.add_argument("user_id", type=int)
+    matches.add_argument("--k", type=int, default=SYNASTRY_TOP_K)
+    matches.add_argument("--db", default=None, help="Database file (defaults to the bot's DB_FILE).")
+    bench = subparsers.add_parser("benchmark", help="Time top-k synastry search over synthetic natal charts.")
+    bench.add_argument("--users", type=lambda value: [int(n) for n in value.split(",")], default=[10_000, 100_000, 1_000_000],
+                       help="Comma-separated index sizes.")
+    bench.add_argument("--k", type=int, default=SYNASTRY_TOP_K)
+    bench.add_argument("--repeat", type=int, default=9, help="Queries per size; the median is reported.")
+    bench.add_argument("--pairwise-sample", type=int, default=2000, help="Candidates scored by the pairwise loop for comparison.")
+    bench.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+    if args.command == "matches":
+        raise SystemExit(0 if show_matches(args.db, args.user_id, args.k) else 1)
+    benchmark(args.users, args.k, args.repeat, args.seed, args.pairwise_sample)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# მარშრუტიზაციის სცენარები ყალბი მოდელებით: ნელი და სწრაფი მოდელი, რიგი Event-ით ჩერდება
+import asyncio
+
+import pytest
+
+from model_router import FakeModel, ModelRouter, ModelTier
+
+TIME_SCALE = 0.01
+CONCURRENCY = 2
+TIERS = [
+    ModelTier("full", "slow-model", brief=False, max_queue_depth=CONCURRENCY, max_latency=3.0 * TIME_SCALE),
+    ModelTier("brief", "slow-model", brief=True, max_queue_depth=CONCURRENCY * 3, max_latency=6.0 * TIME_SCALE),
+    ModelTier("lite", "fast-model", brief=True),
+]
+
+
+@pytest.fixture
+def models() -> dict[str, FakeModel]:
+    # ნელი მოდელი სრულ პასუხს ~4.5, მოკლეს ~3 ერთეულში წერს; სწრაფი ~0.3-ში
+    return {
+        "slow-model": FakeModel("slow-model", 2.0 * TIME_SCALE, 0.5 * TIME_SCALE),
+        "fast-model": FakeModel("fast-model", 0.1 * TIME_SCALE, 0.1 * TIME_SCALE),
+    }
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_ewma_starts_at_first_sample_and_moves_by_alpha():
+    router = ModelRouter(TIERS, max_concurrency=CONCURRENCY, ewma_alpha=0.2)
+    router.record_latency(1.0)
+    assert router.latency_ewma == 1.0
+    router.record_latency(2.0)
+    assert router.latency_ewma == pytest.approx(1.2)
+
+
+def test_idle_router_picks_primary_tier():
+    router = ModelRouter(TIERS, max_concurrency=CONCURRENCY)
+    assert router.choose().name == "full"
+    assert router.is_idle()
+
+
+def test_latency_degrades_and_recovers(models):
+    router = ModelRouter(TIERS, max_concurrency=CONCURRENCY)
+
+    async def request(tier: ModelTier):
+        async with router.slot():
+            await models[tier.model_name].generate(tier.brief)
+
+    async def scenario():
+        for _ in range(3):
+            await request(TIERS[0])
+        assert router.latency_ewma > TIERS[0].max_latency
+        assert router.choose().name == "brief"
+        assert not router.is_idle()
+
+        for _ in range(30):
+            if router.latency_ewma <= TIERS[0].max_latency / 2:
+                break
+            await request(TIERS[2])
+        assert router.choose().name == "full"
+        assert router.is_idle()
+
+    asyncio.run(scenario())
+
+
+def test_queue_depth_degrades_and_drains():
+    router = ModelRouter(TIERS, max_concurrency=CONCURRENCY)
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def held():
+            async with router.slot():
+                await gate.wait()
+
+        tasks = [asyncio.create_task(held()) for _ in range(CONCURRENCY * 2)]
+        await settle()
+        assert router.queue_depth == 4
+        assert router.choose().name == "brief"
+        assert not router.is_idle()
+
+        tasks += [asyncio.create_task(held()) for _ in range(3)]
+        await settle()
+        assert router.queue_depth == 7
+        assert router.choose().name == "lite"
+
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert router.queue_depth == 0
+        assert router.choose().name == "full"
+        assert router.is_idle()
+
+    asyncio.run(scenario())
+
+
+def test_background_slots_leave_routing_untouched(models):
+    router = ModelRouter(TIERS, max_concurrency=CONCURRENCY)
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def batch():
+            async with router.slot(interactive=False):
+                await models["slow-model"].generate(brief=False)
+                await gate.wait()
+
+        tasks = [asyncio.create_task(batch()) for _ in range(CONCURRENCY * 4)]
+        await settle()
+        assert router.queue_depth == 0
+        assert router.background_in_flight == CONCURRENCY
+        assert router.choose().name == "full"
+        assert not router.is_idle()
+
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert router.background_in_flight == 0
+        assert router.latency_ewma == 0.0
+        assert router.is_idle()
+
+    asyncio.run(scenario())
+
+
+def test_untracked_slot_counts_depth_but_not_latency(models):
+    router = ModelRouter(TIERS, max_concurrency=CONCURRENCY)
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def vision():
+            async with router.slot(track_latency=False):
+                await gate.wait()
+                await models["slow-model"].generate(brief=False)
+
+        tasks = [asyncio.create_task(vision()) for _ in range(CONCURRENCY * 2)]
+        await settle()
+        assert router.queue_depth == 4
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert router.latency_ewma == 0.0
+        assert router.choose().name == "full"
+
+    asyncio.run(scenario())
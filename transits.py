@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# ტრანზიტების ძრავა: დღის ტრანზიტული პოზიციები ერთხელ ითვლება და ყველა
+# მომხმარებლის ნატალურ პოზიციებს ერთი ვექტორული გავლით ედარება.
+import argparse
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+
+from ephemeris_table import default_table, julian_day
+
+ASPECT_ANGLES = {'conjunction': 0.0, 'opposition': 180.0, 'square': 90.0, 'trine': 120.0, 'sextile': 60.0}
+TRANSIT_BODIES = ['Sun', 'Moon', 'Mercury', 'Venus', 'Mars', 'Jupiter', 'Saturn', 'Uranus', 'Neptune', 'Pluto']
+# მნიშვნელოვანია ნელი პლანეტის ზუსტი ასპექტი პირად წერტილთან; მთვარე ყოველდღე ყველას ასპექტავს
+NOTABLE_BODIES = ('Jupiter', 'Saturn', 'Uranus', 'Neptune', 'Pluto')
+NOTABLE_POINTS = ('Sun', 'Moon', 'Ascendant', 'Midheaven')
+FAST_BODIES = ('Moon',)
+POINT_ATTRIBUTES = {
+    'Ascendant': ('ascendant', 'first_house'),
+    'Midheaven': ('mc', 'medium_coeli', 'tenth_house'),
+}
+
+@dataclass
+class TransitHit:
+    body: str
+    aspect: str
+    point: str
+    deviation: float
+
+    def describe(self) -> str:
+        return f"{self.body} {self.aspect} {self.point} ({self.deviation:.1f}°)"
+
+def point_longitude(subject, name: str) -> float | None:
+    for attribute in POINT_ATTRIBUTES.get(name, (name.lower(),)):
+        point = getattr(subject, attribute, None)
+        if point is not None:
+            return point.get('abs_pos')
+    return None
+
+def subject_longitudes(subject, names: list[str]) -> dict[str, float | None]:
+    return {name: point_longitude(subject, name) for name in names}
+
+def transit_longitudes(year: int, month: int, day: int, bodies: list[str] = TRANSIT_BODIES) -> np.ndarray:
+    # წინასწარ აგებული ეფემერიდების ცხრილი, თუ ის არსებობს და თარიღს ფარავს; სხვა შემთხვევაში Kerykeion
+    table = default_table()
+    jd = julian_day(datetime(year, month, day, 12, tzinfo=timezone.utc))
+    if table is not None and table.covers(jd) and all(body in table.body_index for body in bodies):
+        return table.longitudes(jd, bodies).astype(np.float32)
+
+    from kerykeion import AstrologicalSubject
+
+    subject = AstrologicalSubject("Transits", year, month, day, 12, 0, lng=0.0, lat=51.48, tz_str="Etc/UTC", online=False)
+    return np.array([point_longitude(subject, body) for body in bodies], dtype=np.float32)
+
+class TransitEngine:
+    def __init__(self, natal_points: list[str], aspect_types: list[str], orbs: dict,
+                 transit_bodies: list[str] = TRANSIT_BODIES, notable_orb: float = 0.5, significant_orb: float = 1.0,
+                 notable_bodies: tuple = NOTABLE_BODIES, notable_points: tuple = NOTABLE_POINTS,
+                 fast_bodies: tuple = FAST_BODIES, chunk_size: int = 25_000):
+        self.natal_points = natal_points
+        self.transit_bodies = transit_bodies
+        self.aspect_types = aspect_types
+        angles = np.array([ASPECT_ANGLES[a] for a in aspect_types], dtype=np.float32)
+        # უახლოესი ასპექტი ერთი searchsorted-ით: დალაგებული კუთხეების შუა წერტილები
+        self.aspect_order = np.argsort(angles).astype(np.int8)
+        self.sorted_angles = angles[self.aspect_order]
+        self.angle_midpoints = (self.sorted_angles[:-1] + self.sorted_angles[1:]) / 2
+        self.notable_orb = notable_orb
+        self.significant_orb = significant_orb
+        self.chunk_size = chunk_size
+        orb_of = lambda name: orbs.get(name, orbs.get('default', 6))
+        # წყვილის ორბისი: ტრანზიტული სხეულისა და ნატალური წერტილის ორბისებიდან უმცირესი
+        self.orbs = np.array(
+            [[min(orb_of(body), orb_of(point)) for point in natal_points] for body in transit_bodies], dtype=np.float32
+        )
+        self.notable_mask = np.array([[body in notable_bodies and point in notable_points for point in natal_points] for body in transit_bodies])
+        self.slow_mask = np.array([body not in fast_bodies for body in transit_bodies])
+
+    def _scan_chunk(self, natal: np.ndarray, transit: np.ndarray):
+        # C×T×P კუთხური მანძილი [0, 180] შუალედში (გრძედები [0, 360)-შია)
+        separation = natal[:, None, :] - transit[None, :, None]
+        np.abs(separation, out=separation)
+        np.minimum(separation, 360.0 - separation, out=separation)
+        nearest = np.searchsorted(self.angle_midpoints, separation)
+        best_deviation = separation
+        best_deviation -= self.sorted_angles[nearest]
+        np.abs(best_deviation, out=best_deviation)
+        best_aspect = self.aspect_order[nearest]
+        hits = best_deviation <= self.orbs[None, :, :]
+        notable = (hits & (best_deviation <= self.notable_orb) & self.notable_mask[None, :, :]).any(axis=(1, 2))
+        significant = hits & (best_deviation <= self.significant_orb) & self.slow_mask[None, :, None] & notable[:, None, None]
+        return notable, significant, best_deviation, best_aspect
+
+    def scan(self, user_ids: np.ndarray, natal: np.ndarray, transit: np.ndarray) -> dict[int, list[TransitHit]]:
+        natal = np.asarray(natal, dtype=np.float32)
+        transit = np.asarray(transit, dtype=np.float32)
+        results = {}
+        for start in range(0, len(user_ids), self.chunk_size):
+            stop = start + self.chunk_size
+            notable, significant, deviation, aspect = self._scan_chunk(natal[start:stop], transit)
+            rows, bodies, points = np.nonzero(significant)
+            deviations = deviation[rows, bodies, points].tolist()
+            aspects = aspect[rows, bodies, points].tolist()
+            for row, body, point, dev, asp in zip(rows.tolist(), bodies.tolist(), points.tolist(), deviations, aspects):
+                user_id = int(user_ids[start + row])
+                results.setdefault(user_id, []).append(
+                    TransitHit(self.transit_bodies[body], self.aspect_types[asp], self.natal_points[point], dev)
+                )
+        for hits in results.values():
+            hits.sort(key=lambda hit: hit.deviation)
+        return results
+
+# --- ბენჩმარკი ---
+def benchmark(users: int, repeat: int, seed: int) -> None:
+    import bot
+
+    rng = np.random.default_rng(seed)
+    user_ids = np.arange(users, dtype=np.int64)
+    natal = rng.uniform(0, 360, size=(users, len(bot.ASPECT_PLANETS))).astype(np.float32)
+    transit = rng.uniform(0, 360, size=len(TRANSIT_BODIES)).astype(np.float32)
+    engine = TransitEngine(bot.ASPECT_PLANETS, bot.MAJOR_ASPECTS_TYPES, bot.ASPECT_ORBS)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = engine.scan(user_ids, natal, transit)
+        timings.append(time.perf_counter() - started)
+    print(
+        f"users={users} pairs/user={len(TRANSIT_BODIES) * len(bot.ASPECT_PLANETS)} "
+        f"best={min(timings):.3f}s median={sorted(timings)[len(timings) // 2]:.3f}s "
+        f"({users / min(timings):,.0f} users/s), notable users={len(results)} ({100 * len(results) / users:.1f}%)"
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Transit engine utilities.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench = subparsers.add_parser("benchmark", help="Time a full scan over synthetic natal charts.")
+    bench.add_argument("--users", type=int, default=100_000)
+    bench.add_argument("--repeat", type=int, default=5)
+    bench.add_argument("--seed", type=int, default=7)
+    subparsers.add_parser("backfill", help="Compute natal positions for users who have birth data but none stored.")
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args.users, args.repeat, args.seed)
+    elif args.command == "backfill":
+        import bot
+
+        bot.init_db()
+        for row in bot.get_users_without_natal_positions():
+            try:
+                subject, _, _, _ = bot.calculate_chart(row)
+            except Exception as e:
+                print(f"user {row['user_id']}: {type(e).__name__}: {e}")
+                continue
+            bot.save_natal_positions(row['user_id'], subject_longitudes(subject, bot.ASPECT_PLANETS))
+            print(f"user {row['user_id']}: stored")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# მომხმარებლებისა და ჩატების მეხსიერებაში მყოფი მდგომარეობის გამოდევნა: ბოლო აქტივობის
+# LRU რიგი, ვადა (TTL) და ზომის ზღვარი. გამოდევნილი მომხმარებლის ენა ბაზაში რჩება და
+# დაბრუნებისას ზარმაცად აღდგება (იხ. bot.py, track_user_state).
+import argparse
+import gc
+import random
+import sqlite3
+import time
+import tracemalloc
+from collections import OrderedDict
+
+USER_STATE_TTL_SECONDS = 24 * 3600
+USER_STATE_MAX_USERS = 100_000
+CONVERSATION_TIMEOUT_SECONDS = 3600
+
+class IdleTracker:
+    def __init__(self, ttl: float = USER_STATE_TTL_SECONDS, max_entries: int = USER_STATE_MAX_USERS,
+                 min_idle: float = CONVERSATION_TIMEOUT_SECONDS):
+        # min_idle: ზომის ზღვრის გამო ამაზე ახალ აქტიურ მომხმარებელს არ ვდევნით, რომ
+        # დაუმთავრებელი საუბრის მონაცემები არ დაიკარგოს (ზღვარი ამ დროს დროებით ირღვევა)
+        self.ttl = max(ttl, min_idle)
+        self.max_entries = max_entries
+        self.min_idle = min_idle
+        self.users: OrderedDict[int, float] = OrderedDict()
+        self.chats: OrderedDict[int, float] = OrderedDict()
+
+    def touch(self, user_id: int | None, chat_id: int | None, now: float) -> None:
+        if user_id is not None:
+            self.users[user_id] = now
+            self.users.move_to_end(user_id)
+        if chat_id is not None:
+            self.chats[chat_id] = now
+            self.chats.move_to_end(chat_id)
+
+    def adopt(self, user_ids, chat_ids, now: float) -> None:
+        # გადატვირთვის შემდეგ აღდგენილ ჩანაწერებს ბოლო აქტივობა არ აქვთ: ვთვლით, რომ ახლა ნახეს
+        for user_id in user_ids:
+            self.users.setdefault(user_id, now)
+        for chat_id in chat_ids:
+            self.chats.setdefault(chat_id, now)
+
+    def _expired(self, entries: OrderedDict[int, float], now: float) -> list[int]:
+        expired = []
+        while entries:
+            key, last_seen = next(iter(entries.items()))
+            idle = now - last_seen
+            if idle >= self.ttl or (len(entries) > self.max_entries and idle >= self.min_idle):
+                entries.popitem(last=False)
+                expired.append(key)
+            else:
+                break
+        return expired
+
+    def expired(self, now: float) -> tuple[list[int], list[int]]:
+        return self._expired(self.users, now), self._expired(self.chats, now)
+
+# --- ბენჩმარკი ---
+CONVERSATION_STATES = [1, 2, 3, 4, 5, 6]  # NAME_CONV ... CITY_CONV
+
+def synthetic_user_data(rng: random.Random, user_id: int) -> tuple[dict, int | None]:
+    # რეალური ბოტის ფორმა: ენა, ზოგჯერ ნახევრად შევსებული chart_data და საუბრის მდგომარეობა
+    data = {'lang_code': rng.choice(('ka', 'en', 'ru'))}
+    roll = rng.random()
+    if roll < 0.3:
+        state = rng.choice(CONVERSATION_STATES[1:])
+        data['chart_data'] = {'name': f"User {user_id}", 'lang_code': data['lang_code'], 'year': 1990,
+                              'month': rng.randint(1, 12), 'day': rng.randint(1, 28)}
+        return data, state
+    if roll < 0.4:
+        data['awaiting_dream'] = True
+    return data, None
+
+def simulate(users: int, days: float, evict: bool, ttl: float, max_entries: int, sweep_seconds: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    user_data: dict[int, dict] = {}
+    chat_data: dict[int, dict] = {}
+    conversations: dict[tuple, int] = {}
+    tracker = IdleTracker(ttl, max_entries) if evict else None
+    # ბაზის როლს :memory: SQLite ასრულებს: მისი მეხსიერება tracemalloc-ში არ ითვლება, როგორც რეალური ბაზა
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE user_languages (user_id INTEGER PRIMARY KEY, language_code TEXT NOT NULL)")
+    duration = days * 86400
+    # ჩამოსვლის დროები თანაბრად, დაბრუნებები (20%) კი პირველი ვიზიტიდან ექსპონენციალურად
+    visits = [(rng.uniform(0, duration), user_id) for user_id in range(1, users + 1)]
+    visits += [(t + rng.expovariate(1 / 86400), user_id) for t, user_id in visits if rng.random() < 0.2]
+    visits = sorted(v for v in visits if v[0] < duration)
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    next_sweep, sweep_seconds_total, evicted, rehydrated, peak_entries = sweep_seconds, 0.0, 0, 0, 0
+    for now, user_id in visits:
+        if tracker and now >= next_sweep:
+            started = time.perf_counter()
+            user_ids, chat_ids = tracker.expired(now)
+            languages = []
+            for evicted_id in user_ids:
+                data = user_data.pop(evicted_id, None)
+                if data and 'lang_code' in data:
+                    languages.append((evicted_id, data['lang_code']))
+                conversations.pop((evicted_id, evicted_id), None)
+            db.executemany("INSERT OR REPLACE INTO user_languages (user_id, language_code) VALUES (?, ?)", languages)
+            for chat_id in chat_ids:
+                chat_data.pop(chat_id, None)
+            evicted += len(user_ids)
+            sweep_seconds_total += time.perf_counter() - started
+            next_sweep = now + sweep_seconds
+        saved = None
+        if tracker and user_id not in user_data:
+            saved = db.execute("SELECT language_code FROM user_languages WHERE user_id = ?", (user_id,)).fetchone()
+        if user_id in user_data:
+            data = user_data[user_id]
+        elif saved:
+            data = user_data[user_id] = {'lang_code': saved[0]}
+            rehydrated += 1
+        else:
+            data, state = synthetic_user_data(rng, user_id)
+            user_data[user_id] = data
+            if state is not None:
+                conversations[(user_id, user_id)] = state
+        chat_data.setdefault(user_id, {})
+        if tracker:
+            tracker.touch(user_id, user_id, now)
+        peak_entries = max(peak_entries, len(user_data))
+    current = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return {
+        "visits": len(visits), "resident": len(user_data), "peak_resident": peak_entries, "conversations": len(conversations),
+        "memory_mb": current / 2 ** 20, "evicted": evicted, "rehydrated": rehydrated,
+        "saved_languages": db.execute("SELECT COUNT(*) FROM user_languages").fetchone()[0], "sweep_seconds": sweep_seconds_total,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Memory benchmark for per-user state with and without idle eviction.")
+    parser.add_argument("--users", type=int, default=500_000)
+    parser.add_argument("--days", type=float, default=7.0, help="Simulated period over which the users arrive.")
+    parser.add_argument("--ttl", type=float, default=USER_STATE_TTL_SECONDS)
+    parser.add_argument("--max-users", type=int, default=USER_STATE_MAX_USERS)
+    parser.add_argument("--sweep-seconds", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+    for evict in (False, True):
+        result = simulate(args.users, args.days, evict, args.ttl, args.max_users, args.sweep_seconds, args.seed)
+        label = f"eviction ttl={args.ttl:g}s max={args.max_users}" if evict else "no eviction"
+        print(
+            f"{label}: {result['visits']} visits, {result['resident']} users resident "
+            f"(peak {result['peak_resident']}), {result['conversations']} open conversations, "
+            f"{result['memory_mb']:.1f} MiB traced"
+        )
+        if evict:
+            print(
+                f"  evicted {result['evicted']}, rehydrated {result['rehydrated']} from "
+                f"{result['saved_languages']} saved languages, total sweep time {result['sweep_seconds']:.2f}s"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,566 @@
+# -*- coding: utf-8 -*-
+# ჰორიზონტალური მასშტაბირება: ერთი შემსვლელი (ingress) პროცესი Telegram-იდან update-ებს იღებს და
+# user_id-ით N ვორკერს უნაწილებს, ასე რომ ერთი მომხმარებლის update-ები ყოველთვის ერთ ვორკერში და
+# თანმიმდევრობით მუშავდება. ბროკერი ჩანაცვლებადია: ერთ პროცესში (asyncio რიგები) ან ლოკალური Unix
+# სოკეტით, გარე სერვისების გარეშე. ვორკერები ერთ SQLite ბაზას (WAL რეჟიმში) იზიარებენ.
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from telegram import Bot, Update
+from telegram.error import NetworkError
+
+import bot
+from model_router import ModelRouter
+from persistence import SQLitePersistence
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = "bot_workers.sock"
+WORKER_MAX_PENDING_UPDATES = 256
+WORKER_MAX_HELD_UPDATES = 10000
+WORKER_SUPERVISE_SECONDS = 1.0
+POLL_TIMEOUT_SECONDS = 30
+
+def routing_key(data: dict) -> int:
+    # update-ის ერთადერთი შიგთავსის ველიდან (message, callback_query, ...) გამგზავნი ან ჩატი
+    for value in data.values():
+        if isinstance(value, dict):
+            for field in ("from", "user", "chat"):
+                sender = value.get(field)
+                if isinstance(sender, dict) and "id" in sender:
+                    return sender["id"]
+    return 0
+
+def worker_for(data: dict, workers: int) -> int:
+    # იგივე წესით ფილტრავს SQLitePersistence თავის ჩანაწერებს (user_id % workers)
+    return routing_key(data) % workers
+
+def enable_wal(db_file: str) -> None:
+    # რამდენიმე პროცესი ერთდროულად კითხულობს და წერს: WAL-ში მკითხველები ჩამწერს არ ელოდებიან
+    try:
+        conn = sqlite3.connect(db_file)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+    except sqlite3.Error as e:
+        logger.error(f"Could not enable WAL for {db_file}: {e}")
+
+# --- ბროკერები ---
+class InProcessBroker:
+    # ვორკერები ერთ პროცესში მუშაობს და bot-ის ქეშებს იზიარებს, ამიტომ ინვალიდაციის გადაცემა არ სჭირდება
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.queues = [asyncio.Queue(maxsize=WORKER_MAX_PENDING_UPDATES) for _ in range(workers)]
+        self.replies = asyncio.Queue()
+
+    async def start(self) -> None:
+        pass
+
+    async def send(self, worker: int, message: dict) -> None:
+        await self.queues[worker].put(message)
+
+    async def reply(self) -> dict:
+        return await self.replies.get()
+
+    def endpoint(self, worker: int) -> "InProcessEndpoint":
+        return InProcessEndpoint(self, worker)
+
+    async def stop(self) -> None:
+        for queue in self.queues:
+            await queue.put({"type": "stop"})
+
+    async def close(self) -> None:
+        pass
+
+class InProcessEndpoint:
+    def __init__(self, broker: InProcessBroker, worker: int):
+        self.broker = broker
+        self.worker = worker
+
+    async def connect(self) -> None:
+        pass
+
+    async def receive(self) -> dict | None:
+        return await self.broker.queues[self.worker].get()
+
+    async def send(self, message: dict) -> None:
+        if message["type"] != "invalidate":
+            await self.broker.replies.put(message)
+
+    async def close(self) -> None:
+        pass
+
+class UnixSocketBroker:
+    # ingress-ის მხარე: თითო ვორკერი ერთ კავშირს ხსნის; შეტყობინებები ხაზებით გამოყოფილი JSON-ია.
+    # ვორკერის ინვალიდაცია დანარჩენ ვორკერებს გადაეცემა. გათიშული ვორკერის update-ები მის
+    # ხელახლა მიერთებამდე ინახება, დანარჩენი ვორკერები კი ჩვეულებრივ აგრძელებენ
+    def __init__(self, workers: int, path: str = SOCKET_PATH, max_held: int = WORKER_MAX_HELD_UPDATES):
+        self.workers = workers
+        self.path = path
+        self.max_held = max_held
+        self.writers: dict[int, asyncio.StreamWriter] = {}
+        self.held: dict[int, list[bytes]] = {worker: [] for worker in range(workers)}
+        self.online = [asyncio.Event() for _ in range(workers)]
+        self.replies = asyncio.Queue()
+        self.stopping = False
+        self._server = None
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_worker, path=self.path)
+
+    async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        hello = json.loads(await reader.readline())
+        worker = hello["worker"]
+        # დაგროვილი update-ები ახალზე ადრე: ჩაწერა await-ის გარეშეა, ამიტომ შუაში send() ვერ ჩაერევა
+        held, self.held[worker] = self.held[worker], []
+        for line in held:
+            writer.write(line)
+        if held:
+            logger.info(f"Worker {worker} reconnected; delivering {len(held)} held updates")
+        self.writers[worker] = writer
+        self.online[worker].set()
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                if message["type"] == "invalidate":
+                    for other, other_writer in self.writers.items():
+                        if other != worker:
+                            other_writer.write(line)
+                else:
+                    await self.replies.put(message)
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if self.writers.get(worker) is writer:
+                del self.writers[worker]
+                self.online[worker].clear()
+                if not self.stopping:
+                    logger.warning(f"Worker {worker} disconnected; holding its updates until it reconnects")
+
+    async def send(self, worker: int, message: dict) -> None:
+        line = json.dumps(message).encode() + b"\n"
+        writer = self.writers.get(worker)
+        if writer is not None:
+            writer.write(line)
+            try:
+                await writer.drain()
+                return
+            except ConnectionError:
+                # კავშირი ჩაწერისას გაწყდა: შეტყობინება ხელახლა მიერთებულ ვორკერს გადაეცემა
+                if self.writers.get(worker) is writer:
+                    del self.writers[worker]
+                    self.online[worker].clear()
+        held = self.held[worker]
+        held.append(line)
+        if len(held) >= self.max_held:
+            # მეხსიერება შეზღუდულია: ingress ჩერდება, სანამ სუპერვაიზერი ვორკერს თავიდან არ გაუშვებს
+            logger.warning(f"Worker {worker} has {len(held)} held updates; pausing ingress until it reconnects")
+            await self.online[worker].wait()
+
+    async def reply(self) -> dict:
+        return await self.replies.get()
+
+    async def stop(self) -> None:
+        self.stopping = True
+        for worker in list(self.writers):
+            await self.send(worker, {"type": "stop"})
+        for worker, held in self.held.items():
+            if held:
+                logger.warning(f"Worker {worker} stopped with {len(held)} undelivered updates")
+
+    async def close(self) -> None:
+        for writer in list(self.writers.values()):
+            writer.close()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+class UnixSocketEndpoint:
+    def __init__(self, path: str, worker: int):
+        self.path = path
+        self.worker = worker
+        self.reader = None
+        self.writer = None
+
+    async def connect(self) -> None:
+        self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+        await self.send({"type": "hello", "worker": self.worker})
+
+    async def receive(self) -> dict | None:
+        line = await self.reader.readline()
+        return json.loads(line) if line else None
+
+    async def send(self, message: dict) -> None:
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+
+    async def close(self) -> None:
+        if self.writer:
+            self.writer.close()
+
+# --- ვორკერი ---
+class Worker:
+    def __init__(self, application, endpoint, index: int, max_pending: int = WORKER_MAX_PENDING_UPDATES):
+        self.application = application
+        self.endpoint = endpoint
+        self.index = index
+        # სხვადასხვა მომხმარებლის update-ები პარალელურად მუშავდება, ერთისა კი რიგით:
+        # ყოველი ამოცანა იმავე მომხმარებლის წინა ამოცანას ელოდება
+        self.tails: dict[int, asyncio.Task] = {}
+        self.slots = asyncio.Semaphore(max_pending)
+        self.processed = 0
+
+    async def _process(self, data: dict, previous: asyncio.Task | None) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self.application.process_update(Update.de_json(data, self.application.bot))
+        except Exception as e:
+            logger.error(f"Worker {self.index} failed on update {data.get('update_id')}: {type(e).__name__}: {e}")
+        self.processed += 1
+
+    def _finished(self, key: int, task: asyncio.Task) -> None:
+        self.slots.release()
+        if self.tails.get(key) is task:
+            del self.tails[key]
+
+    async def drain(self) -> None:
+        # ბოლო ამოცანები წინებს ელოდება, ამიტომ მათი დასრულება ყველას დასრულებას ნიშნავს
+        if self.tails:
+            await asyncio.wait(list(self.tails.values()))
+
+    async def run(self) -> None:
+        while (message := await self.endpoint.receive()) is not None:
+            kind = message["type"]
+            if kind == "update":
+                # სავსე რიგისას სოკეტიდან კითხვა ჩერდება და ingress-ს drain() აყოვნებს
+                await self.slots.acquire()
+                key = routing_key(message["update"])
+                task = asyncio.create_task(self._process(message["update"], self.tails.get(key)))
+                self.tails[key] = task
+                task.add_done_callback(lambda finished, key=key: self._finished(key, finished))
+            elif kind == "invalidate":
+                bot.drop_cached(message["name"], message.get("key"))
+            elif kind == "drain":
+                await self.drain()
+                await self.endpoint.send({"type": "drained", "worker": self.index, "processed": self.processed})
+            elif kind == "stop":
+                break
+        await self.drain()
+
+async def run_worker(endpoint, index: int, workers: int, token: str, base_url: str | None = None,
+                     persistence: bool = True, register_hooks: bool = True) -> None:
+    await endpoint.connect()
+    if register_hooks:
+        loop = asyncio.get_running_loop()
+
+        def publish(name: str, key) -> None:
+            # save_user_data შეიძლება ნაკადიდანაც გამოიძახონ, ამიტომ გაგზავნა ციკლში იგეგმება
+            message = {"type": "invalidate", "name": name, "key": key}
+            loop.call_soon_threadsafe(lambda: asyncio.ensure_future(endpoint.send(message)))
+
+        bot.cache_invalidation_hooks.append(publish)
+    application = bot.build_application(
+        token, base_url=base_url,
+        persistence=SQLitePersistence(bot.DB_FILE, bot.PERSISTENCE_FLUSH_SECONDS, partition=(index, workers),
+                                      conversation_timeout=bot.CONVERSATION_TIMEOUT_SECONDS) if persistence else None,
+        background_jobs=index == 0,
+    )
+    await application.initialize()
+    await application.start()
+    worker = Worker(application, endpoint, index)
+    await endpoint.send({"type": "ready", "worker": index})
+    try:
+        await worker.run()
+    finally:
+        await application.stop()
+        await application.shutdown()
+        await endpoint.close()
+        logger.info(f"Worker {index} stopped after {worker.processed} updates")
+
+def worker_process(path: str, index: int, workers: int, token: str, db_file: str, options: dict) -> None:
+    # spawn-ით გაშვებული პროცესის შესასვლელი წერტილი. Ctrl+C-ს ingress იჭერს და "stop"-ს აგზავნის,
+    # რომ ვორკერმა persistence ჩაწეროს და სუფთად გაჩერდეს
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    bot.DB_FILE = db_file
+    if options.get("quiet"):
+        quiet_logging()
+    if "gemini_max_concurrency" in options:
+        apply_worker_limits(options)
+
+    async def main():
+        base_url = None
+        api = None
+        if options.get("fake_api"):
+            import loadgen
+
+            # ბენჩმარკი: თითო ვორკერს თავისი ყალბი Bot API ჰყავს, რუკის გენერაცია კი იმიტირებულია
+            api = loadgen.FakeBotAPI(latency_ms=options.get("api_latency_ms", 0.0))
+            await api.start()
+            base_url = api.base_url
+            bot.generate_and_send_chart = loadgen.fake_generate_and_send_chart
+        try:
+            await run_worker(UnixSocketEndpoint(path, index), index, workers, token, base_url=base_url,
+                             persistence=options.get("persistence", True))
+        finally:
+            if api:
+                await api.stop()
+
+    asyncio.run(main())
+
+# --- ingress ---
+async def run_ingress(broker, workers: int, token: str) -> None:
+    telegram_bot = Bot(token)
+    await telegram_bot.initialize()
+    await telegram_bot.delete_webhook()
+    offset = None
+    routed = [0] * workers
+    last_report = time.monotonic()
+    try:
+        while True:
+            try:
+                updates = await telegram_bot.get_updates(offset=offset, timeout=POLL_TIMEOUT_SECONDS,
+                                                         allowed_updates=Update.ALL_TYPES)
+            except NetworkError as e:
+                logger.warning(f"getUpdates failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                data = update.to_dict()
+                worker = worker_for(data, workers)
+                await broker.send(worker, {"type": "update", "update": data})
+                routed[worker] += 1
+                # offset-ი მხოლოდ გადაცემის შემდეგ იზრდება: ingress-ის ავარიისას Telegram update-ს ხელახლა მოგვცემს
+                offset = update.update_id + 1
+            if time.monotonic() - last_report > 300:
+                logger.info(f"Updates routed per worker: {routed}")
+                last_report = time.monotonic()
+    finally:
+        await telegram_bot.shutdown()
+
+async def wait_ready(broker, workers: int) -> None:
+    ready = set()
+    while len(ready) < workers:
+        message = await broker.reply()
+        if message["type"] == "ready":
+            ready.add(message["worker"])
+
+def limit_share(total: int, index: int, workers: int) -> int:
+    # ნაშთი პირველ ვორკერებს ეძლევა, რომ ჯამი ზუსტად total იყოს; ყველას სულ მცირე ერთი რჩება
+    return max(1, total // workers + (index < total % workers))
+
+def worker_limits(index: int, workers: int) -> dict:
+    # ყოველი პროცესი თავის model_router-სა და პროცესების პულებს აგებს, ამიტომ გლობალური ლიმიტები იყოფა
+    return {
+        "gemini_max_concurrency": limit_share(bot.GEMINI_MAX_CONCURRENCY, index, workers),
+        "chart_render_workers": limit_share(bot.CHART_RENDER_WORKERS, index, workers),
+        "image_reading_workers": limit_share(bot.IMAGE_READING_WORKERS, index, workers),
+    }
+
+def apply_worker_limits(options: dict) -> None:
+    # პულები ზარმაცად იქმნება და სემაფორი პირველ slot()-ზე, ამიტომ ცვლილება გაშვებამდე საკმარისია
+    concurrency = options["gemini_max_concurrency"]
+    bot.model_router = ModelRouter(bot.model_tiers(concurrency), max_concurrency=concurrency)
+    bot.chart_renderer.workers = options["chart_render_workers"]
+    bot.image_pipeline.workers = options["image_reading_workers"]
+
+def spawn_worker(index: int, workers: int, path: str, token: str, db_file: str, options: dict):
+    context = multiprocessing.get_context("spawn")
+    process = context.Process(target=worker_process, args=(path, index, workers, token, db_file,
+                                                           {**options, **worker_limits(index, workers)}),
+                              name=f"bot-worker-{index}")
+    process.start()
+    return process
+
+def spawn_workers(workers: int, path: str, token: str, db_file: str, options: dict) -> list:
+    return [spawn_worker(index, workers, path, token, db_file, options) for index in range(workers)]
+
+async def supervise(processes: list, broker, path: str, token: str, db_file: str, options: dict) -> None:
+    # მოკვდა ვორკერი თავიდან ეშვება; მანამდე მისი update-ები ბროკერში ინახება
+    workers = len(processes)
+    while True:
+        await asyncio.sleep(WORKER_SUPERVISE_SECONDS)
+        for index, process in enumerate(processes):
+            if process.is_alive() or broker.stopping:
+                continue
+            logger.error(f"Worker {index} exited with code {process.exitcode}; restarting")
+            process.close()
+            processes[index] = spawn_worker(index, workers, path, token, db_file, options)
+
+async def serve(args: argparse.Namespace) -> None:
+    bot.init_db()
+    enable_wal(bot.DB_FILE)
+    if args.broker == "inproc":
+        broker = InProcessBroker(args.workers)
+        tasks = [
+            asyncio.create_task(run_worker(broker.endpoint(index), index, args.workers, bot.TELEGRAM_BOT_TOKEN,
+                                           persistence=bot.PERSISTENCE_ENABLED, register_hooks=False))
+            for index in range(args.workers)
+        ]
+        processes, supervisor = [], None
+    else:
+        broker = UnixSocketBroker(args.workers, args.socket)
+        await broker.start()
+        db_file = str(Path(bot.DB_FILE).resolve())
+        options = {"persistence": bot.PERSISTENCE_ENABLED}
+        processes = spawn_workers(args.workers, args.socket, bot.TELEGRAM_BOT_TOKEN, db_file, options)
+        tasks = []
+        supervisor = asyncio.create_task(supervise(processes, broker, args.socket, bot.TELEGRAM_BOT_TOKEN, db_file, options))
+    await wait_ready(broker, args.workers)
+    logger.info(f"{args.workers} workers ready ({args.broker} broker); polling Telegram")
+    try:
+        await run_ingress(broker, args.workers, bot.TELEGRAM_BOT_TOKEN)
+    finally:
+        if supervisor:
+            supervisor.cancel()
+        await broker.stop()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for process in processes:
+            await asyncio.to_thread(process.join, 30)
+        await broker.close()
+
+# --- ბენჩმარკი ---
+def synthetic_updates(conversations: int, seed: int) -> tuple[list[dict], int]:
+    import loadgen
+
+    rng = random.Random(seed)
+    factory = loadgen.UpdateFactory()
+    mix = loadgen.parse_mix(loadgen.DEFAULT_MIX)
+    pending = []
+    completed = 0
+    for number in range(conversations):
+        script = rng.choices(list(mix), weights=list(mix.values()))[0]
+        steps = loadgen.SCRIPTS[script](rng.choice(["ka", "en", "ru"]))
+        completed += any(step.label == "city" for step in steps)
+        pending.append((10_000_000 + number, iter(steps)))
+    # სხვადასხვა მომხმარებლის ნაბიჯები შემთხვევითად ერევა, თითოეულის რიგი კი უცვლელია
+    updates = []
+    while pending:
+        index = rng.randrange(len(pending))
+        user_id, steps = pending[index]
+        step = next(steps, None)
+        if step is None:
+            pending[index] = pending[-1]
+            pending.pop()
+            continue
+        updates.append(factory.build(user_id, step))
+    return updates, completed
+
+async def benchmark_run(workers: int, broker_kind: str, updates: list[dict], db_file: str, options: dict) -> tuple[float, list[int]]:
+    import loadgen
+
+    processes, tasks, api = [], [], None
+    if broker_kind == "inproc":
+        broker = InProcessBroker(workers)
+        api = loadgen.FakeBotAPI(latency_ms=options["api_latency_ms"])
+        await api.start()
+        bot.generate_and_send_chart = loadgen.fake_generate_and_send_chart
+        tasks = [
+            asyncio.create_task(run_worker(broker.endpoint(index), index, workers, loadgen.FAKE_TOKEN, base_url=api.base_url,
+                                           persistence=options["persistence"], register_hooks=False))
+            for index in range(workers)
+        ]
+    else:
+        path = str(Path(db_file).with_suffix(".sock"))
+        broker = UnixSocketBroker(workers, path)
+        await broker.start()
+        processes = spawn_workers(workers, path, loadgen.FAKE_TOKEN, db_file, {**options, "fake_api": True, "quiet": True})
+    try:
+        await wait_ready(broker, workers)
+        started = time.perf_counter()
+        for data in updates:
+            await broker.send(worker_for(data, workers), {"type": "update", "update": data})
+        for worker in range(workers):
+            await broker.send(worker, {"type": "drain"})
+        processed = [0] * workers
+        drained = 0
+        while drained < workers:
+            message = await broker.reply()
+            if message["type"] == "drained":
+                processed[message["worker"]] = message["processed"]
+                drained += 1
+        elapsed = time.perf_counter() - started
+    finally:
+        await broker.stop()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for process in processes:
+            await asyncio.to_thread(process.join, 60)
+        await broker.close()
+        if api:
+            await api.stop()
+    return elapsed, processed
+
+def count_saved_users(db_file: str) -> int:
+    conn = sqlite3.connect(db_file)
+    count = conn.execute("SELECT COUNT(*) FROM user_birth_data").fetchone()[0]
+    conn.close()
+    return count
+
+def benchmark(args: argparse.Namespace) -> None:
+    updates, completed = synthetic_updates(args.conversations, args.seed)
+    options = {"api_latency_ms": args.api_latency_ms, "persistence": not args.no_persistence}
+    print(f"{len(updates)} updates from {args.conversations} conversations ({completed} complete onboarding), "
+          f"{args.broker} broker, {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        with tempfile.TemporaryDirectory() as directory:
+            bot.DB_FILE = str(Path(directory) / "workers.db")
+            # ბაზა ყოველ გაშვებაზე ახალია, ამიტომ წინა გაშვების ქეშირებული ჩანაწერები (იგივე user_id-ები) იშლება
+            bot.user_record_cache.clear()
+            bot.init_db()
+            enable_wal(bot.DB_FILE)
+            elapsed, processed = asyncio.run(benchmark_run(workers, args.broker, updates, bot.DB_FILE, options))
+            saved = count_saved_users(bot.DB_FILE)
+        rate = len(updates) / elapsed
+        baseline = baseline or rate
+        # ყველა დასრულებული შევსება ბაზაშია მხოლოდ მაშინ, თუ თითო მომხმარებლის რიგი დაცულია
+        print(f"workers={workers}: {rate:.0f} updates/s ({rate / baseline:.2f}x), per worker {processed}, "
+              f"saved charts {saved}/{completed}{'' if saved == completed else ' ORDER/LOSS ERROR'}")
+
+def quiet_logging() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ("telegram", "httpx", "bot", "persistence", "__main__", "__mp_main__"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the bot as one ingress poller and N user-partitioned workers.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Poll Telegram and route updates to worker processes.")
+    run_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    run_parser.add_argument("--broker", choices=["unix", "inproc"], default="unix")
+    run_parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket path for the unix broker.")
+    bench = subparsers.add_parser("benchmark", help="Measure update throughput across worker counts with a fake Bot API.")
+    bench.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker counts.")
+    bench.add_argument("--broker", choices=["unix", "inproc"], default="unix")
+    bench.add_argument("--conversations", type=int, default=1000)
+    bench.add_argument("--api-latency-ms", type=float, default=0.0, help="Latency added by each worker's fake Bot API.")
+    bench.add_argument("--no-persistence", action="store_true")
+    bench.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        if not bot.TELEGRAM_BOT_TOKEN:
+            logger.critical("TELEGRAM_BOT_TOKEN not set.")
+            return
+        asyncio.run(serve(args))
+    else:
+        quiet_logging()
+        benchmark(args)
+
+if __name__ == "__main__":
+    main()